@@ -5,6 +5,7 @@ from .routes.vehicles.endpoints import router as vehicles_router
 from .routes.system.endpoints import router as system_router
 from .routes.user.endpoints import router as user_router
 from .routes.options.endpoints import router as options_router
+from .routes.sync.endpoints import router as sync_router
 
 api_router = APIRouter()
 
@@ -15,4 +16,5 @@ api_router.include_router(incidents_router, prefix="/incidents", tags=["incident
 api_router.include_router(vehicles_router, prefix="/vehicles", tags=["vehicles"])
 api_router.include_router(system_router, prefix="/system", tags=["system"])
 api_router.include_router(options_router, prefix="/options", tags=["options"])
+api_router.include_router(sync_router, prefix="/sync", tags=["sync"])
 
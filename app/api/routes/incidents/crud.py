@@ -1,50 +1,385 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import column, delete, func, insert, literal, literal_column, table, tuple_, union_all, update
 from typing import List, Optional
+import base64
+import datetime
+import heapq
 from fastapi import HTTPException
 
 from ....db.sql import models
 from . import schemas
 from ....core.websockets import manager
-from ....core.geocoding import geocode_address
+from ....core.geocoding import geocode_address_nowait, geocoding_queue, normalize_address
+from ....core.scheduler import scheduler
+from ....core.leader import leader
+from ....core import geo
+from ....core.responses import RepresentationCache, dumps
+from ....core.search import (
+    HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, SEARCH_RANK_WINDOW, SEARCH_WEIGHTS, SNIPPET_TOKENS, fts_query, highlight_html,
+)
+from ..sync.crud import add_tombstone, next_revision
+
+def resolve_location(data: dict, current: Optional[models.Incident] = None) -> Optional[str]:
+    """Fill in coordinates for an address without explicit latitude/longitude.
+
+    Keeps the coordinates of `current` if its address is unchanged, otherwise uses only
+    lookups that do not wait on I/O (local gazetteer, in-memory cache). On a miss the
+    coordinates are left pending (None) and the address is returned so it can be geocoded
+    in the background once the incident is committed.
+    """
+    address = data.get("address")
+    if not address or (data.get("latitude") is not None and data.get("longitude") is not None):
+        return None
+    key = normalize_address(address)
+    if (
+        current is not None
+        and current.latitude is not None
+        and current.longitude is not None
+        and normalize_address(current.address or "") == key
+    ):
+        data["latitude"], data["longitude"] = current.latitude, current.longitude
+        return None
+    cached = geocode_address_nowait(address)
+    if cached is not None:
+        data["latitude"], data["longitude"] = cached
+        return None
+    data["latitude"], data["longitude"] = None, None
+    return address
+
+def _incident_version(incident: models.Incident) -> tuple:
+    # Every incident write bumps its revision; embedded vehicles change with their own
+    return (incident.revision, tuple((v.id, v.revision) for v in incident.vehicles))
+
+# IncidentOut of each incident serialized once per version, shared by HTTP responses and broadcasts
+representations = RepresentationCache(
+    lambda incident: schemas.IncidentOut.model_validate(incident).model_dump(mode="json"),
+    _incident_version,
+)
+
+# Archived incidents never change; their vehicles are snapshots without a revision
+archived_representations = RepresentationCache(
+    lambda incident: schemas.IncidentOut.model_validate(incident).model_dump(mode="json"),
+    lambda incident: incident.revision,
+)
+
+def _incident_event(kind: str, incident: models.Incident, was_active: bool = False) -> dict:
+    """Broadcast payload for an incident change. Incidents going live are flagged as
+    `alarm`: clients sound the alarm for them and the WebSocket batch window is skipped."""
+    message = {
+        "type": kind,
+        "incident": representations.as_dict(incident),
+    }
+    if incident.status == models.IncidentStatus.active and not was_active:
+        message["alarm"] = True
+    return message
 
 async def get_incident(db: AsyncSession, incident_id: int) -> Optional[models.Incident]:
     result = await db.execute(
         select(models.Incident)
         .options(selectinload(models.Incident.vehicles))
         .filter(models.Incident.id == incident_id)
+        # Overwrite stale state of an instance already in the session, in the same query
+        .execution_options(populate_existing=True)
     )
     incident = result.scalars().first()
-    if incident:
-        await db.refresh(incident) # Refresh to load server-defaults like created_at
-        # Backfill legacy rows without created_at
-        if getattr(incident, "created_at", None) is None:
-            import datetime
-            incident.created_at = datetime.datetime.now(datetime.timezone.utc)
-            await db.commit()
+    # Backfill legacy rows without created_at
+    if incident is not None and incident.created_at is None:
+        incident.created_at = datetime.datetime.now(datetime.timezone.utc)
+        await db.commit()
     return incident
 
-async def get_incidents(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Incident]:
-    result = await db.execute(
+def _utc_naive(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """Convert a filter bound to naive UTC, the form SQLite stores datetimes in."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def encode_cursor(incident: models.Incident) -> str:
+    """Opaque keyset cursor pointing just after the given incident in (created_at, id) order."""
+    created = _utc_naive(incident.created_at)
+    raw = f"{created.isoformat() if created else ''}|{incident.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime.datetime], int]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created, incident_id = raw.rsplit("|", 1)
+        return (datetime.datetime.fromisoformat(created) if created else None), int(incident_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+def _filter_incidents(
+    stmt,
+    entity,
+    *,
+    status: Optional[models.IncidentStatus] = None,
+    scheduled_from: Optional[datetime.datetime] = None,
+    scheduled_to: Optional[datetime.datetime] = None,
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    vehicle_id: Optional[int] = None,
+):
+    """Apply the list filters to a query over `entity` (Incident or IncidentArchive)."""
+    if status is not None:
+        stmt = stmt.where(entity.status == status)
+    if scheduled_from is not None:
+        stmt = stmt.where(entity.scheduled_at >= _utc_naive(scheduled_from))
+    if scheduled_to is not None:
+        stmt = stmt.where(entity.scheduled_at < _utc_naive(scheduled_to))
+    if created_from is not None:
+        stmt = stmt.where(entity.created_at >= _utc_naive(created_from))
+    if created_to is not None:
+        stmt = stmt.where(entity.created_at < _utc_naive(created_to))
+    if vehicle_id is not None:
+        vehicle = models.Vehicle if entity is models.Incident else models.IncidentVehicleArchive
+        stmt = stmt.where(entity.vehicles.any(vehicle.id == vehicle_id))
+    return stmt
+
+async def get_incidents(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    *,
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    **filters,
+) -> List[models.Incident]:
+    """List incidents in (created_at, id) order using two queries (rows + vehicles).
+
+    `cursor` (see encode_cursor) continues after the last incident of a previous page and
+    should be preferred over `skip`, which is kept for compatibility. Filters are those of
+    _filter_incidents. With `include_archived`, archived incidents (IncidentArchive objects)
+    are merged into the same order.
+    """
+    if include_archived:
+        return await _get_incidents_with_archive(db, skip, limit, cursor=cursor, **filters)
+    stmt = _filter_incidents(
         select(models.Incident)
-        .options(selectinload(models.Incident.vehicles))
-        .offset(skip)
+        .options(
+            selectinload(models.Incident.vehicles)
+        )
+        .order_by(models.Incident.created_at, models.Incident.id),
+        models.Incident,
+        **filters,
+    )
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(models.Incident.created_at, models.Incident.id) > tuple_(after_created, after_id)
+        )
+    elif skip:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt.limit(limit))
+    return list(result.scalars().all())
+
+async def _get_incidents_with_archive(
+    db: AsyncSession, skip: int, limit: int, *, cursor: Optional[str], **filters
+) -> list:
+    """Page over live and archived incidents: one UNION ALL for the page's keys, then the
+    rows (with vehicles) of each table."""
+    parts = [
+        _filter_incidents(
+            select(entity.id, entity.created_at, literal(archived).label("archived")), entity, **filters
+        )
+        for entity, archived in ((models.Incident, False), (models.IncidentArchive, True))
+    ]
+    page = union_all(*parts).subquery()
+    stmt = select(page.c.id, page.c.archived).order_by(page.c.created_at, page.c.id)
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(page.c.created_at, page.c.id) > tuple_(after_created, after_id))
+    elif skip:
+        stmt = stmt.offset(skip)
+    keys = [(bool(key.archived), key.id) for key in (await db.execute(stmt.limit(limit))).all()]
+    rows = await _load_incidents(db, keys)
+    return [rows[key] for key in keys if key in rows]
+
+async def _load_incidents(db: AsyncSession, keys: List[tuple[bool, int]]) -> dict:
+    """Live and archived incidents (with vehicles) for (archived, id) keys, one query pair per
+    table. Keys of rows deleted or archived in the meantime are missing from the result."""
+    rows = {}
+    for entity, archived in ((models.Incident, False), (models.IncidentArchive, True)):
+        ids = [incident_id for is_archived, incident_id in keys if is_archived == archived]
+        if ids:
+            result = await db.execute(
+                select(entity).options(selectinload(entity.vehicles)).where(entity.id.in_(ids))
+            )
+            rows.update({(archived, row.id): row for row in result.scalars().all()})
+    return rows
+
+async def get_archived_incident(db: AsyncSession, incident_id: int) -> Optional[models.IncidentArchive]:
+    result = await db.execute(
+        select(models.IncidentArchive)
+        .options(selectinload(models.IncidentArchive.vehicles))
+        .where(models.IncidentArchive.id == incident_id)
+    )
+    return result.scalars().first()
+
+def _representations_for(incident) -> RepresentationCache:
+    return archived_representations if isinstance(incident, models.IncidentArchive) else representations
+
+def incident_json(incident) -> bytes:
+    """IncidentOut JSON of a live or archived incident (cached)."""
+    return _representations_for(incident).as_json(incident)
+
+def incident_dict(incident) -> dict:
+    """IncidentOut dict of a live or archived incident (cached, do not modify)."""
+    return _representations_for(incident).as_dict(incident)
+
+# (FTS5 table, archived) searched by search_incidents (see migrations.SEARCH_INDEXES)
+_SEARCH_TABLES = (("incidents_fts", False), ("incidents_archive_fts", True))
+
+def _search_hits(fts_name: str, archived: bool, query: str):
+    """Matches of one FTS5 table, restricted to its newest SEARCH_RANK_WINDOW matches, with
+    bm25 score (lower is better) and highlighted fields."""
+    fts = table(fts_name, column("rowid"))
+    ref = literal_column(fts_name)
+    match = ref.match(query)
+    stmt = select(
+        fts.c.rowid.label("id"),
+        literal(archived).label("archived"),
+        func.bm25(ref, *SEARCH_WEIGHTS).label("score"),
+        func.highlight(ref, 0, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE).label("title"),
+        func.snippet(ref, 1, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, "…", SNIPPET_TOKENS).label("description"),
+        func.highlight(ref, 2, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE).label("address"),
+    ).where(match)
+    if SEARCH_RANK_WINDOW > 0:
+        # rowid of the window's oldest match; FTS5 applies rowid bounds while reading the index
+        floor = (
+            select(fts.c.rowid).where(match)
+            .order_by(fts.c.rowid.desc()).offset(SEARCH_RANK_WINDOW - 1).limit(1)
+            .scalar_subquery()
+        )
+        stmt = stmt.where(fts.c.rowid >= func.coalesce(floor, 0))
+    return stmt
+
+async def search_incidents(
+    db: AsyncSession, text: str, skip: int = 0, limit: int = 20, *, include_archived: bool = False
+) -> List[dict]:
+    """Full-text search over title, description and address (see core/search.py).
+
+    Returns the page of hits, best first, as {"incident", "archived", "score", "highlights"}
+    dicts: one query for the ranked page, then the rows (with vehicles) per table. Raises
+    ValueError for text without searchable words.
+    """
+    query = fts_query(text)
+    parts = [
+        _search_hits(fts_name, archived, query)
+        for fts_name, archived in _SEARCH_TABLES
+        if include_archived or not archived
+    ]
+    hits = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+    page = (await db.execute(
+        select(hits).order_by(hits.c.score, hits.c.id.desc()).offset(skip).limit(limit)
+    )).all()
+    rows = await _load_incidents(db, [(bool(hit.archived), hit.id) for hit in page])
+    results = []
+    for hit in page:
+        incident = rows.get((bool(hit.archived), hit.id))
+        if incident is None:
+            continue  # archived or deleted between the queries
+        results.append({
+            "incident": incident_dict(incident),
+            "archived": bool(hit.archived),
+            "score": -hit.score,
+            "highlights": {
+                "title": highlight_html(hit.title),
+                "description": highlight_html(hit.description),
+                "address": highlight_html(hit.address),
+            },
+        })
+    return results
+
+# (entity, R*Tree, archived) queried by location (see migrations.SPATIAL_INDEXES)
+_SPATIAL_TABLES = (
+    (models.Incident, "incidents_rtree", False),
+    (models.IncidentArchive, "incidents_archive_rtree", True),
+)
+
+def _in_box(entity, rtree_name: str, archived: bool, min_lat, max_lat, min_lon, max_lon, **filters):
+    """Keys and coordinates of `entity` rows in the box; the R*Tree does the box test (with
+    float32 bounds rounded outwards), the exact coordinates come from the table."""
+    rtree = table(rtree_name, *(column(name) for name in ("id", "min_lat", "max_lat", "min_lon", "max_lon")))
+    stmt = (
+        select(
+            entity.id,
+            literal(archived).label("archived"),
+            entity.latitude,
+            entity.longitude,
+            entity.created_at,
+        )
+        .select_from(rtree)
+        .join(entity, entity.id == rtree.c.id)
+        .where(rtree.c.max_lat >= min_lat, rtree.c.min_lat <= max_lat)
+        .where(rtree.c.max_lon >= min_lon, rtree.c.min_lon <= max_lon)
+        .where(entity.latitude.between(min_lat, max_lat), entity.longitude.between(min_lon, max_lon))
+    )
+    return _filter_incidents(stmt, entity, **filters)
+
+def _located(box, include_archived: bool, **filters):
+    parts = [
+        _in_box(entity, rtree_name, archived, *box, **filters)
+        for entity, rtree_name, archived in _SPATIAL_TABLES
+        if include_archived or not archived
+    ]
+    return (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+
+async def get_incidents_near(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    limit: int = 100,
+    *,
+    include_archived: bool = False,
+    **filters,
+) -> List[dict]:
+    """Incidents within radius_m of a point, nearest first (newest first at equal distance),
+    as {"incident", "archived", "distance_m"} dicts. The R*Tree selects the box around the
+    circle, exact haversine distances filter and rank it. Filters are those of _filter_incidents.
+    """
+    box = geo.bounding_box(latitude, longitude, radius_m)
+    located = _located(box, include_archived, **filters)
+    candidates = (await db.execute(select(located.c.id, located.c.archived, located.c.latitude, located.c.longitude))).all()
+    nearest = []
+    for row in candidates:
+        distance = geo.haversine_m(latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius_m:
+            nearest.append((distance, -row.id, bool(row.archived)))
+    nearest = heapq.nsmallest(limit, nearest)
+    rows = await _load_incidents(db, [(archived, -neg_id) for _, neg_id, archived in nearest])
+    results = []
+    for distance, neg_id, archived in nearest:
+        incident = rows.get((archived, -neg_id))
+        if incident is not None:
+            results.append({"incident": incident_dict(incident), "archived": archived, "distance_m": round(distance, 1)})
+    return results
+
+async def get_incidents_in_bbox(
+    db: AsyncSession,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    limit: int = 500,
+    *,
+    include_archived: bool = False,
+    **filters,
+) -> list:
+    """Incidents located in the box, newest first (live Incident and, with include_archived,
+    IncidentArchive objects). Filters are those of _filter_incidents."""
+    located = _located((min_lat, max_lat, min_lon, max_lon), include_archived, **filters)
+    stmt = (
+        select(located.c.id, located.c.archived)
+        .order_by(located.c.created_at.desc(), located.c.id.desc())
         .limit(limit)
     )
-    incidents = result.scalars().all()
-    # Refresh each incident to ensure server-defaults are loaded
-    needs_commit = False
-    for incident in incidents:
-        await db.refresh(incident)
-        if getattr(incident, "created_at", None) is None:
-            import datetime
-            incident.created_at = datetime.datetime.now(datetime.timezone.utc)
-            needs_commit = True
-    if needs_commit:
-        await db.commit()
-    return incidents
+    keys = [(bool(key.archived), key.id) for key in (await db.execute(stmt)).all()]
+    rows = await _load_incidents(db, keys)
+    return [rows[key] for key in keys if key in rows]
 
 async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) -> models.Incident:
     try:
@@ -59,21 +394,27 @@ async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) ->
         address = (data.get("address") or "").strip()
         existing = None
         if title:
+            # Both lookups are index probes on the normalized match keys
+            title_key = models.match_key(title)
             if scheduled_at is not None:
                 # Prefer exact match on title + scheduled_at when provided
                 res = await db.execute(
-                    select(models.Incident).where(
-                        models.Incident.title == title,
+                    select(models.Incident)
+                    .options(selectinload(models.Incident.vehicles))
+                    .where(
+                        models.Incident.title_key == title_key,
                         models.Incident.scheduled_at == scheduled_at,
                     )
                 )
                 existing = res.scalars().first()
             if existing is None and address:
-                # Fallback: case-insensitive trimmed title + address
+                # Fallback: title + address
                 res = await db.execute(
-                    select(models.Incident).where(
-                        func.lower(models.Incident.title) == func.lower(func.trim(func.cast(title, models.Incident.title.type))),
-                        func.lower(func.trim(models.Incident.address)) == func.lower(func.trim(address)),
+                    select(models.Incident)
+                    .options(selectinload(models.Incident.vehicles))
+                    .where(
+                        models.Incident.title_key == title_key,
+                        models.Incident.address_key == models.match_key(address),
                     )
                 )
                 existing = res.scalars().first()
@@ -81,11 +422,9 @@ async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) ->
         if existing is not None:
             # Update existing incident using same rules as update_incident
             update_data = dict(data)  # from create payload
-            # If address is updated and lat/lon not explicitly provided, geocode
-            if "address" in update_data and update_data.get("address"):
-                if not ("latitude" in update_data and "longitude" in update_data and update_data["latitude"] is not None and update_data["longitude"] is not None):
-                    lat, lon = await geocode_address(update_data["address"])
-                    update_data["latitude"], update_data["longitude"] = lat, lon
+            # If address is updated and lat/lon not explicitly provided, geocode after commit
+            pending_address = resolve_location(update_data, existing)
+            was_active = existing.status == models.IncidentStatus.active
             # Handle vehicle assignment
             vehicle_ids = update_data.pop("vehicle_ids", None)
             if vehicle_ids is not None:
@@ -93,21 +432,20 @@ async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) ->
                 existing.vehicles = list(res.scalars().all())
             for key, value in update_data.items():
                 setattr(existing, key, value)
+            existing.revision = await next_revision(db)
             await db.commit()
             await db.refresh(existing, attribute_names=["vehicles", "created_at"])  # ensure fields loaded
+            scheduler.sync(existing)
+            if pending_address:
+                geocoding_queue.submit(existing.id, pending_address)
 
             import asyncio
             asyncio.create_task(
-                manager.broadcast({
-                    "type": "incident_updated",
-                    "incident": schemas.IncidentOut.model_validate(existing).model_dump()
-                })
+                manager.broadcast(_incident_event("incident_updated", existing, was_active))
             )
             return existing
-        # Backend geocoding: if address provided and lat/lon missing
-        if data.get("address") and (data.get("latitude") is None or data.get("longitude") is None):
-            lat, lon = await geocode_address(data["address"])
-            data["latitude"], data["longitude"] = lat, lon
+        # Backend geocoding: if address provided and lat/lon missing, resolve after commit
+        pending_address = resolve_location(data)
         vehicle_ids = data.pop("vehicle_ids", []) or []
         db_incident = models.Incident(**data)
         db.add(db_incident)
@@ -115,6 +453,7 @@ async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) ->
         if vehicle_ids:
             res = await db.execute(select(models.Vehicle).where(models.Vehicle.id.in_(vehicle_ids)))
             db_incident.vehicles = list(res.scalars().all())
+        db_incident.revision = await next_revision(db)
         await db.commit()
         # Ensure server defaults and relationships are loaded
         await db.refresh(db_incident, attribute_names=["created_at", "vehicles"])  # created_at via server_default
@@ -124,13 +463,13 @@ async def create_incident(db: AsyncSession, incident: schemas.IncidentCreate) ->
             import datetime
             created_incident.created_at = datetime.datetime.now(datetime.timezone.utc)
             await db.commit()
+        scheduler.sync(created_incident)
+        if pending_address:
+            geocoding_queue.submit(created_incident.id, pending_address)
 
         import asyncio
         asyncio.create_task(
-            manager.broadcast({
-                "type": "incident_created",
-                "incident": schemas.IncidentOut.model_validate(created_incident).model_dump()
-            })
+            manager.broadcast(_incident_event("incident_created", created_incident))
         )
         return created_incident
     except Exception:
@@ -146,11 +485,9 @@ async def update_incident(db: AsyncSession, incident_id: int, incident_update: s
             if "status" in update_data and update_data["status"] is not None:
                 val = update_data["status"]
                 update_data["status"] = models.IncidentStatus(val.value if hasattr(val, "value") else val)
-            # If address is updated and lat/lon not explicitly provided, geocode
-            if "address" in update_data and update_data.get("address"):
-                if not ("latitude" in update_data and "longitude" in update_data and update_data["latitude"] is not None and update_data["longitude"] is not None):
-                    lat, lon = await geocode_address(update_data["address"])
-                    update_data["latitude"], update_data["longitude"] = lat, lon
+            # If address is updated and lat/lon not explicitly provided, geocode after commit
+            pending_address = resolve_location(update_data, db_incident)
+            was_active = db_incident.status == models.IncidentStatus.active
             # Handle vehicle assignment
             if "vehicle_ids" in update_data:
                 vehicle_ids = update_data.pop("vehicle_ids")
@@ -159,16 +496,17 @@ async def update_incident(db: AsyncSession, incident_id: int, incident_update: s
                     db_incident.vehicles = list(res.scalars().all())
             for key, value in update_data.items():
                 setattr(db_incident, key, value)
+            db_incident.revision = await next_revision(db)
             await db.commit()
             # Ensure relationships are loaded for serialization
             await db.refresh(db_incident, attribute_names=["vehicles", "created_at"])  # ensure fields loaded
+            scheduler.sync(db_incident)
+            if pending_address:
+                geocoding_queue.submit(db_incident.id, pending_address)
 
             import asyncio
             asyncio.create_task(
-                manager.broadcast({
-                    "type": "incident_updated",
-                    "incident": schemas.IncidentOut.model_validate(db_incident).model_dump()
-                })
+                manager.broadcast(_incident_event("incident_updated", db_incident, was_active))
             )
             return db_incident
 
@@ -178,10 +516,8 @@ async def update_incident(db: AsyncSession, incident_id: int, incident_update: s
         if "status" in create_data and create_data["status"] is not None:
             val = create_data["status"]
             create_data["status"] = models.IncidentStatus(val.value if hasattr(val, "value") else val)
-        # Geocode if address present and coords missing
-        if create_data.get("address") and (create_data.get("latitude") is None or create_data.get("longitude") is None):
-            lat, lon = await geocode_address(create_data["address"])
-            create_data["latitude"], create_data["longitude"] = lat, lon
+        # Geocode after commit if address present and coords missing
+        pending_address = resolve_location(create_data)
         vehicle_ids = create_data.pop("vehicle_ids", []) or []
         db_new = models.Incident(
             title=create_data.get("title", "Einsatz"),
@@ -196,27 +532,121 @@ async def update_incident(db: AsyncSession, incident_id: int, incident_update: s
         if vehicle_ids:
             res = await db.execute(select(models.Vehicle).where(models.Vehicle.id.in_(vehicle_ids)))
             db_new.vehicles = list(res.scalars().all())
+        db_new.revision = await next_revision(db)
         await db.commit()
         await db.refresh(db_new, attribute_names=["vehicles", "created_at"])  # ensure fields loaded
+        scheduler.sync(db_new)
+        if pending_address:
+            geocoding_queue.submit(db_new.id, pending_address)
 
         import asyncio
         asyncio.create_task(
-            manager.broadcast({
-                "type": "incident_created",
-                "incident": schemas.IncidentOut.model_validate(db_new).model_dump()
-            })
+            manager.broadcast(_incident_event("incident_created", db_new))
         )
         return db_new
     except Exception:
         await db.rollback()
         raise
 
+def _naive(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # SQLite stores the wall-clock part only, which is what create_incident compares on
+    return value.replace(tzinfo=None) if value is not None else None
+
+async def upsert_incident_batch(
+    db: AsyncSession, rows: List[tuple[int, schemas.IncidentCreate]]
+) -> tuple[List[dict], List[models.Incident]]:
+    """Create or update a batch of incidents in one transaction, applying the same
+    title+scheduled_at / title+address matching as create_incident.
+
+    Candidates for the whole batch are fetched with one query, vehicles with another, and
+    rows matching an earlier row of the same import update it. Geocoding is only queued
+    (after commit) and nothing is broadcast here; see broadcast_bulk_summary.
+    Returns per-row results and the written incidents.
+    """
+    title_keys = {models.match_key(row.title) for _, row in rows}
+    res = await db.execute(
+        select(models.Incident)
+        .options(selectinload(models.Incident.vehicles))
+        .where(models.Incident.title_key.in_(title_keys))
+    )
+    by_schedule: dict = {}
+    by_address: dict = {}
+
+    def remember(incident: models.Incident) -> None:
+        if incident.scheduled_at is not None:
+            by_schedule.setdefault((incident.title_key, _naive(incident.scheduled_at)), incident)
+        if incident.address_key:
+            by_address.setdefault((incident.title_key, incident.address_key), incident)
+
+    for incident in sorted(res.scalars().all(), key=lambda i: i.id):
+        remember(incident)
+
+    vehicle_ids = {vid for _, row in rows for vid in row.vehicle_ids}
+    vehicles = {}
+    if vehicle_ids:
+        res = await db.execute(select(models.Vehicle).where(models.Vehicle.id.in_(vehicle_ids)))
+        vehicles = {v.id: v for v in res.scalars().all()}
+
+    revision = await next_revision(db)
+    results: List[dict] = []
+    written: List[models.Incident] = []
+    pending: List[tuple[models.Incident, str]] = []
+    try:
+        for line, row in rows:
+            data = row.dict()
+            data["status"] = models.IncidentStatus(data["status"].value if hasattr(data["status"], "value") else data["status"])
+            address = (data.get("address") or "").strip()
+            existing = None
+            title_key = models.match_key(data["title"])
+            if data["scheduled_at"] is not None:
+                existing = by_schedule.get((title_key, _naive(data["scheduled_at"])))
+            if existing is None and address:
+                existing = by_address.get((title_key, models.match_key(address)))
+            pending_address = resolve_location(data, existing)
+            assigned = [vehicles[vid] for vid in data.pop("vehicle_ids") if vid in vehicles]
+            if existing is not None:
+                for key, value in data.items():
+                    setattr(existing, key, value)
+                incident, action = existing, "updated"
+            else:
+                incident, action = models.Incident(**data), "created"
+                db.add(incident)
+            incident.vehicles = assigned
+            incident.revision = revision
+            remember(incident)
+            if pending_address:
+                pending.append((incident, pending_address))
+            if incident not in written:
+                written.append(incident)
+            results.append({"line": line, "status": action, "incident": incident})
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    for incident in written:
+        scheduler.sync(incident)
+    for incident, address in pending:
+        geocoding_queue.submit(incident.id, address)
+    for result in results:
+        result["id"] = result.pop("incident").id
+    return results, written
+
+def broadcast_bulk_summary(created: int, updated: int) -> None:
+    """One event for a whole import; clients fetch the rows via /api/sync."""
+    import asyncio
+    asyncio.create_task(
+        manager.broadcast({"type": "incidents_bulk", "created": created, "updated": updated})
+    )
+
 async def delete_incident(db: AsyncSession, incident_id: int) -> Optional[models.Incident]:
     try:
         db_incident = await get_incident(db, incident_id)
         if db_incident:
             await db.delete(db_incident)
+            await add_tombstone(db, "incident", incident_id, await next_revision(db))
             await db.commit()
+            scheduler.cancel(incident_id)
+            representations.discard(incident_id)
             import asyncio
             asyncio.create_task(
                 manager.broadcast({"type": "incident_deleted", "incident_id": incident_id})
@@ -225,3 +655,174 @@ async def delete_incident(db: AsyncSession, incident_id: int) -> Optional[models
     except Exception:
         await db.rollback()
         raise
+
+# Columns copied verbatim into incidents_archive
+_ARCHIVED_COLUMNS = (
+    "id", "title", "description", "status", "created_at", "address",
+    "latitude", "longitude", "scheduled_at", "closed_at", "revision",
+)
+
+async def archive_closed_incidents(
+    db: AsyncSession, closed_before: datetime.datetime, limit: int, fencing_token: Optional[int] = None
+) -> List[int]:
+    """Move up to `limit` incidents closed before `closed_before`, with their vehicle
+    assignments, into the archive tables in one transaction. Clients see them as deleted
+    (tombstones) and get one `incidents_archived` event. Returns the moved ids.
+    With a fencing token, nothing is moved unless this process still holds the leader lease.
+    """
+    incidents = models.Incident.__table__
+    assignments = models.incident_vehicles
+    try:
+        # Taking the revision first makes the rest of the transaction run on the writer
+        revision = await next_revision(db)
+        stmt = (
+            select(models.Incident.id)
+            .where(models.Incident.status == models.IncidentStatus.closed)
+            .where(models.Incident.closed_at < _utc_naive(closed_before))
+            .order_by(models.Incident.closed_at)
+            .limit(limit)
+        )
+        if fencing_token is not None:
+            stmt = stmt.where(leader.fence(fencing_token))
+        ids = list((await db.execute(stmt)).scalars().all())
+        if not ids:
+            await db.rollback()
+            return []
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await db.execute(
+            insert(models.IncidentArchive.__table__).from_select(
+                [*_ARCHIVED_COLUMNS, "archived_at"],
+                select(*(incidents.c[name] for name in _ARCHIVED_COLUMNS), literal(now, models.IncidentArchive.archived_at.type))
+                .where(incidents.c.id.in_(ids)),
+            )
+        )
+        await db.execute(
+            insert(models.IncidentVehicleArchive.__table__).from_select(
+                ["incident_id", "vehicle_id", "name", "status"],
+                select(assignments.c.incident_id, assignments.c.vehicle_id, models.Vehicle.name, models.Vehicle.status)
+                .join(models.Vehicle, models.Vehicle.id == assignments.c.vehicle_id)
+                .where(assignments.c.incident_id.in_(ids)),
+            )
+        )
+        await db.execute(delete(assignments).where(assignments.c.incident_id.in_(ids)))
+        await db.execute(delete(incidents).where(incidents.c.id.in_(ids)))
+        for incident_id in ids:
+            await add_tombstone(db, "incident", incident_id, revision)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    for incident_id in ids:
+        representations.discard(incident_id)
+    import asyncio
+    asyncio.create_task(manager.broadcast({"type": "incidents_archived", "incident_ids": ids}))
+    return ids
+
+async def get_scheduled_activations(db: AsyncSession) -> List[tuple]:
+    """Return (id, scheduled_at) for all incidents waiting for activation.
+    Served by the (status, scheduled_at) index.
+    """
+    result = await db.execute(
+        select(models.Incident.id, models.Incident.scheduled_at)
+        .where(models.Incident.status == models.IncidentStatus.new)
+        .where(models.Incident.scheduled_at.is_not(None))
+    )
+    return [(row.id, row.scheduled_at) for row in result.all()]
+
+async def activate_incidents(
+    db: AsyncSession, incident_ids: List[int], fencing_token: Optional[int] = None
+) -> List[models.Incident]:
+    """Set all given incidents that are still 'new' to 'active' in one UPDATE and broadcast them.
+    With a fencing token, nothing is written unless this process still holds the leader lease.
+    """
+    stmt = (
+        update(models.Incident)
+        .where(models.Incident.id.in_(incident_ids))
+        .where(models.Incident.status == models.IncidentStatus.new)
+    )
+    if fencing_token is not None:
+        stmt = stmt.where(leader.fence(fencing_token))
+    try:
+        result = await db.execute(
+            stmt.values(status=models.IncidentStatus.active, revision=await next_revision(db))
+            .returning(models.Incident.id)
+        )
+        activated_ids = [row[0] for row in result.all()]
+        if not activated_ids:
+            # Nothing was still 'new': give the revision back, so ETags stay valid
+            await db.rollback()
+            return []
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    res = await db.execute(
+        select(models.Incident)
+        .options(selectinload(models.Incident.vehicles))
+        .where(models.Incident.id.in_(activated_ids))
+        .execution_options(populate_existing=True)
+    )
+    activated = list(res.scalars().all())
+    import asyncio
+    for inc in activated:
+        asyncio.create_task(manager.broadcast(_incident_event("incident_updated", inc)))
+    return activated
+
+async def get_pending_geocodes(db: AsyncSession) -> List[tuple]:
+    """Return (id, address) for open incidents whose coordinates are still pending."""
+    result = await db.execute(
+        select(models.Incident.id, models.Incident.address)
+        .where(models.Incident.status != models.IncidentStatus.closed)
+        .where(models.Incident.address != "")
+        .where(models.Incident.latitude.is_(None))
+    )
+    return [(row.id, row.address) for row in result.all()]
+
+async def apply_geocode_result(
+    db: AsyncSession,
+    incident_ids: List[int],
+    address: str,
+    latitude: Optional[float],
+    longitude: Optional[float],
+) -> List[models.Incident]:
+    """Store background geocoding results and broadcast the updated incidents.
+
+    Only incidents whose address is unchanged and whose coordinates are still pending are
+    written, so a newer address or manually entered coordinates are never overwritten.
+    """
+    if latitude is None or longitude is None:
+        return []
+    key = normalize_address(address)
+    res = await db.execute(
+        select(models.Incident.id, models.Incident.address)
+        .where(models.Incident.id.in_(incident_ids))
+    )
+    target_ids = [row.id for row in res.all() if normalize_address(row.address or "") == key]
+    if not target_ids:
+        return []
+    try:
+        result = await db.execute(
+            update(models.Incident)
+            .where(models.Incident.id.in_(target_ids))
+            .where(models.Incident.latitude.is_(None))
+            .values(latitude=latitude, longitude=longitude, revision=await next_revision(db))
+            .returning(models.Incident.id)
+        )
+        updated_ids = [row[0] for row in result.all()]
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if not updated_ids:
+        return []
+    res = await db.execute(
+        select(models.Incident)
+        .options(selectinload(models.Incident.vehicles))
+        .where(models.Incident.id.in_(updated_ids))
+        .execution_options(populate_existing=True)
+    )
+    updated = list(res.scalars().all())
+    import asyncio
+    for inc in updated:
+        asyncio.create_task(manager.broadcast(_incident_event("incident_updated", inc)))
+    return updated
@@ -1,15 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from fastapi import status as http_status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import AsyncIterator, List, Optional
+import datetime
+import json
+import os
 
 from . import crud, schemas
 from ....db.sql.connect import get_db
 from ....db.sql import models
 from ....core.security import get_current_active_admin
+from ....core.geo import NEAR_MAX_RADIUS_M
+from ....core.responses import FastJSONResponse, json_array_response
+from ..sync import crud as sync_crud
 
 router = APIRouter()
 
+def _incident_response(incident) -> Response:
+    return Response(crud.incident_json(incident), media_type="application/json")
+
+# Rows upserted per transaction by POST /bulk
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+async def _ndjson_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Yield (line number, line) from a streamed body without buffering all of it."""
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+    if buffer:
+        yield line_no + 1, buffer
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}" for err in e.errors())
+
 @router.post("/", response_model=schemas.IncidentOut)
 async def create_incident(
     incident: schemas.IncidentCreate, 
@@ -17,19 +46,187 @@ async def create_incident(
     current_admin: models.User = Depends(get_current_active_admin)
 ):
     obj = await crud.create_incident(db=db, incident=incident)
-    return schemas.IncidentOut.model_validate(obj)
+    return _incident_response(obj)
+
+@router.post("/bulk", response_model=schemas.BulkImportOut)
+async def bulk_import_incidents(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.User = Depends(get_current_active_admin)
+):
+    """Creates or updates incidents from an NDJSON body, one incident object per line.
+
+    Lines are parsed as they arrive and upserted in batches (same matching rules as
+    `POST /`). Geocoding runs in the background afterwards and clients get a single
+    `incidents_bulk` event. Returns a result for every non-empty line.
+    """
+    results: List[dict] = []
+    batch: List[tuple[int, schemas.IncidentCreate]] = []
+    counts = {"created": 0, "updated": 0, "error": 0}
+
+    async def flush():
+        try:
+            batch_results, _ = await crud.upsert_incident_batch(db, batch)
+        except Exception as e:
+            batch_results = [{"line": line, "status": "error", "error": f"batch failed: {e}"} for line, _ in batch]
+        for result in batch_results:
+            counts[result["status"]] += 1
+        results.extend(batch_results)
+        batch.clear()
+
+    async for line_no, raw in _ndjson_lines(request.stream()):
+        if not raw.strip():
+            continue
+        try:
+            batch.append((line_no, schemas.IncidentCreate.model_validate(json.loads(raw))))
+        except ValueError as e:
+            message = _validation_message(e) if isinstance(e, ValidationError) else f"invalid JSON: {e}"
+            results.append({"line": line_no, "status": "error", "error": message})
+            counts["error"] += 1
+            continue
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    if counts["created"] or counts["updated"]:
+        crud.broadcast_bulk_summary(counts["created"], counts["updated"])
+    results.sort(key=lambda r: r["line"])
+    return {"created": counts["created"], "updated": counts["updated"], "failed": counts["error"], "results": results}
 
 @router.get("/", response_model=List[schemas.IncidentOut])
-async def read_incidents(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    incidents = await crud.get_incidents(db, skip=skip, limit=limit)
-    return [schemas.IncidentOut.model_validate(i) for i in incidents]
+async def read_incidents(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[schemas.IncidentStatus] = None,
+    scheduled_from: Optional[datetime.datetime] = None,
+    scheduled_to: Optional[datetime.datetime] = None,
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    vehicle_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Lists incidents ordered by creation time.
+    If more results may follow, the `X-Next-Cursor` header holds the `cursor` for the next page.
+    Answers 304 when `If-None-Match` carries the current ETag (sync revision).
+    Archived (long closed) incidents are only included with `include_archived=true`.
+    """
+    etag = sync_crud.etag_for(await sync_crud.get_revision(db))
+    if sync_crud.is_not_modified(if_none_match, etag):
+        return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    try:
+        incidents = await crud.get_incidents(
+            db,
+            skip=skip,
+            limit=limit,
+            status=models.IncidentStatus(status.value) if status is not None else None,
+            scheduled_from=scheduled_from,
+            scheduled_to=scheduled_to,
+            created_from=created_from,
+            created_to=created_to,
+            vehicle_id=vehicle_id,
+            cursor=cursor,
+            include_archived=include_archived,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(incidents) == limit:
+        headers["X-Next-Cursor"] = crud.encode_cursor(incidents[-1])
+    # Cached per-incident JSON, joined without re-validating against the response model
+    return json_array_response((crud.incident_json(i) for i in incidents), headers=headers)
+
+@router.get("/search", response_model=List[schemas.SearchResult])
+async def search_incidents(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Full-text search in title, description and address, best match first.
+    All words of `q` must match (the last one as a prefix); case and diacritics are ignored.
+    Highlights are HTML-escaped with the matches wrapped in `<mark>`.
+    Archived incidents are only searched with `include_archived=true`.
+    """
+    try:
+        results = await crud.search_incidents(db, q, skip=skip, limit=limit, include_archived=include_archived)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(results)
+
+@router.get("/near", response_model=List[schemas.NearbyResult])
+async def read_incidents_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=NEAR_MAX_RADIUS_M),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[schemas.IncidentStatus] = None,
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Incidents within `radius_m` meters of a point, nearest first, with their distance
+    (e.g. what else happened at this address). Incidents still waiting for coordinates are
+    not included. Archived incidents only with `include_archived=true`.
+    """
+    results = await crud.get_incidents_near(
+        db,
+        lat,
+        lon,
+        radius_m,
+        limit,
+        include_archived=include_archived,
+        status=models.IncidentStatus(status.value) if status is not None else None,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return FastJSONResponse(results)
+
+@router.get("/bbox", response_model=List[schemas.IncidentOut])
+async def read_incidents_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(500, ge=1, le=5000),
+    status: Optional[schemas.IncidentStatus] = None,
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Incidents located inside a bounding box (e.g. the map viewport), newest first.
+    Archived incidents only with `include_archived=true`.
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+    incidents = await crud.get_incidents_in_bbox(
+        db,
+        min_lat,
+        min_lon,
+        max_lat,
+        max_lon,
+        limit,
+        include_archived=include_archived,
+        status=models.IncidentStatus(status.value) if status is not None else None,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return json_array_response(crud.incident_json(i) for i in incidents)
 
 @router.get("/{incident_id}", response_model=schemas.IncidentOut)
-async def read_incident(incident_id: int, db: AsyncSession = Depends(get_db)):
+async def read_incident(incident_id: int, include_archived: bool = False, db: AsyncSession = Depends(get_db)):
     db_incident = await crud.get_incident(db, incident_id=incident_id)
+    if db_incident is None and include_archived:
+        db_incident = await crud.get_archived_incident(db, incident_id=incident_id)
     if db_incident is None:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return schemas.IncidentOut.model_validate(db_incident)
+    return _incident_response(db_incident)
 
 @router.put("/{incident_id}", response_model=schemas.IncidentOut)
 async def update_incident(
@@ -41,7 +238,7 @@ async def update_incident(
     db_incident = await crud.update_incident(db, incident_id=incident_id, incident_update=incident)
     if db_incident is None:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return schemas.IncidentOut.model_validate(db_incident)
+    return _incident_response(db_incident)
 
 @router.delete("/{incident_id}", status_code=http_status.HTTP_204_NO_CONTENT)
 async def delete_incident(
@@ -136,3 +136,38 @@ class VehicleRef(BaseModel):
     status: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SearchHighlights(BaseModel):
+    """Matched fields as HTML-escaped text with the matches wrapped in <mark>; the description
+    is shortened to a snippet around the matches."""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    address: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    incident: IncidentOut
+    archived: bool
+    score: float  # bm25 relevance, higher is better
+    highlights: SearchHighlights
+
+
+class NearbyResult(BaseModel):
+    incident: IncidentOut
+    archived: bool
+    distance_m: float
+
+
+class BulkLineResult(BaseModel):
+    line: int
+    status: str  # "created" | "updated" | "error"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkImportOut(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[BulkLineResult]
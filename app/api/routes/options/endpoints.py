@@ -8,8 +8,7 @@ router = APIRouter()
 
 @router.get("/", response_model=schemas.OptionsOut)
 async def get_options_endpoint(db: AsyncSession = Depends(get_db)):
-    opts = await crud.ensure_default_options(db)
-    return schemas.OptionsOut.model_validate(opts)
+    return await crud.get_cached_options(db)
 
 @router.put("/", response_model=schemas.OptionsOut)
 async def update_options_endpoint(payload: schemas.OptionsUpdate, db: AsyncSession = Depends(get_db)):
@@ -0,0 +1,65 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.future import select
+from sqlalchemy import update
+from typing import Optional
+
+from ....db.sql import models
+
+async def get_revision(db: AsyncSession) -> int:
+    result = await db.execute(select(models.SyncState.revision).where(models.SyncState.id == 1))
+    return result.scalar() or 0
+
+async def next_revision(db: AsyncSession) -> int:
+    """Increment and return the global revision inside the caller's transaction.
+    The UPDATE takes SQLite's write lock, so revisions become visible in commit order.
+    """
+    result = await db.execute(
+        update(models.SyncState)
+        .where(models.SyncState.id == 1)
+        .values(revision=models.SyncState.revision + 1)
+        .returning(models.SyncState.revision)
+    )
+    return result.scalar_one()
+
+async def add_tombstone(db: AsyncSession, entity: str, entity_id: int, revision: int) -> None:
+    db.add(models.Tombstone(entity=entity, entity_id=entity_id, revision=revision))
+
+def etag_for(revision: int) -> str:
+    return f'W/"rev-{revision}"'
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+async def get_changes(db: AsyncSession, since: int) -> dict:
+    """Entities changed and deleted after revision `since`; `since` <= 0 returns everything.
+    Clients should apply deletions before upserts (SQLite may reuse the id of a deleted row).
+    """
+    revision = await get_revision(db)
+    changes = {
+        "revision": revision,
+        "incidents": [],
+        "vehicles": [],
+        "deleted_incidents": [],
+        "deleted_vehicles": [],
+    }
+    if since >= revision:
+        return changes
+
+    incidents_stmt = select(models.Incident).options(selectinload(models.Incident.vehicles))
+    vehicles_stmt = select(models.Vehicle)
+    if since > 0:
+        incidents_stmt = incidents_stmt.where(models.Incident.revision > since)
+        vehicles_stmt = vehicles_stmt.where(models.Vehicle.revision > since)
+        tombstones = await db.execute(
+            select(models.Tombstone.entity, models.Tombstone.entity_id)
+            .where(models.Tombstone.revision > since)
+            .order_by(models.Tombstone.revision)
+        )
+        for entity, entity_id in tombstones.all():
+            changes[f"deleted_{entity}s"].append(entity_id)
+    changes["incidents"] = list((await db.execute(incidents_stmt)).scalars().all())
+    changes["vehicles"] = list((await db.execute(vehicles_stmt)).scalars().all())
+    return changes
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Header, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from . import crud, schemas
+from ..incidents.crud import representations
+from ..vehicles import schemas as vehicle_schemas
+from ....db.sql.connect import get_db
+from ....core.responses import FastJSONResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.SyncOut)
+async def read_changes(
+    since: int = 0,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns incidents and vehicles changed after revision `since` plus the ids deleted since then.
+    Clients keep the returned `revision` and pass it as `since` on their next call.
+    """
+    revision = await crud.get_revision(db)
+    etag = crud.etag_for(revision)
+    if crud.is_not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    changes = await crud.get_changes(db, since)
+    changes["incidents"] = [representations.as_dict(i) for i in changes["incidents"]]
+    changes["vehicles"] = [vehicle_schemas.Vehicle.model_validate(v).model_dump() for v in changes["vehicles"]]
+    return FastJSONResponse(changes, headers={"ETag": crud.etag_for(changes["revision"])})
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+from ..incidents.schemas import IncidentOut
+from ..vehicles.schemas import Vehicle
+
+class SyncOut(BaseModel):
+    revision: int
+    incidents: List[IncidentOut] = []
+    vehicles: List[Vehicle] = []
+    deleted_incidents: List[int] = []
+    deleted_vehicles: List[int] = []
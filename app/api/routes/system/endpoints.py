@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Body
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....core.websockets import manager
+from ....core.archive import archiver
+from ....core.geocoding import geocode_cache
+from ....core.leader import leader
+from ....core.positions import position_tracker
+from ....core.security import get_current_active_admin, principal_cache
+from ....db.sql import models
+from ....db.sql.connect import get_db
 
 router = APIRouter()
 
@@ -12,3 +22,60 @@ async def trigger_alarm(payload: dict = Body(...)):
     """
     await manager.broadcast({"type": "alarm", "message": payload.get("message", "Alarm!")})
     return {"status": "alarm triggered"}
+
+@router.get("/geocode-cache")
+async def read_geocode_cache(
+    limit: int = 100,
+    current_admin: models.User = Depends(get_current_active_admin)
+):
+    """Returns geocoding cache counters and the most recently stored entries."""
+    return {"stats": geocode_cache.stats(), "entries": await geocode_cache.entries(limit=limit)}
+
+@router.delete("/geocode-cache")
+async def purge_geocode_cache(
+    address: Optional[str] = None,
+    current_admin: models.User = Depends(get_current_active_admin)
+):
+    """Purges a single address (if given) or the whole geocoding cache."""
+    purged = await geocode_cache.purge(address)
+    return {"purged": purged}
+
+@router.get("/auth-cache")
+async def read_auth_cache_stats(current_admin: models.User = Depends(get_current_active_admin)):
+    """Returns hit/miss/invalidation counters of the authenticated-principal cache."""
+    return principal_cache.stats()
+
+@router.delete("/auth-cache")
+async def clear_auth_cache(current_admin: models.User = Depends(get_current_active_admin)):
+    """Forgets all cached principals, e.g. after changing users directly in the database."""
+    principal_cache.clear()
+    return {"cleared": True}
+
+@router.get("/websockets")
+async def read_websocket_stats(current_admin: models.User = Depends(get_current_active_admin)):
+    """Returns per-connection WebSocket queue depth, send counts and lag."""
+    return manager.stats()
+
+@router.get("/archive")
+async def read_archive_stats(current_admin: models.User = Depends(get_current_active_admin)):
+    """Returns the archiver's settings and counters (non-zero only in the leader process)."""
+    return archiver.stats()
+
+@router.get("/leader")
+async def read_leader_status(
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.User = Depends(get_current_active_admin),
+):
+    """Returns this process's leader election state and the current lease holder."""
+    lease = await db.get(models.Lease, leader.name)
+    return {
+        **leader.stats(),
+        "current_holder": lease.holder if lease else None,
+        "current_token": lease.token if lease else None,
+        "lease_expires_at": lease.expires_at if lease else None,
+    }
+
+@router.get("/positions")
+async def read_position_stats(current_admin: models.User = Depends(get_current_active_admin)):
+    """Returns the vehicle position tracker's counters (per process) and settings."""
+    return position_tracker.stats()
@@ -11,9 +11,17 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[mode
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
-    hashed_password = password_manager.get_password_hash(user.password)
+    hashed_password = await password_manager.hash_async(user.password)
     db_user = models.User(username=user.username, hashed_password=hashed_password, role=user.role)
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
     return db_user
+
+async def update_password_hash(db: AsyncSession, user: models.User, hashed_password: str) -> None:
+    try:
+        user.hashed_password = hashed_password
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
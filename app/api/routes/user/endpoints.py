@@ -1,23 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import crud, schemas
 from ....db.sql.connect import get_db
 from ....db.sql import models
-from ....core.security import password_manager, create_access_token, get_current_active_admin
+from ....core.security import password_manager, create_access_token, get_current_active_admin, login_throttle
 
 router = APIRouter()
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    # Behind a proxy this is the forwarded client address (see FORWARDED_ALLOW_IPS)
+    client_ip = request.client.host if request.client else None
+    retry_after = await login_throttle.check(db, form_data.username, client_ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(int(retry_after + 0.999))},
+        )
     user = await crud.get_user_by_username(db, username=form_data.username)
-    if not user or not password_manager.verify_password(form_data.password, user.hashed_password):
+    ok, new_hash = await password_manager.verify_and_update_async(
+        form_data.password, user.hashed_password if user else None
+    )
+    if not user or not ok:
+        await login_throttle.failed(db, form_data.username, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await login_throttle.succeeded(db, form_data.username, client_ip)
+    if new_hash:
+        # Hash made under an older policy (scheme or rounds): upgrade it transparently
+        await crud.update_password_hash(db, user, new_hash)
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -1,22 +1,67 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
+from sqlalchemy import case, delete, func, insert, tuple_, update
+from typing import Dict, List, Optional, Tuple
+import datetime
 
 from ....db.sql import models
 from . import schemas
 from ....core.websockets import manager
+from ....core.leader import leader
+from ..sync.crud import add_tombstone, next_revision
 
 async def get_vehicle(db: AsyncSession, vehicle_id: int) -> Optional[models.Vehicle]:
     result = await db.execute(select(models.Vehicle).filter(models.Vehicle.id == vehicle_id))
     return result.scalars().first()
 
-async def get_vehicles(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Vehicle]:
-    result = await db.execute(select(models.Vehicle).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_vehicles(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[dict]:
+    """Vehicle columns only (no ORM objects, no relationships)."""
+    result = await db.execute(
+        select(models.Vehicle.id, models.Vehicle.name, models.Vehicle.status)
+        .order_by(models.Vehicle.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+async def get_current_assignments(db: AsyncSession, vehicle_ids: List[int]) -> Dict[int, List[dict]]:
+    """Active incidents per vehicle, for the given vehicles only; closed history is never read."""
+    result = await db.execute(
+        select(
+            models.incident_vehicles.c.vehicle_id,
+            models.Incident.id,
+            models.Incident.title,
+            models.Incident.address,
+            models.Incident.status,
+        )
+        .join(models.Incident, models.Incident.id == models.incident_vehicles.c.incident_id)
+        .where(models.Incident.status == models.IncidentStatus.active)
+        .where(models.incident_vehicles.c.vehicle_id.in_(vehicle_ids))
+        .order_by(models.Incident.created_at, models.Incident.id)
+    )
+    assignments: Dict[int, List[dict]] = {vid: [] for vid in vehicle_ids}
+    for vehicle_id, incident_id, title, address, status in result.all():
+        assignments[vehicle_id].append({"id": incident_id, "title": title, "address": address, "status": status.value})
+    return assignments
+
+async def _touch_open_incidents(db: AsyncSession, vehicle_ids: List[int], revision: int) -> None:
+    """Give open incidents assigned to these vehicles the new revision: they embed the
+    vehicles' name and status, so delta sync has to send them again."""
+    await db.execute(
+        update(models.Incident)
+        .where(models.Incident.status != models.IncidentStatus.closed)
+        .where(models.Incident.id.in_(
+            select(models.incident_vehicles.c.incident_id)
+            .where(models.incident_vehicles.c.vehicle_id.in_(vehicle_ids))
+        ))
+        .values(revision=revision)
+        .execution_options(synchronize_session=False)
+    )
 
 async def create_vehicle(db: AsyncSession, vehicle: schemas.VehicleCreate) -> models.Vehicle:
     try:
         db_vehicle = models.Vehicle(**vehicle.dict())
+        db_vehicle.revision = await next_revision(db)
         db.add(db_vehicle)
         await db.commit()
         await db.refresh(db_vehicle)
@@ -38,6 +83,8 @@ async def update_vehicle(db: AsyncSession, vehicle_id: int, vehicle_update: sche
             update_data = vehicle_update.dict(exclude_unset=True)
             for key, value in update_data.items():
                 setattr(db_vehicle, key, value)
+            db_vehicle.revision = await next_revision(db)
+            await _touch_open_incidents(db, [db_vehicle.id], db_vehicle.revision)
             await db.commit()
             await db.refresh(db_vehicle)
             # Create a new task for the broadcast to avoid blocking
@@ -51,12 +98,67 @@ async def update_vehicle(db: AsyncSession, vehicle_id: int, vehicle_update: sche
         await db.rollback()
         raise e
 
+async def update_vehicle_statuses(
+    db: AsyncSession, statuses: Dict[int, int]
+) -> Tuple[List[schemas.Vehicle], List[int]]:
+    """Apply many status changes with a single UPDATE and broadcast one `vehicles_updated`
+    event with the vehicles whose status actually changed.
+    Returns (changed vehicles, ids that do not exist).
+    """
+    try:
+        result = await db.execute(select(models.Vehicle).where(models.Vehicle.id.in_(statuses)))
+        found = {v.id: v for v in result.scalars().all()}
+        not_found = sorted(set(statuses) - set(found))
+        changed = {vid: status for vid, status in statuses.items() if vid in found and found[vid].status != status}
+        if not changed:
+            return [], not_found
+        vehicles = [
+            schemas.Vehicle(id=vid, name=found[vid].name, status=status)
+            for vid, status in sorted(changed.items())
+        ]
+        revision = await next_revision(db)
+        await db.execute(
+            update(models.Vehicle)
+            .where(models.Vehicle.id.in_(changed))
+            .values(status=case(changed, value=models.Vehicle.id), revision=revision)
+            .execution_options(synchronize_session=False)
+        )
+        await _touch_open_incidents(db, list(changed), revision)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    import asyncio
+    asyncio.create_task(manager.broadcast({
+        "type": "vehicles_updated",
+        "vehicles": [v.model_dump() for v in vehicles]
+    }))
+    return vehicles, not_found
+
 async def delete_vehicle(db: AsyncSession, vehicle_id: int) -> Optional[models.Vehicle]:
     try:
         db_vehicle = await get_vehicle(db, vehicle_id)
         if db_vehicle:
             vehicle_id = db_vehicle.id
+            revision = await next_revision(db)
+            # Incidents lose this vehicle from their list, so they changed as well
+            await db.execute(
+                update(models.Incident)
+                .where(models.Incident.id.in_(
+                    select(models.incident_vehicles.c.incident_id)
+                    .where(models.incident_vehicles.c.vehicle_id == vehicle_id)
+                ))
+                .values(revision=revision)
+            )
+            # Vehicle.incidents is never loaded, so drop the assignments here
+            await db.execute(
+                delete(models.incident_vehicles).where(models.incident_vehicles.c.vehicle_id == vehicle_id)
+            )
+            await db.execute(
+                delete(models.VehiclePosition).where(models.VehiclePosition.vehicle_id == vehicle_id)
+            )
             await db.delete(db_vehicle)
+            await add_tombstone(db, "vehicle", vehicle_id, revision)
             await db.commit()
             # Create a new task for the broadcast to avoid blocking
             import asyncio
@@ -68,3 +170,100 @@ async def delete_vehicle(db: AsyncSession, vehicle_id: int) -> Optional[models.V
     except Exception as e:
         await db.rollback()
         raise e
+
+def _utc_naive(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """Convert a datetime to naive UTC, the form SQLite stores datetimes in."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+async def get_vehicle_roster(db: AsyncSession) -> List[tuple]:
+    """(id, name, status) of every vehicle, for the in-memory position tracker."""
+    result = await db.execute(select(models.Vehicle.id, models.Vehicle.name, models.Vehicle.status))
+    return [tuple(row) for row in result.all()]
+
+async def get_latest_positions(db: AsyncSession, since: datetime.datetime) -> List[models.VehiclePosition]:
+    """The last stored position of each vehicle, for vehicles with one recorded since `since`.
+    Served by the (vehicle_id, recorded_at) index.
+    """
+    positions = models.VehiclePosition
+    since = _utc_naive(since)
+    latest = (
+        select(positions.vehicle_id, func.max(positions.recorded_at))
+        .where(positions.recorded_at >= since)
+        .group_by(positions.vehicle_id)
+    )
+    result = await db.execute(
+        select(positions)
+        .where(positions.recorded_at >= since)
+        .where(tuple_(positions.vehicle_id, positions.recorded_at).in_(latest))
+        .order_by(positions.vehicle_id, positions.id)
+    )
+    # Two fixes with the same timestamp: keep the one stored last
+    return list({p.vehicle_id: p for p in result.scalars().all()}.values())
+
+async def add_position_history(db: AsyncSession, rows: List[tuple]) -> None:
+    """Store (vehicle_id, latitude, longitude, speed, heading, recorded_at) rows in one
+    executemany INSERT. Rows of vehicles deleted in the meantime are skipped."""
+    try:
+        existing = set((await db.execute(
+            select(models.Vehicle.id).where(models.Vehicle.id.in_({row[0] for row in rows}))
+        )).scalars().all())
+        values = [
+            {
+                "vehicle_id": vehicle_id, "latitude": latitude, "longitude": longitude,
+                "speed": speed, "heading": heading, "recorded_at": _utc_naive(recorded_at),
+            }
+            for vehicle_id, latitude, longitude, speed, heading, recorded_at in rows
+            if vehicle_id in existing
+        ]
+        if values:
+            await db.execute(insert(models.VehiclePosition), values)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def get_position_history(
+    db: AsyncSession,
+    vehicle_id: int,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = 1000,
+) -> List[models.VehiclePosition]:
+    """Stored positions of one vehicle, oldest first (the most recent `limit` in the range)."""
+    positions = models.VehiclePosition
+    stmt = select(positions).where(positions.vehicle_id == vehicle_id)
+    if since is not None:
+        stmt = stmt.where(positions.recorded_at >= _utc_naive(since))
+    if until is not None:
+        stmt = stmt.where(positions.recorded_at < _utc_naive(until))
+    result = await db.execute(stmt.order_by(positions.recorded_at.desc(), positions.id.desc()).limit(limit))
+    return list(reversed(result.scalars().all()))
+
+async def prune_position_history(
+    db: AsyncSession, before: datetime.datetime, limit: int, fencing_token: Optional[int] = None
+) -> int:
+    """Delete up to `limit` stored positions recorded before `before`. Returns the number deleted.
+    With a fencing token, nothing is deleted unless this process still holds the leader lease.
+    """
+    positions = models.VehiclePosition
+    ids = select(positions.id).where(positions.recorded_at < _utc_naive(before)).order_by(positions.recorded_at).limit(limit)
+    stmt = delete(positions).where(positions.id.in_(ids))
+    if fencing_token is not None:
+        stmt = stmt.where(leader.fence(fencing_token))
+    try:
+        result = await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return result.rowcount
+
+async def get_incident_location(db: AsyncSession, incident_id: int) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """(latitude, longitude) of a live incident, or None if it does not exist."""
+    result = await db.execute(
+        select(models.Incident.latitude, models.Incident.longitude).where(models.Incident.id == incident_id)
+    )
+    row = result.first()
+    return None if row is None else (row.latitude, row.longitude)
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+import datetime
 
 from . import crud, schemas
 from ....db.sql.connect import get_db
 from ....db.sql import models
 from ....core.security import get_current_active_admin
+from ....core.positions import AVAILABLE_STATUSES, POSITION_MAX_AGE, position_tracker
+from ..sync import crud as sync_crud
 
 router = APIRouter()
 
+# Optional expansions for GET endpoints (?include=a,b)
+INCLUDES = {"current_incidents"}
+
+def parse_include(include: Optional[str] = Query(
+    None, description="Comma-separated expansions: current_incidents (active incidents the vehicle is assigned to)"
+)) -> set:
+    requested = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = requested - INCLUDES
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return requested
+
 @router.post("/", response_model=schemas.Vehicle)
 async def create_vehicle(
     vehicle: schemas.VehicleCreate, 
@@ -17,17 +32,112 @@ async def create_vehicle(
 ):
     return await crud.create_vehicle(db=db, vehicle=vehicle)
 
-@router.get("/", response_model=List[schemas.Vehicle])
-async def read_vehicles(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=List[schemas.VehicleOut], response_model_exclude_unset=True)
+async def read_vehicles(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    include: set = Depends(parse_include),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Lists vehicles. `?include=current_incidents` adds the active incidents each is assigned to."""
+    etag = sync_crud.etag_for(await sync_crud.get_revision(db))
+    if sync_crud.is_not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     vehicles = await crud.get_vehicles(db, skip=skip, limit=limit)
+    if "current_incidents" in include and vehicles:
+        assignments = await crud.get_current_assignments(db, [v["id"] for v in vehicles])
+        for vehicle in vehicles:
+            vehicle["current_incidents"] = assignments[vehicle["id"]]
     return vehicles
 
-@router.get("/{vehicle_id}", response_model=schemas.Vehicle)
-async def read_vehicle(vehicle_id: int, db: AsyncSession = Depends(get_db)):
+@router.patch("/status", response_model=schemas.VehicleStatusBulkOut)
+async def update_vehicle_statuses(
+    changes: List[schemas.VehicleStatusChange],
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.User = Depends(get_current_active_admin)
+):
+    """Sets the status of many vehicles at once (e.g. the wave of FMS changes after an alarm).
+    For repeated ids the last entry wins. Clients receive a single `vehicles_updated` event
+    with the vehicles that changed.
+    """
+    statuses = {change.id: change.status for change in changes}
+    updated, not_found = await crud.update_vehicle_statuses(db, statuses)
+    return {"updated": updated, "not_found": not_found}
+
+@router.post("/positions", response_model=schemas.PositionIngestOut)
+async def ingest_positions(
+    fixes: List[schemas.PositionFix],
+    current_admin: models.User = Depends(get_current_active_admin)
+):
+    """Takes a batch of GPS fixes (oldest first). Nothing is written per fix: positions are
+    kept in memory, broadcast as one `vehicle_positions` event per interval and stored
+    downsampled (see core/positions.py). Units that report every second should rather
+    stream to /ws/positions.
+    """
+    counts = {"accepted": 0, "stale": 0, "unknown": 0}
+    for fix in fixes:
+        counts[position_tracker.ingest(
+            fix.vehicle_id, fix.latitude, fix.longitude, fix.recorded_at, fix.speed, fix.heading
+        )] += 1
+    return counts
+
+@router.get("/positions", response_model=List[schemas.VehiclePositionOut])
+async def read_positions(max_age: Optional[float] = Query(None, gt=0, description="Only fixes from the last max_age seconds")):
+    """Latest known position of every vehicle, from memory."""
+    return position_tracker.positions(max_age)
+
+@router.get("/nearest", response_model=List[schemas.NearestVehicle])
+async def read_nearest_vehicles(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    incident_id: Optional[int] = Query(None, description="Use the location of this incident instead of lat/lon"),
+    limit: int = Query(5, ge=1, le=50),
+    status: List[int] = Query(sorted(AVAILABLE_STATUSES), description="Vehicle statuses to consider"),
+    max_age: float = Query(POSITION_MAX_AGE, gt=0, description="Ignore fixes older than this (seconds)"),
+    max_distance_m: Optional[float] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Vehicles with one of the given statuses (default: available) closest to a point or an
+    incident, by straight-line distance from their latest position. Served from memory; only
+    an incident location is read from the database.
+    """
+    if incident_id is not None:
+        location = await crud.get_incident_location(db, incident_id)
+        if location is None:
+            raise HTTPException(status_code=404, detail="Incident not found")
+        lat, lon = location
+        if lat is None or lon is None:
+            raise HTTPException(status_code=400, detail="Incident has no coordinates")
+    elif lat is None or lon is None:
+        raise HTTPException(status_code=400, detail="Pass lat and lon, or incident_id")
+    return position_tracker.nearest(lat, lon, limit, status, max_age, max_distance_m)
+
+@router.get("/{vehicle_id}", response_model=schemas.VehicleOut, response_model_exclude_unset=True)
+async def read_vehicle(vehicle_id: int, include: set = Depends(parse_include), db: AsyncSession = Depends(get_db)):
     db_vehicle = await crud.get_vehicle(db, vehicle_id=vehicle_id)
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
-    return db_vehicle
+    vehicle = {"id": db_vehicle.id, "name": db_vehicle.name, "status": db_vehicle.status}
+    if "current_incidents" in include:
+        vehicle["current_incidents"] = (await crud.get_current_assignments(db, [db_vehicle.id]))[db_vehicle.id]
+    return vehicle
+
+@router.get("/{vehicle_id}/positions", response_model=List[schemas.VehiclePositionOut])
+async def read_position_history(
+    vehicle_id: int,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stored (downsampled) track of a vehicle, oldest first."""
+    if await crud.get_vehicle(db, vehicle_id=vehicle_id) is None:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return await crud.get_position_history(db, vehicle_id, since, until, limit)
 
 @router.put("/{vehicle_id}", response_model=schemas.Vehicle)
 async def update_vehicle(
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional
+from typing import List, Optional
+import datetime
 
 ALLOWED_STATUS_VALUES = {1, 2, 3, 4, 6}
 
@@ -50,3 +51,61 @@ class Vehicle(VehicleBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+class IncidentAssignment(BaseModel):
+    id: int
+    title: str
+    address: Optional[str] = None
+    status: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class VehicleOut(Vehicle):
+    # Only present when requested with ?include=current_incidents
+    current_incidents: Optional[List[IncidentAssignment]] = None
+
+class VehicleStatusChange(BaseModel):
+    id: int
+    status: int
+
+    @field_validator("status")
+    @classmethod
+    def status_allowed(cls, v: int) -> int:
+        if v not in ALLOWED_STATUS_VALUES:
+            raise ValueError("status must be one of {1,2,3,4,6}")
+        return v
+
+class VehicleStatusBulkOut(BaseModel):
+    updated: List[Vehicle]
+    not_found: List[int]
+
+class PositionFix(BaseModel):
+    """One GPS fix as reported by a vehicle unit. Without recorded_at the time of receipt is used;
+    timestamps without a time zone are UTC."""
+    vehicle_id: int
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    recorded_at: Optional[datetime.datetime] = None
+    speed: Optional[float] = Field(None, ge=0, description="m/s")
+    heading: Optional[float] = Field(None, ge=0, le=360, description="degrees from north")
+
+class PositionIngestOut(BaseModel):
+    accepted: int
+    # Not newer than the vehicle's latest fix
+    stale: int
+    # No such vehicle
+    unknown: int
+
+class VehiclePositionOut(BaseModel):
+    vehicle_id: int
+    latitude: float
+    longitude: float
+    recorded_at: datetime.datetime
+    speed: Optional[float] = None
+    heading: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class NearestVehicle(VehiclePositionOut):
+    vehicle: Vehicle
+    distance_m: float
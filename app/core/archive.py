@@ -0,0 +1,79 @@
+"""Moves long-closed incidents out of the live tables.
+
+The dashboard, the activation scheduler and delta sync only ever query `incidents` and
+`incident_vehicles`; without archiving both grow with the station's whole history. In the
+leader process, the archiver periodically moves incidents closed more than
+ARCHIVE_AFTER_DAYS ago to `incidents_archive` / `incident_vehicles_archive`, in batches of
+ARCHIVE_BATCH_SIZE (one short write transaction each), so the live tables and their
+indexes stay small. The read API includes archived incidents on request
+(`?include_archived=true`).
+"""
+import asyncio
+import datetime
+import os
+from typing import Awaitable, Callable, Optional
+
+# Incidents closed longer than this are archived
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# Seconds between archive runs (0 disables archiving)
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+# Incidents moved per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Pause between batches so other writers get the SQLite write lock
+ARCHIVE_BATCH_PAUSE = 0.05
+
+# archive_batch(closed_before, limit) -> number of incidents moved
+ArchiveBatch = Callable[[datetime.datetime, int], Awaitable[int]]
+
+
+class Archiver:
+    def __init__(self):
+        self.archived = 0
+        self.runs = 0
+        self.last_run: Optional[datetime.datetime] = None
+        self.last_error: Optional[str] = None
+
+    async def run(self, archive_batch: ArchiveBatch) -> None:
+        """Archive every ARCHIVE_INTERVAL seconds until cancelled."""
+        if ARCHIVE_INTERVAL <= 0:
+            return
+        while True:
+            try:
+                await self.run_once(archive_batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                print("archive error:", e)
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+
+    async def run_once(self, archive_batch: ArchiveBatch) -> int:
+        """Move all incidents that are due, batch by batch. Returns how many were moved."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        closed_before = now - datetime.timedelta(days=ARCHIVE_AFTER_DAYS)
+        total = 0
+        while True:
+            moved = await archive_batch(closed_before, ARCHIVE_BATCH_SIZE)
+            total += moved
+            self.archived += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                break
+            await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
+        self.runs += 1
+        self.last_run = now
+        self.last_error = None
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "archive_after_days": ARCHIVE_AFTER_DAYS,
+            "interval": ARCHIVE_INTERVAL,
+            "batch_size": ARCHIVE_BATCH_SIZE,
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+archiver = Archiver()
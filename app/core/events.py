@@ -0,0 +1,376 @@
+"""Pub/sub layer under ConnectionManager.broadcast.
+
+Each process delivers events to its own WebSockets. The bus makes sure an event published
+in one process reaches every process:
+
+- "inprocess" (default): single process, events are delivered directly.
+- "unix": no external service. Every process binds a datagram socket in EVENT_BUS_PATH
+  and sends each event to all peer sockets found there. Events larger than
+  EVENT_BUS_MAX_DATAGRAM are sent as fragments and reassembled by the receiver. A peer
+  that misses an event (full receive buffer) gets a `resync_required` notice instead, so
+  its clients catch up via /api/sync.
+- "redis": Redis (or compatible) pub/sub on REDIS_URL; requires the `redis` package. The
+  subscription is re-established after a lost connection and local clients resync.
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+EVENT_BUS = os.getenv("EVENT_BUS", "inprocess").lower()
+EVENT_BUS_PATH = os.getenv("EVENT_BUS_PATH", "./data/bus")
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "feuerwehr-melder:events")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Largest datagram sent by the unix bus; larger events are fragmented (macOS allows only
+# 2048 bytes by default, see sysctl net.local.dgram.maxdgram)
+EVENT_BUS_MAX_DATAGRAM = int(os.getenv("EVENT_BUS_MAX_DATAGRAM", "65536"))
+# How long a send waits for a peer whose queue is full (net.unix.max_dgram_qlen datagrams,
+# often only 10) before the peer is told to resync instead (seconds)
+EVENT_BUS_SEND_WAIT = float(os.getenv("EVENT_BUS_SEND_WAIT", "0.2"))
+# Partially received fragmented events kept per process
+EVENT_BUS_MAX_PARTIAL = 64
+# Delay before resubscribing after the Redis connection dropped, doubled per failed attempt
+REDIS_RECONNECT_DELAY = 1.0
+REDIS_RECONNECT_MAX_DELAY = 30.0
+
+# Fragment datagram: marker, 32 hex digits event id, 4 digits index, 4 digits count, payload.
+# Whole events are JSON objects and always start with "{".
+_FRAGMENT = b"\x1f"
+_FRAGMENT_HEADER = len(_FRAGMENT) + 32 + 8
+# Sent to a peer that missed an event
+_RESYNC = json.dumps({"type": "resync_required"}).encode()
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+
+class EventBus:
+    """Base bus: delivers published events to the local process only."""
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+        self.published = 0
+        self.received = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, message: dict) -> None:
+        self.published += 1
+        if self.deliver is not None:
+            await self.deliver(message)
+
+    def stats(self) -> dict:
+        return {"backend": "inprocess", "published": self.published, "received": self.received}
+
+
+class InProcessBus(EventBus):
+    pass
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, bus: "UnixSocketBus"):
+        self.bus = bus
+        # event id -> fragments received so far (oldest first)
+        self.partial: "OrderedDict[bytes, Dict[int, bytes]]" = OrderedDict()
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if data.startswith(_FRAGMENT):
+            data = self._reassemble(data)
+            if data is None:
+                return
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        self.bus.received += 1
+        if self.bus.deliver is not None:
+            asyncio.create_task(self.bus.deliver(message))
+
+    def _reassemble(self, data: bytes) -> Optional[bytes]:
+        event_id = data[1:33]
+        index, count = int(data[33:37]), int(data[37:41])
+        fragments = self.partial.setdefault(event_id, {})
+        fragments[index] = data[_FRAGMENT_HEADER:]
+        if len(fragments) < count:
+            if len(self.partial) > EVENT_BUS_MAX_PARTIAL:
+                # Fragments lost on the way never complete; the sender notifies us to resync
+                self.partial.popitem(last=False)
+                self.bus.incomplete += 1
+            return None
+        del self.partial[event_id]
+        return b"".join(fragments[i] for i in range(count))
+
+
+class UnixSocketBus(EventBus):
+    """Broker-less bus: one datagram socket per process in a shared directory."""
+
+    def __init__(self, path: str = EVENT_BUS_PATH):
+        super().__init__()
+        self.path = path
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        self.address = os.path.join(path, self.name)
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.sender: Optional[socket.socket] = None
+        self.send_errors = 0
+        self.fragmented = 0
+        self.incomplete = 0
+        self.resyncs_sent = 0
+        # Peers that missed an event and still have to be told to resync
+        self.behind: Set[str] = set()
+        self._resync_retry: Optional[asyncio.TimerHandle] = None
+        # Keeps events in order while a send waits for a busy peer
+        self._send_lock = asyncio.Lock()
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        os.makedirs(self.path, exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.address)
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramProtocol(self), sock=sock)
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sender.setblocking(False)
+
+    async def stop(self) -> None:
+        if self._resync_retry is not None:
+            self._resync_retry.cancel()
+            self._resync_retry = None
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.sender is not None:
+            self.sender.close()
+            self.sender = None
+        try:
+            os.unlink(self.address)
+        except OSError:
+            pass
+
+    async def publish(self, message: dict) -> None:
+        # Local clients first, then peers
+        await super().publish(message)
+        if self.sender is None:
+            return
+        datagrams = self._datagrams(json.dumps(message, separators=(",", ":"), default=str).encode())
+        try:
+            peers = [n for n in os.listdir(self.path) if n.endswith(".sock") and n != self.name]
+        except OSError:
+            return
+        async with self._send_lock:
+            await self._notify_behind()
+            for name in peers:
+                peer = os.path.join(self.path, name)
+                if peer in self.behind:
+                    # Still waiting for its resync notice; the peer catches up from the database
+                    continue
+                await self._send(peer, datagrams)
+
+    def _datagrams(self, data: bytes) -> List[bytes]:
+        if len(data) <= EVENT_BUS_MAX_DATAGRAM:
+            return [data]
+        size = EVENT_BUS_MAX_DATAGRAM - _FRAGMENT_HEADER
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        self.fragmented += 1
+        event_id = uuid.uuid4().hex.encode()
+        return [
+            _FRAGMENT + event_id + b"%04d%04d" % (index, len(chunks)) + chunk
+            for index, chunk in enumerate(chunks)
+        ]
+
+    async def _send(self, peer: str, datagrams: List[bytes]) -> bool:
+        waited = 0.0
+        for datagram in datagrams:
+            while True:
+                if self.sender is None:
+                    return False
+                try:
+                    self.sender.sendto(datagram, peer)
+                    break
+                except BlockingIOError as e:
+                    # Peer's queue is full: give it a moment to read
+                    if waited >= EVENT_BUS_SEND_WAIT:
+                        return self._missed(peer, e)
+                    await asyncio.sleep(0.005)
+                    waited += 0.005
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Socket file left behind by a dead process
+                    self.behind.discard(peer)
+                    try:
+                        os.unlink(peer)
+                    except OSError:
+                        pass
+                    return False
+                except OSError as e:
+                    # E.g. a datagram above the system limit
+                    return self._missed(peer, e)
+        return True
+
+    def _missed(self, peer: str, error: OSError) -> bool:
+        """The peer missed an event: remember to send it a resync notice."""
+        self.send_errors += 1
+        if peer not in self.behind:
+            print("event bus send failed, peer will resync:", peer, error)
+            self.behind.add(peer)
+        self._schedule_resync()
+        return False
+
+    async def _notify_behind(self) -> None:
+        for peer in list(self.behind):
+            if await self._send(peer, [_RESYNC]):
+                self.behind.discard(peer)
+                self.resyncs_sent += 1
+
+    async def _retry_resync(self) -> None:
+        async with self._send_lock:
+            await self._notify_behind()
+
+    def _schedule_resync(self) -> None:
+        if self._resync_retry is None:
+            def retry():
+                self._resync_retry = None
+                if self.sender is not None:
+                    asyncio.create_task(self._retry_resync())
+            self._resync_retry = asyncio.get_running_loop().call_later(0.1, retry)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(), "backend": "unix", "address": self.address, "send_errors": self.send_errors,
+            "fragmented": self.fragmented, "incomplete": self.incomplete, "resyncs_sent": self.resyncs_sent,
+            "peers_behind": len(self.behind),
+        }
+
+
+class RedisBus(EventBus):
+    """Redis pub/sub; every process (including the publisher) receives via the subscription.
+
+    Pub/sub does not keep messages: after a lost connection or a failed publish, local
+    clients get a `resync_required` notice, and the other processes get one over the
+    channel once publishing works again."""
+
+    def __init__(self, url: str = REDIS_URL, channel: str = EVENT_BUS_CHANNEL):
+        super().__init__()
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("EVENT_BUS=redis requires the 'redis' package (pip install redis)") from e
+        self.client = redis_asyncio.from_url(url)
+        self.channel = channel
+        self.pubsub = None
+        self.task: Optional[asyncio.Task] = None
+        self.reconnects = 0
+        self.connection_errors = 0
+        self.publish_errors = 0
+        self.resyncs = 0
+        # A publish failed: the other processes missed the event and must be told to resync
+        self.peers_behind = False
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        await self._subscribe()
+        self.task = asyncio.create_task(self._reader())
+
+    async def _subscribe(self) -> None:
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(self.channel)
+
+    async def _close_pubsub(self) -> None:
+        pubsub, self.pubsub = self.pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def _reader(self) -> None:
+        delay = REDIS_RECONNECT_DELAY
+        while True:
+            try:
+                if self.pubsub is None:
+                    await self._subscribe()
+                    self.reconnects += 1
+                    delay = REDIS_RECONNECT_DELAY
+                    print("event bus reconnected to redis")
+                    # Whatever was published meanwhile is lost
+                    await self._resync()
+                    await self._notify_peers()
+                async for item in self.pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    try:
+                        message = json.loads(item["data"])
+                    except ValueError:
+                        continue
+                    self.received += 1
+                    try:
+                        await self.deliver(message)
+                    except Exception as e:
+                        print("event bus deliver failed:", e)
+                raise ConnectionError("subscription ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connection_errors += 1
+                print(f"event bus redis connection lost, retrying in {delay:.0f}s:", e)
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(REDIS_RECONNECT_MAX_DELAY, delay * 2)
+
+    async def _resync(self) -> None:
+        """Tell the local clients (and listeners) that events were missed."""
+        self.resyncs += 1
+        try:
+            await self.deliver({"type": "resync_required"})
+        except Exception as e:
+            print("event bus deliver failed:", e)
+
+    async def _notify_peers(self) -> None:
+        if self.peers_behind:
+            try:
+                await self.client.publish(self.channel, _RESYNC)
+            except Exception:
+                return
+            self.peers_behind = False
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+        if self.pubsub is not None:
+            try:
+                await self.pubsub.unsubscribe(self.channel)
+            except Exception:
+                pass
+            await self._close_pubsub()
+        await self.client.aclose()
+
+    async def publish(self, message: dict) -> None:
+        self.published += 1
+        try:
+            await self._notify_peers()
+            await self.client.publish(self.channel, json.dumps(message, separators=(",", ":"), default=str))
+        except Exception as e:
+            # Callers broadcast fire-and-forget: nobody else would notice the lost event
+            self.publish_errors += 1
+            print("event bus publish failed, clients will resync:", e)
+            self.peers_behind = True
+            await self._resync()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(), "backend": "redis", "channel": self.channel, "connected": self.pubsub is not None,
+            "reconnects": self.reconnects, "connection_errors": self.connection_errors,
+            "publish_errors": self.publish_errors, "resyncs": self.resyncs, "peers_behind": self.peers_behind,
+        }
+
+
+def create_event_bus(backend: str = EVENT_BUS) -> EventBus:
+    if backend == "unix":
+        return UnixSocketBus()
+    if backend == "redis":
+        return RedisBus()
+    return InProcessBus()
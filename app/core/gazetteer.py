@@ -0,0 +1,297 @@
+"""Offline address gazetteer used by the local geocoding backend.
+
+Addresses are imported from a CSV extract (e.g. exported from OSM with osmium/ogr2ogr)
+into the `address_points` table and looked up with a plain synchronous sqlite3
+connection, which keeps a lookup well below a millisecond.
+
+Usage:
+    python -m app.core.gazetteer import addresses.csv [--replace]
+    python -m app.core.gazetteer lookup "Hauptstraße 12, Musterstadt"
+    python -m app.core.gazetteer bench [--samples 200] [--remote 5]
+"""
+import argparse
+import asyncio
+import csv
+import os
+import re
+import sqlite3
+import statistics
+import time
+import unicodedata
+from typing import Iterable, Iterator, Optional
+
+from ..db.sql.connect import engine
+
+# Accepted CSV header names per field (first match wins)
+CSV_COLUMNS = {
+    "street": ("street", "addr:street", "strasse"),
+    "housenumber": ("housenumber", "addr:housenumber", "hausnummer", "number"),
+    "postcode": ("postcode", "addr:postcode", "plz"),
+    "town": ("town", "city", "addr:city", "ort", "place"),
+    "latitude": ("lat", "latitude", "y"),
+    "longitude": ("lon", "lng", "longitude", "x"),
+}
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+_STREET_SUFFIX_RE = re.compile(r"\s?(strasse|str)\b")
+_HOUSENUMBER_RE = re.compile(r"^(?P<street>.*?)\s+(?P<number>\d+\s*[a-zA-Z]?(?:\s*[-/]\s*\d+\s*[a-zA-Z]?)?)$")
+_POSTCODE_RE = re.compile(r"^\d{4,5}\s+")
+
+
+def normalize_token(value: Optional[str]) -> str:
+    """Casefold, fold ß/umlaut variants, drop punctuation and unify 'straße'/'str.'."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", value).casefold()
+    value = value.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue")
+    value = _PUNCT_RE.sub(" ", value)
+    value = _WS_RE.sub(" ", value).strip()
+    return _STREET_SUFFIX_RE.sub("str", value)
+
+
+def normalize_housenumber(value: Optional[str]) -> str:
+    return re.sub(r"\s+", "", (value or "").casefold())
+
+
+def parse_address(address: str) -> tuple[str, str, str]:
+    """Split a free-form address into normalized (street, housenumber, town).
+
+    Handles the usual 'Street 12a, 12345 Town' layout; any part may come back empty.
+    """
+    parts = [p.strip() for p in address.split(",") if p.strip()]
+    if not parts:
+        return "", "", ""
+    street_part = parts[0]
+    town_part = parts[-1] if len(parts) > 1 else ""
+    town_part = _POSTCODE_RE.sub("", town_part)
+    number = ""
+    m = _HOUSENUMBER_RE.match(street_part)
+    if m:
+        street_part, number = m.group("street"), m.group("number")
+    return normalize_token(street_part), normalize_housenumber(number), normalize_token(town_part)
+
+
+def database_path() -> str:
+    return engine.url.database
+
+
+class LocalGeocoder:
+    """Synchronous, read-only lookups against the imported `address_points` table."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or database_path()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                return None
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def lookup(self, address: str) -> Optional[tuple[float, float]]:
+        """Resolve an address to (lat, lon), or None if the gazetteer has no match.
+
+        Tries, in order: exact street+number(+town), street prefix+number(+town), and
+        finally the street itself (first known point) when no house number matches.
+        """
+        street, number, town = parse_address(address)
+        if not street:
+            return None
+        conn = self._connection()
+        if conn is None:
+            return None
+        town_clause = " AND town_norm = ?" if town else ""
+        town_args = (town,) if town else ()
+        prefix_args = (street, street + "\uffff")
+        queries = []
+        if number:
+            queries.append((
+                "SELECT latitude, longitude FROM address_points"
+                " WHERE street_norm = ? AND housenumber_norm = ?" + town_clause + " LIMIT 1",
+                (street, number) + town_args,
+            ))
+            queries.append((
+                "SELECT latitude, longitude FROM address_points"
+                " WHERE street_norm >= ? AND street_norm < ? AND housenumber_norm = ?" + town_clause + " LIMIT 1",
+                prefix_args + (number,) + town_args,
+            ))
+        queries.append((
+            "SELECT latitude, longitude FROM address_points"
+            " WHERE street_norm = ?" + town_clause + " LIMIT 1",
+            (street,) + town_args,
+        ))
+        try:
+            for sql, args in queries:
+                row = conn.execute(sql, args).fetchone()
+                if row is not None:
+                    return float(row[0]), float(row[1])
+        except sqlite3.OperationalError:
+            # Gazetteer table not created/imported yet
+            return None
+        return None
+
+
+local_geocoder = LocalGeocoder()
+
+
+def _pick(header: list[str], field: str) -> Optional[int]:
+    lowered = [h.strip().casefold() for h in header]
+    for name in CSV_COLUMNS[field]:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+def read_csv(path: str) -> Iterator[tuple]:
+    """Yield address_points rows from a CSV extract; rows without street or coordinates are skipped."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        reader = csv.reader(fh, dialect)
+        header = next(reader)
+        idx = {field: _pick(header, field) for field in CSV_COLUMNS}
+        for field in ("street", "latitude", "longitude"):
+            if idx[field] is None:
+                raise ValueError(f"CSV is missing a '{field}' column (accepted: {', '.join(CSV_COLUMNS[field])})")
+
+        def col(row, field):
+            i = idx[field]
+            return row[i].strip() if i is not None and i < len(row) else ""
+
+        for row in reader:
+            street = col(row, "street")
+            try:
+                lat, lon = float(col(row, "latitude")), float(col(row, "longitude"))
+            except ValueError:
+                continue
+            if not street:
+                continue
+            housenumber = col(row, "housenumber")
+            postcode = col(row, "postcode")
+            town = col(row, "town")
+            yield (
+                street, normalize_token(street),
+                housenumber, normalize_housenumber(housenumber),
+                postcode, town, normalize_token(town),
+                lat, lon,
+            )
+
+
+_INSERT_SQL = (
+    "INSERT INTO address_points"
+    " (street, street_norm, housenumber, housenumber_norm, postcode, town, town_norm, latitude, longitude)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def import_rows(rows: Iterable[tuple], path: Optional[str] = None, replace: bool = False, batch_size: int = 5000) -> int:
+    conn = sqlite3.connect(path or database_path())
+    count = 0
+    try:
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM address_points")
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    conn.executemany(_INSERT_SQL, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(_INSERT_SQL, batch)
+                count += len(batch)
+        conn.execute("ANALYZE address_points")
+    finally:
+        conn.close()
+    local_geocoder.close()
+    return count
+
+
+def _sample_addresses(limit: int) -> list[str]:
+    conn = sqlite3.connect(database_path())
+    try:
+        rows = conn.execute(
+            "SELECT street, housenumber, postcode, town FROM address_points ORDER BY random() LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [f"{s} {n}, {p} {t}".replace(" ,", ",").strip() for s, n, p, t in rows]
+
+
+def benchmark(samples: int = 200, remote: int = 5) -> None:
+    """Compare local lookup latency with uncached Nominatim round trips."""
+    from .geocoding import _nominatim_lookup, close_http_client
+
+    addresses = _sample_addresses(samples)
+    if not addresses:
+        print("address_points is empty; import a gazetteer first")
+        return
+    timings, hits = [], 0
+    for addr in addresses:
+        t0 = time.perf_counter()
+        hits += local_geocoder.lookup(addr) is not None
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    print(f"local:  n={len(timings)} hits={hits} median={statistics.median(timings):.3f} ms "
+          f"p95={timings[int(len(timings) * 0.95) - 1]:.3f} ms max={timings[-1]:.3f} ms")
+
+    async def run_remote():
+        remote_timings = []
+        try:
+            for addr in addresses[:remote]:
+                t0 = time.perf_counter()
+                try:
+                    await _nominatim_lookup(addr)
+                except Exception as e:
+                    print("remote lookup failed:", e)
+                    continue
+                remote_timings.append((time.perf_counter() - t0) * 1000)
+        finally:
+            await close_http_client()
+        return remote_timings
+
+    if remote > 0:
+        remote_timings = asyncio.run(run_remote())
+        if remote_timings:
+            # Includes the 1 req/s Nominatim throttle, as at alarm time
+            print(f"remote: n={len(remote_timings)} median={statistics.median(remote_timings):.1f} ms "
+                  f"max={max(remote_timings):.1f} ms")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.core.gazetteer", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="import a CSV address extract")
+    p_import.add_argument("csv_path")
+    p_import.add_argument("--replace", action="store_true", help="delete existing address points first")
+    p_lookup = sub.add_parser("lookup", help="resolve a single address")
+    p_lookup.add_argument("address")
+    p_bench = sub.add_parser("bench", help="compare local and remote lookup latency")
+    p_bench.add_argument("--samples", type=int, default=200)
+    p_bench.add_argument("--remote", type=int, default=5, help="number of Nominatim requests (0 to skip)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        from ..db.sql import models  # noqa: F401 (registers the tables for create_all)
+        from ..db.sql.connect import create_tables
+        asyncio.run(create_tables())
+        count = import_rows(read_csv(args.csv_path), replace=args.replace)
+        print(f"Imported {count} address points")
+    elif args.command == "lookup":
+        print(local_geocoder.lookup(args.address))
+    elif args.command == "bench":
+        benchmark(samples=args.samples, remote=args.remote)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Distances and bounding boxes for location queries.
+
+Incident coordinates are indexed in SQLite R*Trees (see migrations.incident_spatial_index),
+which answer "which points lie in this box" from the index. Radius queries use the box
+around the circle as the coarse filter and exact haversine distances to drop the corners
+and rank the rest. Boxes do not wrap around the antimeridian.
+
+Usage:
+    python -m app.core.geo bench [--incidents 100000] [--queries 50]
+"""
+import math
+import os
+from typing import Tuple
+
+# Mean earth radius (IUGG)
+EARTH_RADIUS_M = 6371008.8
+# Largest radius accepted by /api/incidents/near
+NEAR_MAX_RADIUS_M = float(os.getenv("NEAR_MAX_RADIUS_M", "50000"))
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) containing every point within radius_m of (lat, lon)."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    # Widest at the latitude closest to a pole
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    if dlon >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, max(-180.0, lon - dlon), min(180.0, lon + dlon)
+
+
+def benchmark(incidents: int = 100000, queries: int = 50) -> None:
+    """Radius and bounding-box latency over a generated incident history (an archive share
+    included), compared with loading every located incident and filtering in Python, as the
+    map had to."""
+    import asyncio
+    import datetime
+    import random
+    import statistics
+    import tempfile
+    import time
+
+    from sqlalchemy import insert, select
+
+    from ..api.routes.incidents import crud
+    from ..db.sql import models
+    from ..db.sql.connect import Base, create_engines, make_sessionmaker
+    from ..db.sql.migrations import migrate
+
+    rng = random.Random(24)
+    center = (50.11, 8.68)
+    # A district of about 40 x 40 km, with a few streets that see most incidents
+    hotspots = [(center[0] + rng.uniform(-0.15, 0.15), center[1] + rng.uniform(-0.25, 0.25)) for _ in range(200)]
+    start = datetime.datetime(2015, 1, 1)
+    step = (datetime.datetime(2025, 1, 1) - start) / incidents
+    archived = int(incidents * 0.8)
+
+    def row(i: int) -> dict:
+        created = start + step * i
+        if rng.random() < 0.4:
+            lat, lon = rng.choice(hotspots)
+            lat, lon = lat + rng.gauss(0, 0.0005), lon + rng.gauss(0, 0.0008)
+        else:
+            lat, lon = center[0] + rng.uniform(-0.18, 0.18), center[1] + rng.uniform(-0.28, 0.28)
+        return {
+            "id": i + 1, "title": f"Einsatz {i + 1}", "description": "", "address": f"Straße {i % 500}",
+            "latitude": lat, "longitude": lon, "status": models.IncidentStatus.closed,
+            "created_at": created, "closed_at": created, "revision": i + 1,
+        }
+
+    async def run(tmp: str) -> None:
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        Session = make_sessionmaker(writer, reader)
+        await migrate(writer, Base.metadata)
+        t0 = time.perf_counter()
+        async with Session() as db:
+            rows = [row(i) for i in range(incidents)]
+            now = datetime.datetime.now(datetime.timezone.utc)
+            archive_rows = [dict(r, archived_at=now) for r in rows[:archived]]
+            for offset in range(0, len(archive_rows), 5000):
+                await db.execute(insert(models.IncidentArchive), archive_rows[offset:offset + 5000])
+            for offset in range(archived, len(rows), 5000):
+                await db.execute(insert(models.Incident), rows[offset:offset + 5000])
+            await db.commit()
+        print(f"{incidents} incidents ({archived} archived) generated and indexed in "
+              f"{time.perf_counter() - t0:.1f} s")
+
+        def report(label: str, samples: list, found: int, scan_ms: float) -> None:
+            samples.sort()
+            print(f"{label:<30} found={found:>4} median={statistics.median(samples):6.2f} ms "
+                  f"p95={samples[int(len(samples) * 0.95) - 1]:6.2f} ms  (full scan: {scan_ms:7.1f} ms)")
+
+        async def full_scan(db, keep) -> float:
+            t0 = time.perf_counter()
+            for entity in (models.Incident, models.IncidentArchive):
+                result = await db.execute(
+                    select(entity.id, entity.latitude, entity.longitude).where(entity.latitude.is_not(None))
+                )
+                [r for r in result.all() if keep(r.latitude, r.longitude)]
+            return (time.perf_counter() - t0) * 1000
+
+        async with Session() as db:
+            for label, radius in (("same address (50 m)", 50), ("near, 500 m", 500), ("near, 3 km", 3000)):
+                points = [rng.choice(hotspots) for _ in range(queries)]
+                samples, found = [], 0
+                for lat, lon in points:
+                    t0 = time.perf_counter()
+                    hits = await crud.get_incidents_near(db, lat, lon, radius, limit=50, include_archived=True)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    found = max(found, len(hits))
+                lat, lon = points[0]
+                scan = await full_scan(db, lambda a, b: haversine_m(lat, lon, a, b) <= radius)
+                report(label, samples, found, scan)
+            for label, (dlat, dlon) in (("map viewport 2 x 1.5 km", (0.007, 0.014)), ("map viewport 12 x 9 km", (0.04, 0.085))):
+                samples, found = [], 0
+                for _ in range(queries):
+                    lat, lon = rng.choice(hotspots)
+                    t0 = time.perf_counter()
+                    hits = await crud.get_incidents_in_bbox(
+                        db, lat - dlat, lon - dlon, lat + dlat, lon + dlon, limit=500, include_archived=True
+                    )
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    found = max(found, len(hits))
+                scan = await full_scan(db, lambda a, b: lat - dlat <= a <= lat + dlat and lon - dlon <= b <= lon + dlon)
+                report(label, samples, found, scan)
+        await writer.dispose()
+        if reader is not None:
+            await reader.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m app.core.geo")
+    parser.add_argument("command", choices=["bench"], help="bench: radius and bounding-box queries over a generated history")
+    parser.add_argument("--incidents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    benchmark(args.incidents, args.queries)
@@ -1,27 +1,324 @@
+import asyncio
+import datetime
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set
+
 import httpx
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..db.sql import models
+from ..db.sql.connect import AsyncSessionLocal
+from .gazetteer import local_geocoder
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 USER_AGENT = "Feuerwehr-Melder/1.0 (+https://example.local)"
 
+# "nominatim" (default) or "local": the imported gazetteer (see core.gazetteer) answers
+# first and Nominatim is only asked for addresses it does not know
+GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "nominatim").lower()
+# Set to 0 to never fall back to Nominatim with the local backend
+GEOCODER_FALLBACK = os.getenv("GEOCODER_FALLBACK", "1").lower() not in ("0", "false", "no")
+
+# --- Cache configuration (seconds) ---
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+# Addresses Nominatim does not know are retried sooner than found ones
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", str(3600)))
+# Network/HTTP errors are transient, so they are only remembered briefly
+GEOCODE_FAILURE_TTL = int(os.getenv("GEOCODE_FAILURE_TTL", "60"))
+GEOCODE_MEMORY_CACHE_SIZE = int(os.getenv("GEOCODE_MEMORY_CACHE_SIZE", "1024"))
+# Nominatim usage policy: at most one request per second, for all worker processes together
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_address(address: str) -> str:
+    """Cache key for an address: casefolded, whitespace collapsed, spaces around commas removed."""
+    key = _WS_RE.sub(" ", address.casefold()).strip()
+    return key.replace(" ,", ",").replace(", ", ",")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    # SQLite returns naive datetimes; everything is stored as UTC
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+class GeocodeCache:
+    """Two-tier geocoding cache: an in-process LRU in front of the `geocode_cache` table.
+
+    Entries with latitude/longitude None are negative entries (not found or lookup failed).
+    """
+
+    def __init__(self, max_size: int = GEOCODE_MEMORY_CACHE_SIZE):
+        self.max_size = max_size
+        self._memory: "OrderedDict[str, tuple[Optional[float], Optional[float], datetime.datetime]]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def _remember(self, key: str, lat: Optional[float], lon: Optional[float], expires_at: datetime.datetime) -> None:
+        self._memory[key] = (lat, lon, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def peek(self, key: str) -> Optional[tuple[Optional[float], Optional[float]]]:
+        """Memory-tier lookup only; never touches the database."""
+        entry = self._memory.get(key)
+        if entry is None or entry[2] <= _now():
+            return None
+        self._memory.move_to_end(key)
+        self.memory_hits += 1
+        if entry[0] is None:
+            self.negative_hits += 1
+        return entry[0], entry[1]
+
+    async def get(self, key: str) -> Optional[tuple[Optional[float], Optional[float]]]:
+        """Return the cached (lat, lon) for a key, or None if there is no live entry."""
+        cached = self.peek(key)
+        if cached is not None:
+            return cached
+        # Drop an expired memory entry, if any
+        self._memory.pop(key, None)
+
+        now = _now()
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(models.GeocodeCacheEntry, key)
+        except Exception:
+            row = None
+        if row is not None and _as_utc(row.expires_at) > now:
+            self._remember(key, row.latitude, row.longitude, _as_utc(row.expires_at))
+            self.db_hits += 1
+            if row.latitude is None:
+                self.negative_hits += 1
+            return row.latitude, row.longitude
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, address: str, lat: Optional[float], lon: Optional[float], ttl: int) -> None:
+        now = _now()
+        expires_at = now + datetime.timedelta(seconds=ttl)
+        self._remember(key, lat, lon, expires_at)
+        values = {
+            "key": key,
+            "address": address,
+            "latitude": lat,
+            "longitude": lon,
+            "created_at": now,
+            "expires_at": expires_at,
+        }
+        stmt = sqlite_insert(models.GeocodeCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={k: v for k, v in values.items() if k != "key"},
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            # The memory tier still holds the entry; persisting is best-effort
+            print("geocode cache write failed:", e)
+
+    async def purge(self, address: Optional[str] = None) -> int:
+        """Remove one address (or everything) from both tiers. Returns the number of DB rows removed."""
+        stmt = delete(models.GeocodeCacheEntry)
+        if address is not None:
+            key = normalize_address(address)
+            self._memory.pop(key, None)
+            stmt = stmt.where(models.GeocodeCacheEntry.key == key)
+        else:
+            self._memory.clear()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            await db.commit()
+        return result.rowcount or 0
+
+    async def entries(self, limit: int = 100) -> list[dict]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.GeocodeCacheEntry)
+                .order_by(models.GeocodeCacheEntry.created_at.desc())
+                .limit(limit)
+            )
+            rows = result.scalars().all()
+        return [
+            {
+                "address": r.address,
+                "key": r.key,
+                "latitude": r.latitude,
+                "longitude": r.longitude,
+                "created_at": r.created_at,
+                "expires_at": r.expires_at,
+            }
+            for r in rows
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+        }
+
+
+geocode_cache = GeocodeCache()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client so repeated lookups reuse pooled keep-alive connections."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=10.0, headers={"User-Agent": USER_AGENT})
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Serializes this process's requests; the spacing itself is shared through the database
+_rate_lock = asyncio.Lock()
+
+
+async def _reserve_slot(name: str, interval: float) -> float:
+    """Claim the next free request slot of a shared rate limit and return its unix time.
+    The single UPDATE runs under SQLite's write lock, so concurrent processes get distinct
+    slots `interval` seconds apart."""
+    limit = models.RateLimit
+    now = time.time()
+    async with AsyncSessionLocal() as db:
+        await db.execute(sqlite_insert(limit).values(name=name, next_at=0.0).on_conflict_do_nothing())
+        result = await db.execute(
+            update(limit)
+            .where(limit.name == name)
+            .values(next_at=func.max(limit.next_at, now) + interval)
+            .returning(limit.next_at)
+        )
+        next_at = result.scalar_one()
+        await db.commit()
+    return next_at - interval
+
+
+async def _nominatim_lookup(address: str) -> tuple[float | None, float | None]:
+    """Query Nominatim directly, spaced at least NOMINATIM_MIN_INTERVAL apart across all
+    worker processes. Raises on network/HTTP errors.
+    """
+    params = {"format": "json", "q": address}
+    async with _rate_lock:
+        wait = await _reserve_slot("nominatim", NOMINATIM_MIN_INTERVAL) - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    resp = await get_http_client().get(NOMINATIM_URL, params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, list) and data:
+        lat = float(data[0]["lat"])  # type: ignore[index]
+        lon = float(data[0]["lon"])  # type: ignore[index]
+        return lat, lon
+    return None, None
+
+
+def geocode_address_nowait(address: str) -> Optional[tuple[float | None, float | None]]:
+    """Resolve an address without waiting on I/O: local gazetteer (if enabled), then the
+    in-memory cache. Returns None when a full `geocode_address` lookup is needed.
+    """
+    if GEOCODER_BACKEND == "local":
+        found = local_geocoder.lookup(address)
+        if found is not None:
+            return found
+        if not GEOCODER_FALLBACK:
+            return None, None
+    return geocode_cache.peek(normalize_address(address))
+
 
 async def geocode_address(address: str) -> tuple[float | None, float | None]:
-    """Geocode the given address using OpenStreetMap Nominatim.
+    """Geocode the given address using the configured backend.
 
+    With GEOCODER_BACKEND=local the offline gazetteer is tried first. Nominatim results
+    (including misses) are cached, see GeocodeCache.
     Returns (lat, lon) as floats if found, otherwise (None, None).
     """
     if not address:
         return None, None
-    params = {"format": "json", "q": address}
-    headers = {"User-Agent": USER_AGENT}
-    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-        try:
-            resp = await client.get(NOMINATIM_URL, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, list) and data:
-                lat = float(data[0]["lat"])  # type: ignore[index]
-                lon = float(data[0]["lon"])  # type: ignore[index]
-                return lat, lon
-        except Exception:
+    if GEOCODER_BACKEND == "local":
+        found = local_geocoder.lookup(address)
+        if found is not None:
+            return found
+        if not GEOCODER_FALLBACK:
             return None, None
-    return None, None
+    key = normalize_address(address)
+    cached = await geocode_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        lat, lon = await _nominatim_lookup(address)
+    except Exception:
+        await geocode_cache.put(key, address, None, None, GEOCODE_FAILURE_TTL)
+        return None, None
+    ttl = GEOCODE_CACHE_TTL if lat is not None else GEOCODE_NEGATIVE_TTL
+    await geocode_cache.put(key, address, lat, lon, ttl)
+    return lat, lon
+
+
+class GeocodingQueue:
+    """Background geocoding for incidents that were saved without coordinates.
+
+    Lookups are keyed by normalized address, so submitting the same address for several
+    incidents while it is queued or in flight results in a single lookup. Once resolved,
+    `on_resolved(incident_ids, address, lat, lon)` is awaited with every waiting incident.
+    """
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._pending: Dict[str, tuple[str, Set[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, incident_id: int, address: str) -> None:
+        key = normalize_address(address)
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[1].add(incident_id)
+            return
+        self._pending[key] = (address, {incident_id})
+        self._queue.put_nowait(key)
+
+    async def run(self, on_resolved: Callable[[list[int], str, Optional[float], Optional[float]], Awaitable[None]]) -> None:
+        while True:
+            key = await self._queue.get()
+            address, _ = self._pending[key]
+            try:
+                lat, lon = await geocode_address(address)
+            except Exception:
+                lat, lon = None, None
+            # Pop only after the lookup so submissions made meanwhile are merged into it
+            _, incident_ids = self._pending.pop(key)
+            try:
+                await on_resolved(sorted(incident_ids), address, lat, lon)
+            except Exception as e:
+                # Avoid crashing the worker
+                print("geocoding queue error:", e)
+
+
+geocoding_queue = GeocodingQueue()
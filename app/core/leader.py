@@ -0,0 +1,153 @@
+"""Lease-based leader election between worker processes.
+
+Exactly one process at a time holds a named lease (a row in the `leases` table) and runs
+the background jobs. The holder renews the lease every LEADER_RENEW_INTERVAL seconds; the
+other processes try to take it over at the same interval, which succeeds once it has not
+been renewed for LEADER_LEASE_TTL seconds (or right away if the leader released it on
+shutdown). Every change of holder increments the lease's fencing token. Writes made on
+behalf of the leader check the token (see `LeaderElection.fence`), so a stalled former
+leader cannot act after another process took over.
+"""
+import asyncio
+import datetime
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from sqlalchemy import case, exists, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..db.sql import models
+from ..db.sql.connect import AsyncSessionLocal
+
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "5.0"))
+LEADER_RENEW_INTERVAL = float(os.getenv("LEADER_RENEW_INTERVAL", "1.0"))
+
+Job = Callable[[int], Awaitable[None]]
+
+
+def _now() -> datetime.datetime:
+    # Stored naive, like the other timestamps SQLite hands back
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class LeaderElection:
+    def __init__(self, name: str = "background", ttl: float = LEADER_LEASE_TTL, interval: float = LEADER_RENEW_INTERVAL):
+        self.name = name
+        self.ttl = ttl
+        self.interval = interval
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: Optional[int] = None
+        self.valid_until = 0.0
+        self.elected_at: Optional[datetime.datetime] = None
+        self.terms = 0
+        self._jobs: List[asyncio.Task] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None and time.monotonic() < self.valid_until
+
+    def fence(self, token: int):
+        """SQL condition that only holds while `token` is the current token of this lease."""
+        return exists().where(models.Lease.name == self.name, models.Lease.token == token)
+
+    async def try_acquire(self) -> Optional[int]:
+        """Take or renew the lease. Returns the fencing token, or None if another process holds it.
+        Raises on database errors.
+        """
+        started = time.monotonic()
+        now = _now()
+        lease = models.Lease
+        async with AsyncSessionLocal() as db:
+            await db.execute(sqlite_insert(lease).values(name=self.name, token=0).on_conflict_do_nothing())
+            result = await db.execute(
+                update(lease)
+                .where(lease.name == self.name)
+                .where(or_(lease.holder == self.holder_id, lease.expires_at.is_(None), lease.expires_at < now))
+                .values(
+                    holder=self.holder_id,
+                    token=case((lease.holder == self.holder_id, lease.token), else_=lease.token + 1),
+                    expires_at=now + datetime.timedelta(seconds=self.ttl),
+                )
+                .returning(lease.token)
+            )
+            row = result.first()
+            await db.commit()
+        if row is None:
+            return None
+        # Measured from before the write, so we always give up before the others may take over
+        self.valid_until = started + self.ttl
+        return row[0]
+
+    async def release(self) -> None:
+        if self.token is None:
+            return
+        token, self.token = self.token, None
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.Lease)
+                .where(models.Lease.name == self.name, models.Lease.holder == self.holder_id, models.Lease.token == token)
+                .values(expires_at=None)
+            )
+            await db.commit()
+
+    def start(self, jobs: Sequence[Job]) -> None:
+        """Campaign in the background; while leader, every job runs as `job(fencing_token)`."""
+        self._task = asyncio.create_task(self._run(jobs))
+
+    async def stop(self) -> None:
+        """Stop campaigning and release the lease so another process takes over immediately."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop_jobs()
+        try:
+            await self.release()
+        except Exception as e:
+            print("leader release error:", e)
+
+    def _stop_jobs(self) -> None:
+        for task in self._jobs:
+            task.cancel()
+        self._jobs = []
+
+    async def _run(self, jobs: Sequence[Job]) -> None:
+        while True:
+            try:
+                token = await self.try_acquire()
+                lost = token is None
+            except Exception as e:
+                print("leader election error:", e)
+                token = None
+                # Keep running jobs until our lease could have expired
+                lost = not self.is_leader
+            if token is not None and token != self.token:
+                self._stop_jobs()
+                self.token = token
+                self.terms += 1
+                self.elected_at = datetime.datetime.now(datetime.timezone.utc)
+                print(f"Elected leader for '{self.name}' ({self.holder_id}, token {token})")
+                self._jobs = [asyncio.create_task(job(token)) for job in jobs]
+            elif lost and self.token is not None:
+                print(f"Lost leadership for '{self.name}' ({self.holder_id})")
+                self._stop_jobs()
+                self.token = None
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "lease": self.name,
+            "holder_id": self.holder_id,
+            "is_leader": self.is_leader,
+            "token": self.token,
+            "elected_at": self.elected_at,
+            "terms": self.terms,
+            "lease_ttl": self.ttl,
+            "renew_interval": self.interval,
+        }
+
+
+leader = LeaderElection()
@@ -0,0 +1,461 @@
+"""Live vehicle positions.
+
+GPS units report about once per second per vehicle, in batches over HTTP
+(POST /api/vehicles/positions) or as a stream of frames on /ws/positions. Every process
+keeps the latest fix per vehicle in memory, bucketed in a lat/lon grid for nearest-vehicle
+queries, together with each vehicle's name and FMS status (loaded at startup, kept current
+from vehicle events), so a nearest-available query needs no database access. Fixes are
+never written or broadcast one by one:
+
+- history is downsampled: a fix is stored once the vehicle moved POSITION_HISTORY_DISTANCE_M
+  (but at most every POSITION_HISTORY_MIN_INTERVAL seconds), and at least every
+  POSITION_HISTORY_MAX_INTERVAL seconds while it keeps reporting; rows are written in one
+  batch per flush and pruned after POSITION_HISTORY_DAYS by the leader;
+- every POSITION_BROADCAST_INTERVAL seconds one `vehicle_positions` event carries the
+  latest fix of each vehicle that reported since. Other worker processes apply it to their
+  own store, so every process can answer queries.
+
+Usage:
+    python -m app.core.positions bench [--vehicles 2000] [--fixes 200000] [--queries 2000]
+"""
+import asyncio
+import datetime
+import heapq
+import math
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .geo import EARTH_RADIUS_M, haversine_m
+
+# Seconds between `vehicle_positions` broadcasts (and history writes)
+POSITION_BROADCAST_INTERVAL = float(os.getenv("POSITION_BROADCAST_INTERVAL", "2.0"))
+# History downsampling: distance moved, and the bounds on the time between stored fixes
+POSITION_HISTORY_DISTANCE_M = float(os.getenv("POSITION_HISTORY_DISTANCE_M", "50"))
+POSITION_HISTORY_MIN_INTERVAL = float(os.getenv("POSITION_HISTORY_MIN_INTERVAL", "5"))
+POSITION_HISTORY_MAX_INTERVAL = float(os.getenv("POSITION_HISTORY_MAX_INTERVAL", "300"))
+# Days of history kept (0 keeps everything)
+POSITION_HISTORY_DAYS = float(os.getenv("POSITION_HISTORY_DAYS", "30"))
+# History rows kept for the next flush while the database cannot be written
+POSITION_HISTORY_BUFFER = 50000
+# Fixes older than this are not used for nearest-vehicle queries by default (seconds)
+POSITION_MAX_AGE = float(os.getenv("POSITION_MAX_AGE", "300"))
+# Grid cell edge in degrees (0.02 is about 2.2 x 1.4 km in central Europe)
+POSITION_GRID_CELL_DEG = float(os.getenv("POSITION_GRID_CELL_DEG", "0.02"))
+# FMS status values of vehicles that can be sent to a new incident
+# (1: einsatzbereit über Funk, 2: einsatzbereit auf Wache)
+AVAILABLE_STATUSES = frozenset({1, 2})
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+class Fix(NamedTuple):
+    latitude: float
+    longitude: float
+    recorded_at: float  # unix time
+    speed: Optional[float] = None
+    heading: Optional[float] = None
+
+
+def _timestamp(value: Optional[datetime.datetime]) -> float:
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+class GridIndex:
+    """Vehicle ids bucketed by grid cell, searched ring by ring outwards from a point."""
+
+    def __init__(self, cell_deg: float = POSITION_GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+        self.cell_of: Dict[int, Tuple[int, int]] = {}
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg)
+
+    def move(self, vehicle_id: int, latitude: float, longitude: float) -> None:
+        cell = self._cell(latitude, longitude)
+        previous = self.cell_of.get(vehicle_id)
+        if previous == cell:
+            return
+        if previous is not None:
+            self._discard(vehicle_id, previous)
+        self.cells.setdefault(cell, set()).add(vehicle_id)
+        self.cell_of[vehicle_id] = cell
+
+    def remove(self, vehicle_id: int) -> None:
+        cell = self.cell_of.pop(vehicle_id, None)
+        if cell is not None:
+            self._discard(vehicle_id, cell)
+
+    def _discard(self, vehicle_id: int, cell: Tuple[int, int]) -> None:
+        members = self.cells[cell]
+        members.discard(vehicle_id)
+        if not members:
+            del self.cells[cell]
+
+    def rings(self, latitude: float, longitude: float) -> Iterable[Tuple[float, Iterable[int]]]:
+        """(lower bound in meters, vehicle ids) per ring of cells around the point, nearest
+        ring first. No vehicle of a ring is closer than its bound."""
+        ci, cj = self._cell(latitude, longitude)
+        c = self.cell_deg
+        remaining = len(self.cell_of)
+        r = 0
+        while remaining > 0:
+            if r == 0:
+                bound = 0.0
+            else:
+                # Distance from the point to the inner edge of ring r, per axis
+                dlat = min((ci + r) * c - latitude, latitude - (ci - r + 1) * c)
+                dlon = min((cj + r) * c - longitude, longitude - (cj - r + 1) * c)
+                # Meridians converge: use the narrowest latitude the ring reaches
+                widest = min(89.0, abs(latitude) + (r + 1) * c)
+                bound = 0.99 * _METERS_PER_DEGREE * min(dlat, dlon * math.cos(math.radians(widest)))
+            if 8 * r > len(self.cells):
+                # Sparse grid: look at the occupied cells instead of walking the ring
+                ids = [
+                    vehicle_id
+                    for (i, j), members in self.cells.items()
+                    if max(abs(i - ci), abs(j - cj)) == r
+                    for vehicle_id in members
+                ]
+            elif r == 0:
+                ids = list(self.cells.get((ci, cj), ()))
+            else:
+                ids = [
+                    vehicle_id
+                    for i, j in _ring(ci, cj, r)
+                    for vehicle_id in self.cells.get((i, j), ())
+                ]
+            remaining -= len(ids)
+            yield bound, ids
+            r += 1
+
+
+def _ring(ci: int, cj: int, r: int) -> Iterable[Tuple[int, int]]:
+    for j in range(cj - r, cj + r + 1):
+        yield ci - r, j
+        yield ci + r, j
+    for i in range(ci - r + 1, ci + r):
+        yield i, cj - r
+        yield i, cj + r
+
+
+# store_history(rows) writes (vehicle_id, latitude, longitude, speed, heading, recorded_at) rows
+StoreHistory = Callable[[List[tuple]], Awaitable[None]]
+# prune_history(before, limit) -> number of rows deleted
+PruneHistory = Callable[[datetime.datetime, int], Awaitable[int]]
+
+
+class PositionTracker:
+    """Latest fix per vehicle with a grid index, the vehicle roster, and the pending
+    broadcast/history work of this process."""
+
+    def __init__(self):
+        self.latest: Dict[int, Fix] = {}
+        self.grid = GridIndex()
+        # vehicle id -> (name, FMS status)
+        self.vehicles: Dict[int, Tuple[str, int]] = {}
+        # Fixes received by this process since the last broadcast, latest per vehicle
+        self.changed: Dict[int, Fix] = {}
+        self.last_stored: Dict[int, Fix] = {}
+        self.history: List[tuple] = []
+        self.received = 0
+        self.stale = 0
+        self.unknown = 0
+        self.rejected = 0
+        self.stored = 0
+        self.broadcasts = 0
+        self.pruned = 0
+        self.last_error: Optional[str] = None
+
+    def load(self, vehicles: Iterable[Tuple[int, str, int]], fixes: Iterable[Tuple[int, Fix]] = ()) -> None:
+        """Replace the roster, and seed positions (e.g. the last stored ones) at startup."""
+        self.vehicles = {vehicle_id: (name, status) for vehicle_id, name, status in vehicles}
+        for vehicle_id, fix in fixes:
+            if vehicle_id in self.vehicles:
+                self._apply(vehicle_id, fix)
+                self.last_stored[vehicle_id] = fix
+
+    def ingest(
+        self,
+        vehicle_id: int,
+        latitude: float,
+        longitude: float,
+        recorded_at: Optional[datetime.datetime] = None,
+        speed: Optional[float] = None,
+        heading: Optional[float] = None,
+    ) -> str:
+        """Take a fix reported to this process: "accepted", "stale" (not newer than the
+        vehicle's latest fix) or "unknown" (no such vehicle)."""
+        self.received += 1
+        if vehicle_id not in self.vehicles:
+            self.unknown += 1
+            return "unknown"
+        # Clocks of GPS units may run ahead; never accept fixes from the future
+        fix = Fix(latitude, longitude, min(_timestamp(recorded_at), time.time()), speed, heading)
+        if not self._apply(vehicle_id, fix):
+            self.stale += 1
+            return "stale"
+        self.changed[vehicle_id] = fix
+        self._downsample(vehicle_id, fix)
+        return "accepted"
+
+    def _apply(self, vehicle_id: int, fix: Fix) -> bool:
+        current = self.latest.get(vehicle_id)
+        if current is not None and current.recorded_at >= fix.recorded_at:
+            return False
+        self.latest[vehicle_id] = fix
+        self.grid.move(vehicle_id, fix.latitude, fix.longitude)
+        return True
+
+    def _downsample(self, vehicle_id: int, fix: Fix) -> None:
+        last = self.last_stored.get(vehicle_id)
+        if last is not None:
+            elapsed = fix.recorded_at - last.recorded_at
+            if elapsed < POSITION_HISTORY_MIN_INTERVAL:
+                return
+            if (
+                elapsed < POSITION_HISTORY_MAX_INTERVAL
+                and haversine_m(last.latitude, last.longitude, fix.latitude, fix.longitude) < POSITION_HISTORY_DISTANCE_M
+            ):
+                return
+        self.last_stored[vehicle_id] = fix
+        if len(self.history) < POSITION_HISTORY_BUFFER:
+            self.history.append((
+                vehicle_id, fix.latitude, fix.longitude, fix.speed, fix.heading,
+                datetime.datetime.fromtimestamp(fix.recorded_at, datetime.timezone.utc),
+            ))
+
+    def forget(self, vehicle_id: int) -> None:
+        self.vehicles.pop(vehicle_id, None)
+        self.latest.pop(vehicle_id, None)
+        self.changed.pop(vehicle_id, None)
+        self.last_stored.pop(vehicle_id, None)
+        self.grid.remove(vehicle_id)
+
+    def apply_event(self, message: dict) -> None:
+        """Broadcast listener: roster changes and the positions other processes received."""
+        kind = message.get("type")
+        if kind in ("vehicle_created", "vehicle_updated"):
+            vehicle = message["vehicle"]
+            self.vehicles[vehicle["id"]] = (vehicle["name"], vehicle["status"])
+        elif kind == "vehicles_updated":
+            for vehicle in message["vehicles"]:
+                self.vehicles[vehicle["id"]] = (vehicle["name"], vehicle["status"])
+        elif kind == "vehicle_deleted":
+            self.forget(message["vehicle_id"])
+        elif kind == "vehicle_positions":
+            for position in message["positions"]:
+                vehicle_id = position["vehicle_id"]
+                if vehicle_id in self.vehicles:
+                    self._apply(vehicle_id, Fix(
+                        position["latitude"],
+                        position["longitude"],
+                        _timestamp(datetime.datetime.fromisoformat(position["recorded_at"])),
+                        position.get("speed"),
+                        position.get("heading"),
+                    ))
+
+    def _position(self, vehicle_id: int, fix: Fix) -> dict:
+        return {
+            "vehicle_id": vehicle_id,
+            "latitude": fix.latitude,
+            "longitude": fix.longitude,
+            "recorded_at": _isoformat(fix.recorded_at),
+            "speed": fix.speed,
+            "heading": fix.heading,
+        }
+
+    def positions(self, max_age: Optional[float] = None) -> List[dict]:
+        """Latest position of every vehicle (reported within max_age seconds, if given)."""
+        oldest = time.time() - max_age if max_age is not None else -math.inf
+        return [
+            self._position(vehicle_id, fix)
+            for vehicle_id, fix in sorted(self.latest.items())
+            if fix.recorded_at >= oldest
+        ]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        limit: int = 5,
+        statuses: Iterable[int] = AVAILABLE_STATUSES,
+        max_age: float = POSITION_MAX_AGE,
+        max_distance_m: Optional[float] = None,
+    ) -> List[dict]:
+        """Vehicles with one of `statuses` and a fix from the last max_age seconds, nearest
+        (straight-line distance) first."""
+        statuses = set(statuses)
+        oldest = time.time() - max_age
+        best: List[Tuple[float, int]] = []  # max-heap of the closest `limit` as (-distance, -id)
+        for bound, ids in self.grid.rings(latitude, longitude):
+            if max_distance_m is not None and bound > max_distance_m:
+                break
+            if len(best) == limit and bound > -best[0][0]:
+                break
+            for vehicle_id in ids:
+                vehicle = self.vehicles.get(vehicle_id)
+                fix = self.latest[vehicle_id]
+                if vehicle is None or vehicle[1] not in statuses or fix.recorded_at < oldest:
+                    continue
+                distance = haversine_m(latitude, longitude, fix.latitude, fix.longitude)
+                if max_distance_m is not None and distance > max_distance_m:
+                    continue
+                entry = (-distance, -vehicle_id)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        results = []
+        for neg_distance, neg_id in sorted(best, reverse=True):
+            name, status = self.vehicles[-neg_id]
+            results.append({
+                "vehicle": {"id": -neg_id, "name": name, "status": status},
+                **self._position(-neg_id, self.latest[-neg_id]),
+                "distance_m": round(-neg_distance, 1),
+            })
+        return results
+
+    async def flush(self, store_history: StoreHistory) -> None:
+        """Broadcast the fixes received since the last flush and write the pending history."""
+        if self.changed:
+            from .websockets import manager  # websockets does not depend on this module
+            positions = [self._position(vehicle_id, fix) for vehicle_id, fix in self.changed.items()]
+            self.changed = {}
+            self.broadcasts += 1
+            await manager.broadcast({"type": "vehicle_positions", "positions": positions})
+        if self.history:
+            rows, self.history = self.history, []
+            try:
+                await store_history(rows)
+                self.stored += len(rows)
+            except Exception as e:
+                # Keep them for the next flush, within the buffer limit
+                self.history = (rows + self.history)[-POSITION_HISTORY_BUFFER:]
+                self.last_error = f"{type(e).__name__}: {e}"
+                print("position history error:", e)
+
+    async def run(self, store_history: StoreHistory) -> None:
+        """Flush every POSITION_BROADCAST_INTERVAL seconds until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(POSITION_BROADCAST_INTERVAL)
+                await self.flush(store_history)
+        finally:
+            if self.history:
+                await self.flush(store_history)
+
+    async def run_retention(self, prune_history: PruneHistory, interval: float = 3600, batch: int = 5000) -> None:
+        """Delete history older than POSITION_HISTORY_DAYS every `interval` seconds (leader only)."""
+        if POSITION_HISTORY_DAYS <= 0:
+            return
+        while True:
+            before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=POSITION_HISTORY_DAYS)
+            try:
+                while True:
+                    deleted = await prune_history(before, batch)
+                    self.pruned += deleted
+                    if deleted < batch:
+                        break
+                    await asyncio.sleep(0.05)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print("position retention error:", e)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {
+            "vehicles": len(self.vehicles),
+            "positions": len(self.latest),
+            "grid_cells": len(self.grid.cells),
+            "received": self.received,
+            "stale": self.stale,
+            "unknown": self.unknown,
+            "rejected_frames": self.rejected,
+            "pending_broadcast": len(self.changed),
+            "pending_history": len(self.history),
+            "stored": self.stored,
+            "broadcasts": self.broadcasts,
+            "pruned": self.pruned,
+            "broadcast_interval": POSITION_BROADCAST_INTERVAL,
+            "history_days": POSITION_HISTORY_DAYS,
+            "last_error": self.last_error,
+        }
+
+
+position_tracker = PositionTracker()
+
+
+def benchmark(vehicles: int = 2000, fixes: int = 200000, queries: int = 2000) -> None:
+    """Ingest throughput and nearest-available latency of the grid index against a scan over
+    all vehicles."""
+    import random
+    import statistics
+
+    rng = random.Random(25)
+    tracker = PositionTracker()
+    tracker.load((i, f"Fahrzeug {i}", rng.choice((1, 2, 2, 3, 4, 6))) for i in range(1, vehicles + 1))
+    # Vehicles spread over about 100 x 100 km, reporting in turn and drifting a few meters
+    coords = {i: [50.11 + rng.uniform(-0.45, 0.45), 8.68 + rng.uniform(-0.7, 0.7)] for i in range(1, vehicles + 1)}
+    start = time.time() - fixes / vehicles - 10
+    t0 = time.perf_counter()
+    for n in range(fixes):
+        vehicle_id = n % vehicles + 1
+        c = coords[vehicle_id]
+        c[0] += rng.uniform(-0.0001, 0.0001)
+        c[1] += rng.uniform(-0.00015, 0.00015)
+        tracker.ingest(
+            vehicle_id, c[0], c[1],
+            datetime.datetime.fromtimestamp(start + n / vehicles, datetime.timezone.utc), 8.0, 90.0,
+        )
+    elapsed = time.perf_counter() - t0
+    print(f"ingest: {fixes} fixes from {vehicles} vehicles in {elapsed:.2f} s "
+          f"({fixes / elapsed:,.0f} fixes/s), {len(tracker.history)} history rows kept "
+          f"({len(tracker.history) / fixes:.1%})")
+
+    def scan(latitude: float, longitude: float, limit: int) -> List[int]:
+        candidates = [
+            (haversine_m(latitude, longitude, fix.latitude, fix.longitude), vehicle_id)
+            for vehicle_id, fix in tracker.latest.items()
+            if tracker.vehicles[vehicle_id][1] in AVAILABLE_STATUSES
+        ]
+        return [vehicle_id for _, vehicle_id in heapq.nsmallest(limit, candidates)]
+
+    points = [(50.11 + rng.uniform(-0.4, 0.4), 8.68 + rng.uniform(-0.6, 0.6)) for _ in range(queries)]
+    for label, func in (
+        ("grid index", lambda lat, lon: [r["vehicle"]["id"] for r in tracker.nearest(lat, lon, 5, max_age=math.inf)]),
+        ("full scan", lambda lat, lon: scan(lat, lon, 5)),
+    ):
+        samples = []
+        for lat, lon in points:
+            t0 = time.perf_counter()
+            func(lat, lon)
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        print(f"nearest 5 available, {label:<10} median={statistics.median(samples):7.3f} ms "
+              f"p95={samples[int(len(samples) * 0.95) - 1]:7.3f} ms")
+    mismatches = sum(
+        [r["vehicle"]["id"] for r in tracker.nearest(lat, lon, 5, max_age=math.inf)] != scan(lat, lon, 5)
+        for lat, lon in points
+    )
+    print(f"queries with a different result than the scan: {mismatches}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m app.core.positions")
+    parser.add_argument("command", choices=["bench"], help="bench: ingest throughput and nearest-vehicle latency")
+    parser.add_argument("--vehicles", type=int, default=2000)
+    parser.add_argument("--fixes", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.vehicles, args.fixes, args.queries)
@@ -0,0 +1,158 @@
+"""Fast JSON responses and a cache of serialized entity representations.
+
+orjson is used when installed (optional dependency), otherwise the standard json module.
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Tuple
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+# Entities whose serialized form is kept (least recently used are dropped first)
+REPRESENTATION_CACHE_SIZE = int(os.getenv("REPRESENTATION_CACHE_SIZE", "10000"))
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON for content that is already JSON-compatible (str, numbers, lists, dicts)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for JSON-compatible content; skips FastAPI's encoder and response_model
+    validation, so only return data that already has the documented shape."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_array_response(parts: Iterable[bytes], **kwargs) -> Response:
+    """Response with a JSON array assembled from already serialized elements."""
+    return Response(b"[" + b",".join(parts) + b"]", media_type="application/json", **kwargs)
+
+
+class RepresentationCache:
+    """Serialized form of entities, computed once per entity version.
+
+    `render(obj)` builds the JSON-compatible dict, `version(obj)` must change with every write
+    that affects it (e.g. a revision counter). A cached entry is reused while the version
+    matches; both the dict (for WebSocket payloads) and its encoded bytes (for HTTP bodies)
+    are kept. The dicts are shared, so callers must not modify them.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[Any], dict],
+        version: Callable[[Any], Hashable],
+        max_size: int = REPRESENTATION_CACHE_SIZE,
+    ):
+        self.render = render
+        self.version = version
+        self.max_size = max_size
+        self.entries: "OrderedDict[Any, Tuple[Hashable, dict, bytes]]" = OrderedDict()
+
+    def _entry(self, obj) -> Tuple[Hashable, dict, bytes]:
+        version = self.version(obj)
+        entry = self.entries.get(obj.id)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(obj.id)
+            return entry
+        data = self.render(obj)
+        entry = (version, data, dumps(data))
+        self.entries[obj.id] = entry
+        self.entries.move_to_end(obj.id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def as_dict(self, obj) -> dict:
+        return self._entry(obj)[1]
+
+    def as_json(self, obj) -> bytes:
+        return self._entry(obj)[2]
+
+    def discard(self, entity_id) -> None:
+        self.entries.pop(entity_id, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+def benchmark(incidents: int = 500, vehicles: int = 3, requests: int = 200) -> None:
+    """Time the incident list response built the old way (validate each incident into IncidentOut,
+    then FastAPI validates and encodes against response_model) and from the representation cache."""
+    import asyncio
+    import datetime
+    import statistics
+    import time
+    from typing import List
+
+    import httpx
+    from fastapi import FastAPI
+
+    from ..api.routes.incidents import crud, schemas
+    from ..db.sql import models
+
+    fleet = [models.Vehicle(id=i + 1, name=f"HLF {i + 1}", status=2, revision=1) for i in range(vehicles)]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = [
+        models.Incident(
+            id=i + 1, title=f"Einsatz {i + 1}", description="Brandmeldeanlage ausgelöst " * 4,
+            status=models.IncidentStatus.active, created_at=now, address=f"Hauptstraße {i + 1}, Frankfurt",
+            latitude=50.11, longitude=8.68, scheduled_at=now, revision=1, vehicles=fleet,
+        )
+        for i in range(incidents)
+    ]
+
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[schemas.IncidentOut])
+    async def validated():
+        return [schemas.IncidentOut.model_validate(i) for i in rows]
+
+    @app.get("/cached", response_model=List[schemas.IncidentOut])
+    async def cached():
+        return json_array_response(crud.representations.as_json(i) for i in rows)
+
+    @app.get("/cold", response_model=List[schemas.IncidentOut])
+    async def cold():
+        crud.representations.clear()
+        return json_array_response(crud.representations.as_json(i) for i in rows)
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            bodies = {}
+            for path in ("/validated", "/cold", "/cached"):
+                bodies[path] = (await client.get(path)).json()
+                samples = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    samples.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                print(f"{path:<11} median {statistics.median(samples) * 1000:7.2f} ms  "
+                      f"p95 {sorted(samples)[int(len(samples) * 0.95)] * 1000:7.2f} ms")
+            print("identical bodies:", bodies["/validated"] == bodies["/cached"] == bodies["/cold"])
+
+    print(f"{incidents} incidents x {vehicles} vehicles, {requests} requests each, "
+          f"json: {'orjson' if orjson is not None else 'stdlib'}")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m app.core.responses")
+    parser.add_argument("command", choices=["bench"], help="bench: incident list serialization, validated vs cached")
+    parser.add_argument("--incidents", type=int, default=500)
+    parser.add_argument("--vehicles", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.incidents, args.vehicles, args.requests)
@@ -0,0 +1,160 @@
+import asyncio
+import datetime
+import heapq
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Delay before due incidents are retried after a failed activation, doubled per consecutive
+# failure up to the maximum (seconds)
+RETRY_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    """Return an aware UTC datetime. Naive values are treated as UTC (SQLite drops tzinfo)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+class ActivationScheduler:
+    """Keeps upcoming incident activations in an in-memory priority queue.
+
+    The heap holds (due_at, incident_id) entries. Rescheduling or cancelling an incident
+    does not touch the heap; the authoritative due time lives in `_due` and stale heap
+    entries are skipped lazily when they surface. The runner sleeps until the earliest due
+    time (or until woken by a schedule change) and hands all due ids to a single callback.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime.datetime, int]] = []
+        self._due: Dict[int, datetime.datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._reload_requested = False
+        self._failures = 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def load(self, entries: Iterable[Tuple[int, datetime.datetime]]) -> None:
+        """Replace the queue with the given (incident_id, scheduled_at) pairs."""
+        self._due = {incident_id: _as_utc(sch) for incident_id, sch in entries if sch is not None}
+        self._heap = [(due, incident_id) for incident_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def schedule(self, incident_id: int, scheduled_at: Optional[datetime.datetime]) -> None:
+        """Schedule (or reschedule) an incident. Passing None cancels it."""
+        if scheduled_at is None:
+            self.cancel(incident_id)
+            return
+        due = _as_utc(scheduled_at)
+        if self._due.get(incident_id) == due:
+            return
+        self._due[incident_id] = due
+        heapq.heappush(self._heap, (due, incident_id))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            # Mostly superseded entries (e.g. in a process that never runs the queue): rebuild
+            self._heap = [(d, i) for i, d in self._due.items()]
+            heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def cancel(self, incident_id: int) -> None:
+        if self._due.pop(incident_id, None) is not None:
+            self._wakeup.set()
+
+    def sync(self, incident) -> None:
+        """Update the queue from an Incident ORM object after it has been written."""
+        status = getattr(incident.status, "value", incident.status)
+        if status == "new" and incident.scheduled_at is not None:
+            self.schedule(incident.id, incident.scheduled_at)
+        else:
+            self.cancel(incident.id)
+
+    def apply_event(self, message: dict) -> None:
+        """Update the queue from a broadcast, so incidents written by other worker processes
+        reach the process running the scheduler.
+        """
+        kind = message.get("type")
+        if kind in ("incident_created", "incident_updated"):
+            incident = message.get("incident") or {}
+            scheduled_at = incident.get("scheduled_at")
+            if incident.get("status") == "new" and scheduled_at:
+                self.schedule(incident["id"], datetime.datetime.fromisoformat(scheduled_at))
+            elif "id" in incident:
+                self.cancel(incident["id"])
+        elif kind == "incident_deleted":
+            self.cancel(message["incident_id"])
+        elif kind in ("incidents_bulk", "resync_required"):
+            # Bulk imports only broadcast a summary, and a resync means events were lost:
+            # rebuild the queue from the database
+            self.request_reload()
+
+    def request_reload(self) -> None:
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def _pop_due(self, now: datetime.datetime) -> List[int]:
+        due_ids: List[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            due, incident_id = heapq.heappop(self._heap)
+            # Skip entries superseded by a reschedule or cancel
+            if self._due.get(incident_id) != due:
+                continue
+            del self._due[incident_id]
+            due_ids.append(incident_id)
+        return due_ids
+
+    def _retry(self, incident_ids: List[int], now: datetime.datetime) -> None:
+        """Queue incidents again after a failed activation, with exponential backoff.
+        Incidents rescheduled or cancelled in the meantime keep their new state."""
+        delay = min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** self._failures)
+        self._failures += 1
+        retry_at = now + datetime.timedelta(seconds=delay)
+        for incident_id in incident_ids:
+            if incident_id not in self._due:
+                self._due[incident_id] = retry_at
+                heapq.heappush(self._heap, (retry_at, incident_id))
+
+    def _next_delay(self, now: datetime.datetime) -> Optional[float]:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    async def run(
+        self,
+        activate: Callable[[List[int]], Awaitable[None]],
+        load: Optional[Callable[[], Awaitable[Iterable[Tuple[int, datetime.datetime]]]]] = None,
+    ) -> None:
+        """Sleep until the next activation is due and call `activate` with all due ids.
+        `load` returns the pending (incident_id, scheduled_at) pairs when a reload is requested.
+        """
+        while True:
+            if self._reload_requested and load is not None:
+                self._reload_requested = False
+                try:
+                    self.load(await load())
+                except Exception as e:
+                    print("activation scheduler reload error:", e)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            due_ids = self._pop_due(now)
+            if due_ids:
+                try:
+                    await activate(due_ids)
+                    self._failures = 0
+                except Exception as e:
+                    # Avoid crashing the scheduler, and retry: the incidents are still 'new'
+                    print("activation scheduler error:", e)
+                    self._retry(due_ids, now)
+                continue
+            self._wakeup.clear()
+            delay = self._next_delay(now)
+            try:
+                # No timeout when nothing is scheduled: stay idle until a schedule change
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = ActivationScheduler()
@@ -0,0 +1,184 @@
+"""Full-text incident search on SQLite FTS5.
+
+`incidents_fts` / `incidents_archive_fts` (see migrations.incident_search_index) index
+title, description and address of live and archived incidents. User input never reaches
+FTS5 as query syntax: fts_query turns it into quoted terms that must all match, the last
+one as a prefix so results follow typing. Highlights come back HTML-escaped with matches
+wrapped in <mark>.
+
+Ranking (bm25, title weighted highest) has to score every match, which for a term found in
+most of the history costs far more than the page. Only the newest SEARCH_RANK_WINDOW
+matches per table are ranked; more specific queries reach further back.
+
+Usage:
+    python -m app.core.search bench [--incidents 100000] [--queries 50]
+"""
+import html
+import os
+import re
+from typing import Optional
+
+# Matches ranked per table (newest first); 0 ranks all matches
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "1000"))
+# Terms accepted per query
+SEARCH_MAX_TERMS = 8
+# bm25 weights of the indexed columns: title, description, address
+SEARCH_WEIGHTS = (10.0, 1.0, 4.0)
+# Tokens around the matches in the description snippet
+SNIPPET_TOKENS = 16
+
+# Match markers used inside SQLite, replaced after escaping the text
+HIGHLIGHT_OPEN = "\x02"
+HIGHLIGHT_CLOSE = "\x03"
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression for free text: every word must match, the last one as a prefix
+    (if it has at least two characters). Raises ValueError for text without words or with
+    more than SEARCH_MAX_TERMS words."""
+    terms = _TERM_RE.findall(text or "")
+    if not terms:
+        raise ValueError("search text contains no words")
+    if len(terms) > SEARCH_MAX_TERMS:
+        raise ValueError(f"search text has more than {SEARCH_MAX_TERMS} words")
+    # \w+ never contains a double quote, so quoting makes every term a plain string
+    parts = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= 2:
+        parts[-1] += "*"
+    return " ".join(parts)
+
+
+def highlight_html(text: Optional[str]) -> Optional[str]:
+    """HTML-escape FTS5 highlight()/snippet() output and turn the markers into <mark>."""
+    if text is None:
+        return None
+    return html.escape(text).replace(HIGHLIGHT_OPEN, "<mark>").replace(HIGHLIGHT_CLOSE, "</mark>")
+
+
+# Vocabulary of the generated benchmark dataset
+_KINDS = (
+    "Brand Wohnung", "Brand Zimmer", "Brand Garage", "Brand Scheune", "Flächenbrand", "Kaminbrand",
+    "Mülltonnenbrand", "PKW-Brand", "Ölspur", "Ölspur groß", "Verkehrsunfall", "Verkehrsunfall eingeklemmt",
+    "Türöffnung", "Türnotöffnung", "Tierrettung", "Wasserschaden", "Wasser im Keller", "Unwetter",
+    "Sturmschaden", "Baum auf Straße", "BMA", "Brandmeldeanlage", "Rauchwarnmelder", "Person in Notlage",
+    "Person im Wasser", "Tragehilfe", "Gasgeruch", "Gefahrstoffaustritt", "Insekten", "Rauchentwicklung",
+    "Aufzug", "Fahrzeugbergung", "Kraftstoff ausgelaufen", "Hochwasser", "Eisrettung", "Absicherung",
+)
+_STREETS = (
+    "Hauptstraße", "Bahnhofstraße", "Schulstraße", "Gartenstraße", "Dorfstraße", "Bergstraße",
+    "Lindenstraße", "Kirchstraße", "Waldstraße", "Ringstraße", "Mühlenweg", "Am Markt", "Kirchgasse",
+    "Feldweg", "Birkenweg", "Eichenweg", "Lindenallee", "Schillerstraße", "Goethestraße", "Mozartstraße",
+    "Industriestraße", "Gewerbering", "Am Sportplatz", "Friedhofstraße", "Rathausplatz", "Brückenstraße",
+    "Wiesenweg", "Talstraße", "Sonnenhang", "Am Bach", "Rosenweg", "Tulpenweg", "Ahornweg", "Kastanienallee",
+)
+_TOWNS = (
+    "Musterstadt", "Neudorf", "Altheim", "Bergheim", "Talhausen", "Waldau", "Oberbach", "Unterbach",
+    "Kirchberg", "Steinfeld", "Rosental", "Hohenwart",
+)
+_WORDS = (
+    "Anrufer meldet starke Rauchentwicklung aus dem Dachgeschoss Personen vermutlich noch im Gebäude "
+    "Fahrbahn auf etwa hundert Meter verschmutzt Polizei vor Ort Rettungsdienst alarmiert Lage unklar "
+    "eine Person eingeklemmt zwei Fahrzeuge beteiligt Betriebsstoffe laufen aus Keller vollgelaufen "
+    "Katze auf Baum Hund in Notlage Nachbarin hat Schlüssel ältere Dame gestürzt Zugang über Hof "
+    "Feuerschein sichtbar Funkenflug Gefahr für angrenzende Gebäude Rückmeldung an Leitstelle "
+    "Wasserversorgung über Hydrant Drehleiter nachgefordert Strom abschalten Gas abgestellt Schaum"
+).split()
+
+
+def benchmark(incidents: int = 100000, queries: int = 50) -> None:
+    """Search latency over a generated incident history (an archive share included), compared
+    with the LIKE scan a search without the index would need."""
+    import asyncio
+    import datetime
+    import random
+    import statistics
+    import tempfile
+    import time
+
+    from sqlalchemy import func, insert, or_, select
+
+    from ..api.routes.incidents import crud
+    from ..db.sql import models
+    from ..db.sql.connect import Base, create_engines, make_sessionmaker
+    from ..db.sql.migrations import migrate
+
+    rng = random.Random(23)
+    start = datetime.datetime(2015, 1, 1)
+    step = (datetime.datetime(2025, 1, 1) - start) / incidents
+    archived = int(incidents * 0.8)
+
+    def row(i: int) -> dict:
+        created = start + step * i
+        return {
+            "id": i + 1,
+            "title": f"{rng.choice(_KINDS)} {rng.choice(_STREETS)}" if rng.random() < 0.3 else rng.choice(_KINDS),
+            "description": " ".join(rng.choices(_WORDS, k=rng.randint(4, 24))),
+            "address": f"{rng.choice(_STREETS)} {rng.randint(1, 180)}, {rng.randint(10000, 99999)} {rng.choice(_TOWNS)}",
+            "status": models.IncidentStatus.closed,
+            "created_at": created,
+            "closed_at": created + datetime.timedelta(hours=2),
+            "revision": i + 1,
+        }
+
+    cases = {
+        "rare word": "Eisrettung",
+        "umlaut/diacritics": "Olspur",
+        "street + town": "Lindenallee Talhausen",
+        "kind + street prefix": "Brand Hauptstr",
+        "common word": "Brand",
+        "everywhere (window)": "Anrufer",
+    }
+
+    async def run(tmp: str) -> None:
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        Session = make_sessionmaker(writer, reader)
+        await migrate(writer, Base.metadata)
+        t0 = time.perf_counter()
+        async with Session() as db:
+            rows = [row(i) for i in range(incidents)]
+            now = datetime.datetime.now(datetime.timezone.utc)
+            archive_rows = [dict(r, archived_at=now) for r in rows[:archived]]
+            for offset in range(0, len(archive_rows), 5000):
+                await db.execute(insert(models.IncidentArchive), archive_rows[offset:offset + 5000])
+            for offset in range(archived, len(rows), 5000):
+                await db.execute(insert(models.Incident), rows[offset:offset + 5000])
+            await db.commit()
+        print(f"{incidents} incidents ({archived} archived) generated and indexed in "
+              f"{time.perf_counter() - t0:.1f} s, rank window {SEARCH_RANK_WINDOW}")
+
+        async with Session() as db:
+            for label, text in cases.items():
+                await crud.search_incidents(db, text, include_archived=True)  # warm up
+                samples = []
+                for _ in range(queries):
+                    t0 = time.perf_counter()
+                    hits = await crud.search_incidents(db, text, limit=20, include_archived=True)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                like = f"%{text.split()[0]}%"
+                t0 = time.perf_counter()
+                for entity in (models.Incident, models.IncidentArchive):
+                    await db.execute(select(func.count()).where(or_(
+                        entity.title.like(like), entity.description.like(like), entity.address.like(like)
+                    )))
+                scan = (time.perf_counter() - t0) * 1000
+                samples.sort()
+                print(f"{label:<22} {text!r:<24} hits={len(hits):>2} median={statistics.median(samples):6.2f} ms "
+                      f"p95={samples[int(len(samples) * 0.95) - 1]:6.2f} ms  (LIKE scan, first word: {scan:7.1f} ms)")
+        await writer.dispose()
+        if reader is not None:
+            await reader.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m app.core.search")
+    parser.add_argument("command", choices=["bench"], help="bench: search latency over a generated history")
+    parser.add_argument("--incidents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    benchmark(args.incidents, args.queries)
@@ -1,3 +1,8 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -5,6 +10,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, object_session
 
 from ..db.sql import models
 from ..db.sql.connect import get_db
@@ -14,16 +22,34 @@ from sqlalchemy.ext.asyncio import AsyncSession
 SECRET_KEY = "a_very_secret_key_that_should_be_in_an_env_file"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Verified tokens are remembered this long (never beyond their exp). Role/password
+# changes invalidate entries in the same process; other worker processes notice within the TTL
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+# pbkdf2_sha256 rounds. Stored hashes with a different count are rehashed on the next login
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Threads hashing passwords; keeps logins from blocking the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Login throttling: attempts per client IP, and failed attempts per username and client IP,
+# within the window (shared by all worker processes)
+LOGIN_WINDOW = float(os.getenv("LOGIN_WINDOW", "60"))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "20"))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5"))
 
 # --- Password Hashing ---
 class PasswordManager:
     def __init__(self):
         # Prefer pbkdf2_sha256 to avoid importing the bcrypt backend during startup.
         # Keep bcrypt-based schemes for compatibility if needed later.
+        # min/max pin the round count, so hashes made under another policy need an update
         self.pwd_context = CryptContext(
             schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"],
             deprecated="auto",
+            pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+            pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+            pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
         )
+        self._executor: Optional[ThreadPoolExecutor] = None
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         return self.pwd_context.verify(plain_password, hashed_password)
@@ -31,8 +57,114 @@ class PasswordManager:
     def get_password_hash(self, password: str) -> str:
         return self.pwd_context.hash(password)
 
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: Optional[str]) -> tuple[bool, Optional[str]]:
+        """Verify off the event loop. Returns (ok, new_hash); new_hash is set when the stored
+        hash does not match the current policy and should replace it.
+        Without a stored hash a dummy verification keeps the timing the same.
+        """
+        if not hashed_password:
+            await self._run(self.pwd_context.dummy_verify)
+            return False, None
+        return await self._run(self.pwd_context.verify_and_update, plain_password, hashed_password)
+
 password_manager = PasswordManager()
 
+# --- Login Throttling ---
+class LoginThrottle:
+    """Limits checked before any password hashing is done: attempts per client IP, and
+    failed attempts per username from one client IP (so a user cannot be locked out by
+    failures from somewhere else).
+
+    Each limit allows `limit` events per window, evenly refilled (GCRA): its rate_limits
+    row holds the time up to which the budget is used, every event moves it on by
+    window / limit, and an event is refused while that would put it more than a window
+    ahead. The rows are shared by all worker processes and only removed once expired.
+    """
+
+    def __init__(self, window: float = LOGIN_WINDOW, max_per_ip: int = LOGIN_MAX_ATTEMPTS_PER_IP,
+                 max_failures_per_user: int = LOGIN_MAX_FAILURES_PER_USER):
+        self.window = window
+        self.max_per_ip = max_per_ip
+        self.max_failures_per_user = max_failures_per_user
+        self.rejected = 0
+        self._pruned_at = 0.0
+
+    def _user_key(self, username: str, ip: Optional[str]) -> str:
+        return f"login-user:{username.casefold()}@{ip}"
+
+    def _wait(self, used_until: float, limit: int, now: float) -> float:
+        return max(1.0, used_until + self.window / limit - self.window - now)
+
+    async def _used_until(self, db: AsyncSession, key: str) -> float:
+        rate = models.RateLimit
+        return (await db.execute(select(rate.next_at).where(rate.name == key))).scalar() or 0.0
+
+    async def _take(self, db: AsyncSession, key: str, limit: int, now: float) -> bool:
+        """Use one event of the budget if there is one left."""
+        rate = models.RateLimit
+        step = self.window / limit
+        await db.execute(sqlite_insert(rate).values(name=key, next_at=0.0).on_conflict_do_nothing())
+        result = await db.execute(
+            update(rate)
+            .where(rate.name == key, func.max(rate.next_at, now) + step <= now + self.window)
+            .values(next_at=func.max(rate.next_at, now) + step)
+            .returning(rate.next_at)
+        )
+        taken = result.scalar() is not None
+        await db.commit()
+        return taken
+
+    async def _prune(self, db: AsyncSession, now: float) -> None:
+        if now - self._pruned_at < self.window:
+            return
+        self._pruned_at = now
+        rate = models.RateLimit
+        # Names starting with "login-" ("." sorts right after "-"), range-scanned on the key
+        await db.execute(delete(rate).where(rate.name >= "login-", rate.name < "login.", rate.next_at < now))
+        await db.commit()
+
+    async def check(self, db: AsyncSession, username: str, ip: Optional[str]) -> Optional[float]:
+        """Record an attempt. Returns seconds to wait if it must be rejected, else None."""
+        now = time.time()
+        await self._prune(db, now)
+        failures = self.max_failures_per_user
+        used_until = await self._used_until(db, self._user_key(username, ip))
+        if max(used_until, now) + self.window / failures > now + self.window:
+            self.rejected += 1
+            return self._wait(used_until, failures, now)
+        ip_key = f"login-ip:{ip}"
+        if not await self._take(db, ip_key, self.max_per_ip, now):
+            self.rejected += 1
+            return self._wait(await self._used_until(db, ip_key), self.max_per_ip, now)
+        return None
+
+    async def failed(self, db: AsyncSession, username: str, ip: Optional[str]) -> None:
+        rate = models.RateLimit
+        now = time.time()
+        await db.execute(
+            sqlite_insert(rate)
+            .values(name=self._user_key(username, ip), next_at=now + self.window / self.max_failures_per_user)
+            .on_conflict_do_update(
+                index_elements=[rate.name],
+                set_={"next_at": func.max(rate.next_at, now) + self.window / self.max_failures_per_user},
+            )
+        )
+        await db.commit()
+
+    async def succeeded(self, db: AsyncSession, username: str, ip: Optional[str]) -> None:
+        await db.execute(delete(models.RateLimit).where(models.RateLimit.name == self._user_key(username, ip)))
+        await db.commit()
+
+login_throttle = LoginThrottle()
+
 # --- JWT Token Handling ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
@@ -46,8 +178,107 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- Principal Cache ---
+class PrincipalCache:
+    """Bounded LRU of verified token -> user principal.
+
+    Saves the JWT decode and the user lookup for repeated requests with the same token.
+    Cached principals are detached copies without the password hash.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, models.User]]" = OrderedDict()
+        # Bumped on every invalidation so a lookup that raced with it is not cached
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[models.User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.time():
+            del self._entries[token]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token: str, user: models.User, exp: Optional[float], generation: int) -> models.User:
+        principal = models.User(id=user.id, username=user.username, role=user.role)
+        if self.ttl <= 0 or generation != self.generation:
+            return principal
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        self._entries[token] = (expires_at, principal)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return principal
+
+    def invalidate_user(self, username: str) -> None:
+        self.generation += 1
+        stale = [token for token, (_, principal) in self._entries.items() if principal.username == username]
+        for token in stale:
+            del self._entries[token]
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    """ORM writes to a user (role, password, rename, delete) drop its cached principals.
+    Bulk UPDATE statements bypass this and must call principal_cache.invalidate_user.
+    """
+    usernames = {target.username, *(inspect(target).attrs.username.history.deleted or ())}
+    for username in usernames:
+        principal_cache.invalidate_user(username)
+    # Once more after commit: a lookup between flush and commit still read the old row
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("invalidate_principals", set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals_after_commit(session):
+    for username in session.info.pop("invalidate_principals", ()):
+        principal_cache.invalidate_user(username)
+
 # --- User Dependency ---
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> models.User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    generation = principal_cache.generation
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -65,9 +296,78 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     user = await get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
-    return user
+    return principal_cache.put(token, user, payload.get("exp"), generation)
 
 async def get_current_active_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="The user doesn't have enough privileges")
     return current_user
+
+def benchmark(requests: int = 2000, concurrency: int = 20) -> None:
+    """Authenticated request throughput against a scratch database, without and with the principal cache."""
+    import asyncio
+    import os
+    import statistics
+    import tempfile
+
+    import httpx
+    from fastapi import FastAPI
+
+    from ..db.sql.connect import Base, create_engines, make_sessionmaker
+    from ..db.sql.migrations import migrate
+
+    async def run(tmp: str) -> None:
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        Session = make_sessionmaker(writer, reader)
+        await migrate(writer, Base.metadata)
+        async with Session() as db:
+            db.add(models.User(username="bench", hashed_password="", role=models.UserRole.admin))
+            await db.commit()
+
+        async def bench_db():
+            async with Session() as session:
+                yield session
+
+        app = FastAPI()
+        app.dependency_overrides[get_db] = bench_db
+
+        @app.get("/whoami")
+        async def whoami(user: models.User = Depends(get_current_active_admin)):
+            return {"username": user.username}
+
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, ttl in (("no cache", 0), (f"cache ttl={PRINCIPAL_CACHE_TTL:g}s", PRINCIPAL_CACHE_TTL)):
+                principal_cache.ttl = ttl
+                principal_cache.clear()
+                principal_cache.hits = principal_cache.misses = 0
+                latencies = []
+
+                async def worker(n: int):
+                    for _ in range(n):
+                        t0 = time.perf_counter()
+                        resp = await client.get("/whoami", headers=headers)
+                        resp.raise_for_status()
+                        latencies.append((time.perf_counter() - t0) * 1000)
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - t0
+                print(f"{label:<16} {len(latencies) / elapsed:8.1f} req/s  median={statistics.median(latencies):6.2f} ms")
+            print("cache stats:", principal_cache.stats())
+        await writer.dispose()
+        if reader is not None:
+            await reader.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m app.core.security")
+    parser.add_argument("command", choices=["bench"], help="bench: authenticated request throughput")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.requests, args.concurrency)
@@ -1,13 +1,265 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
 from fastapi import WebSocket
-from typing import List
+
+from .events import EventBus, create_event_bus
+
+# Outbound frames buffered per client before the slow-consumer policy applies
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+# A single send taking longer than this marks the client as stalled
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+# "disconnect": close clients whose queue is full (they reconnect and resync)
+# "drop_oldest": discard the oldest queued frame instead
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "disconnect").lower()
+# Recent broadcasts kept for replay to reconnecting clients
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", "1000"))
+# Seconds over which outbound events are collected into one `batch` frame (0 sends each at once)
+WS_BATCH_WINDOW = float(os.getenv("WS_BATCH_WINDOW", "0.1"))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, "value"):  # enums
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message: dict) -> bytes:
+    """Serialize a broadcast message once for all clients.
+
+    Frames go out as binary WebSocket messages holding UTF-8 JSON: ASGI only takes text
+    frames as `str` and would encode them again for every client."""
+    return json.dumps(message, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _entity_key(message: dict) -> Optional[Tuple[str, object]]:
+    """Key of the entity whose full state an event carries; later events for the same key
+    supersede earlier ones. None for events that must all be delivered."""
+    kind = message.get("type") or ""
+    if kind == "options_updated":
+        return ("options", None)
+    for entity in ("incident", "vehicle"):
+        if kind.startswith(entity + "_"):
+            payload = message.get(entity)
+            entity_id = payload.get("id") if isinstance(payload, dict) else message.get(f"{entity}_id")
+            return (entity, entity_id) if entity_id is not None else None
+    return None
+
+
+def _merge(previous: dict, message: dict) -> dict:
+    """Collapse two events for one entity: the latest state under the strongest type, so a
+    `*_created` followed by updates still arrives as created (a deletion replaces both)."""
+    kind, earlier = message.get("type") or "", previous.get("type") or ""
+    if earlier.endswith("_created") and kind.endswith("_updated"):
+        return {**message, "type": earlier}
+    return message
+
+
+class EventAggregator:
+    """Collects outbound events for a short window and hands them on as one list.
+
+    Within a window, events for the same incident/vehicle (or the options) collapse into the
+    latest one, keeping `*_created` if the entity was created in the window, so a burst of
+    edits costs one frame per client. Alarms (`type == "alarm"`
+    or flagged `alarm`) flush what is pending and go out immediately.
+    """
+
+    def __init__(self, emit: Callable[[List[dict]], None], window: float = WS_BATCH_WINDOW):
+        self.emit = emit
+        self.window = window
+        self.pending: Dict[object, dict] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.received = 0
+        self.collapsed = 0
+        self.emitted = 0
+
+    def add(self, message: dict) -> None:
+        self.received += 1
+        if self.window <= 0 or message.get("type") == "alarm" or message.get("alarm"):
+            self.flush()
+            self._emit([message])
+            return
+        key = _entity_key(message)
+        if key is None:
+            key = object()
+        elif key in self.pending:
+            # Drop the superseded event; the latest state takes its place at the end
+            message = _merge(self.pending.pop(key), message)
+            self.collapsed += 1
+        self.pending[key] = message
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            events = list(self.pending.values())
+            self.pending.clear()
+            self._emit(events)
+
+    def _emit(self, events: List[dict]) -> None:
+        self.emitted += 1
+        self.emit(events)
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "received": self.received,
+            "collapsed": self.collapsed,
+            "frames": self.emitted,
+            "pending": len(self.pending),
+        }
+
+
+class ClientConnection:
+    """One WebSocket with its own bounded outbound queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: "asyncio.Queue[Tuple[float, bytes]]" = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._writer())
+
+    def enqueue(self, frame: bytes) -> bool:
+        """Queue a frame without waiting. Returns False if the client should be dropped."""
+        item = (time.monotonic(), frame)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if WS_SLOW_CLIENT_POLICY == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            self.queue.put_nowait(item)
+            return True
+        self.dropped += 1
+        return False
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                enqueued_at, frame = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_bytes(frame), timeout=WS_SEND_TIMEOUT)
+                self.sent += 1
+                self.last_lag = time.monotonic() - enqueued_at
+                self.max_lag = max(self.max_lag, self.last_lag)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out: treat the client as gone
+            self.manager.disconnect(self.websocket)
+            await self.close()
+
+    async def close(self) -> None:
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        client = self.websocket.client
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "connected_at": datetime.datetime.fromtimestamp(self.connected_at, datetime.timezone.utc),
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
+
 
 class ConnectionManager:
+    """Fans broadcasts out to all WebSockets.
+
+    Every broadcast carries a sequence number `seq`. Sequence numbers are only meaningful
+    within one `epoch` (a fresh id per process start). A reconnecting client passes the
+    last seq/epoch it saw and gets the missed frames replayed from a bounded buffer, or a
+    `resync_required` frame if they are no longer available.
+
+    Broadcasts go through an event bus (see core.events) so that, with several worker
+    processes, every process delivers them to its own clients. Seq numbers are assigned
+    on delivery and therefore stay per process, like the epoch.
+
+    Delivered events pass an EventAggregator: several events from one window go out as a
+    single `{"type": "batch", "events": [...]}` frame with one seq; a lone event is sent as is.
+    """
+
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.evicted = 0
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.replay: Deque[Tuple[int, bytes]] = deque(maxlen=WS_REPLAY_BUFFER)
+        self.bus: EventBus = create_event_bus("inprocess")
+        self.bus.deliver = self.deliver
+        self.listeners: List[Callable[[dict], None]] = []
+        self.aggregator = EventAggregator(self.send)
+
+    async def start_bus(self, bus: Optional[EventBus] = None) -> None:
+        """Switch to the configured (cross-process) bus; called once at startup."""
+        bus = bus or create_event_bus()
+        await bus.start(self.deliver)
+        self.bus = bus
+
+    async def stop_bus(self) -> None:
+        await self.bus.stop()
+        self.aggregator.flush()
 
-    async def connect(self, websocket: WebSocket):
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        """Call `listener(message)` for every delivered broadcast, whichever process published it."""
+        self.listeners.append(listener)
+
+    async def connect(self, websocket: WebSocket, resume_from: Optional[int] = None, epoch: Optional[str] = None):
         await websocket.accept()
+        client = ClientConnection(websocket, self)
+        # No await between queuing the replay and registering the client, so no broadcast can slip in between
+        client.enqueue(encode_message({"type": "hello", "epoch": self.epoch, "seq": self.seq}))
+        if resume_from is not None:
+            for frame in self.missed_frames(resume_from, epoch):
+                client.enqueue(frame)
+        self.clients[websocket] = client
         self.active_connections.append(websocket)
+        client.start()
+
+    def missed_frames(self, resume_from: int, epoch: Optional[str]) -> List[bytes]:
+        """Frames after `resume_from`, or a single resync_required frame if some were lost."""
+        resync = [encode_message({"type": "resync_required", "epoch": self.epoch, "seq": self.seq})]
+        if epoch != self.epoch:
+            return resync
+        if resume_from >= self.seq:
+            return []
+        oldest = self.replay[0][0] if self.replay else self.seq + 1
+        if resume_from < oldest - 1:
+            return resync
+        frames = [frame for seq, frame in self.replay if seq > resume_from]
+        # Replaying more than fits the client's queue (next to the hello frame) would evict it
+        if len(frames) >= WS_QUEUE_SIZE:
+            return resync
+        return frames
 
     def disconnect(self, websocket: WebSocket):
         # Be robust if the websocket was already removed
@@ -15,16 +267,57 @@ class ConnectionManager:
             self.active_connections.remove(websocket)
         except ValueError:
             pass
+        client = self.clients.pop(websocket, None)
+        if client is not None and client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
 
     async def broadcast(self, message: dict):
-        stale: List[WebSocket] = []
-        for connection in list(self.active_connections):
+        """Publish a message to the clients of every process."""
+        await self.bus.publish(message)
+
+    async def deliver(self, message: dict):
+        """Notify listeners right away and queue the event for the local clients."""
+        for listener in self.listeners:
             try:
-                await connection.send_json(message)
-            except Exception:
-                stale.append(connection)
-        for s in stale:
-            if s in self.active_connections:
-                self.active_connections.remove(s)
+                listener(message)
+            except Exception as e:
+                print("broadcast listener error:", e)
+        if message.get("type") == "resync_required":
+            # This process missed an event on the bus: clients catch up via /api/sync
+            self.aggregator.flush()
+            self.send([{**message, "epoch": self.epoch}])
+            return
+        self.aggregator.add(message)
+
+    def send(self, events: List[dict]) -> None:
+        """Serialize once and hand the frame to every local client's queue; never waits on a client."""
+        message = events[0] if len(events) == 1 else {"type": "batch", "events": events}
+        self.seq += 1
+        frame = encode_message({**message, "seq": self.seq})
+        self.replay.append((self.seq, frame))
+        for websocket in list(self.active_connections):
+            client = self.clients.get(websocket)
+            if client is None:
+                continue
+            if not client.enqueue(frame):
+                # Slow consumer: evict so it reconnects and catches up via /api/sync
+                self.evicted += 1
+                self.disconnect(websocket)
+                asyncio.create_task(client.close())
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.clients),
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "replay_buffered": len(self.replay),
+            "evicted": self.evicted,
+            "queue_size": WS_QUEUE_SIZE,
+            "send_timeout": WS_SEND_TIMEOUT,
+            "slow_client_policy": WS_SLOW_CLIENT_POLICY,
+            "bus": self.bus.stats(),
+            "batching": self.aggregator.stats(),
+            "clients": [c.stats() for c in self.clients.values()],
+        }
 
 manager = ConnectionManager()
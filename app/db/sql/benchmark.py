@@ -0,0 +1,144 @@
+"""Read throughput while writes are happening, per SQLite engine configuration.
+
+Runs the same workload (concurrent incident list reads, while a second process keeps
+inserting incidents) against a scratch database, once with SQLite's defaults and a single
+shared pool ("legacy") and once with the configured profile and writer/reader split.
+
+Usage:
+    python -m app.db.sql.benchmark [--duration 5] [--readers 8] [--rows 2000] [--batch 20]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from . import models
+from .connect import SQLITE_PROFILE, SQLITE_READ_POOL_SIZE, Base, create_engines, make_sessionmaker
+
+
+async def _setup(url: str, profile: str, rows: int) -> None:
+    writer, _ = create_engines(url, profile=profile, read_pool_size=0, echo=False)
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with make_sessionmaker(writer, None)() as db:
+        db.add_all(models.Incident(title=f"Seed {i}", description="", address="", status=models.IncidentStatus.closed)
+                   for i in range(rows))
+        await db.commit()
+    await writer.dispose()
+
+
+async def _write(url: str, profile: str, single_writer: bool, duration: float, batch: int) -> tuple[int, int]:
+    writer, _ = create_engines(url, profile=profile, read_pool_size=0, single_writer=single_writer, echo=False)
+    Session = make_sessionmaker(writer, None)
+    stop = time.monotonic() + duration
+    counts = {"rows": 0, "errors": 0}
+
+    async def write_loop(worker: int):
+        i = 0
+        while time.monotonic() < stop:
+            try:
+                async with Session() as db:
+                    db.add_all(models.Incident(title=f"Bench {worker}.{i}.{n}", description="", address="",
+                                               status=models.IncidentStatus.new) for n in range(batch))
+                    await db.commit()
+                counts["rows"] += batch
+            except Exception:
+                counts["errors"] += 1
+            i += 1
+
+    # Two writers so the single-writer queue is exercised too
+    await asyncio.gather(write_loop(0), write_loop(1))
+    await writer.dispose()
+    return counts["rows"], counts["errors"]
+
+
+def _write_process(url: str, profile: str, single_writer: bool, duration: float, batch: int, out) -> None:
+    out.put(asyncio.run(_write(url, profile, single_writer, duration, batch)))
+
+
+async def _read(url: str, profile: str, read_pool_size: int, duration: float, readers: int) -> tuple[list[float], int]:
+    writer, reader = create_engines(url, profile=profile, read_pool_size=read_pool_size, echo=False)
+    Session = make_sessionmaker(writer, reader)
+    stop = time.monotonic() + duration
+    latencies: list[float] = []
+    errors = 0
+
+    async def read_loop():
+        nonlocal errors
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                async with Session() as db:
+                    result = await db.execute(
+                        select(models.Incident).order_by(models.Incident.created_at.desc()).limit(50)
+                    )
+                    result.scalars().all()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(read_loop() for _ in range(readers)))
+    await writer.dispose()
+    if reader is not None:
+        await reader.dispose()
+    return latencies, errors
+
+
+def _run(url: str, profile: str, read_pool_size: int, single_writer: bool,
+         duration: float, readers: int, rows: int, batch: int) -> dict:
+    """Reads in this process while another process writes, as with several app workers."""
+    asyncio.run(_setup(url, profile, rows))
+    out = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_write_process, args=(url, profile, single_writer, duration, batch, out))
+    proc.start()
+    latencies, read_errors = asyncio.run(_read(url, profile, read_pool_size, duration, readers))
+    rows_written, write_errors = out.get()
+    proc.join()
+
+    latencies.sort()
+    return {
+        "reads_per_s": len(latencies) / duration,
+        "read_median_ms": statistics.median(latencies) if latencies else 0.0,
+        "read_p95_ms": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+        "writes_per_s": rows_written / duration,
+        "read_errors": read_errors,
+        "write_errors": write_errors,
+    }
+
+
+def benchmark(duration: float = 5.0, readers: int = 8, rows: int = 2000, batch: int = 20,
+              profile: str = SQLITE_PROFILE, read_pool_size: int = SQLITE_READ_POOL_SIZE) -> None:
+    variants = [
+        ("legacy", "legacy", 0, False),
+        (f"{profile}, read pool {read_pool_size}", profile, read_pool_size, True),
+    ]
+    for label, var_profile, pool, single_writer in variants:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+            r = _run(url, var_profile, pool, single_writer, duration, readers, rows, batch)
+        print(f"{label:<28} reads/s={r['reads_per_s']:8.1f} median={r['read_median_ms']:6.2f} ms "
+              f"p95={r['read_p95_ms']:6.2f} ms rows written/s={r['writes_per_s']:7.1f} "
+              f"errors(read/write)={r['read_errors']}/{r['write_errors']}")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.db.sql.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per variant")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent reader tasks")
+    parser.add_argument("--rows", type=int, default=2000, help="incidents seeded before measuring")
+    parser.add_argument("--batch", type=int, default=20, help="incidents inserted per write transaction")
+    parser.add_argument("--profile", default=SQLITE_PROFILE)
+    parser.add_argument("--read-pool", type=int, default=SQLITE_READ_POOL_SIZE)
+    args = parser.parse_args(argv)
+    benchmark(args.duration, args.readers, args.rows, args.batch, args.profile, args.read_pool)
+
+
+if __name__ == "__main__":
+    main()
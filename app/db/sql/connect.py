@@ -1,17 +1,137 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+from typing import Optional
 
-DATABASE_URL = "sqlite+aiosqlite:///./data/feuerwehr.db"
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql import Delete, Insert, TextClause, Update
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+from .migrations import migrate
 
-AsyncSessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    expire_on_commit=False,
-    bind=engine,
-    class_=AsyncSession,
-)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/feuerwehr.db")
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "0").lower() in ("1", "true", "yes")
+
+# Pragma profiles applied to every new connection. "legacy" keeps SQLite's defaults
+# (rollback journal, no busy timeout); WAL lets readers run while a write is in progress.
+SQLITE_PROFILES = {
+    "legacy": {},
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -32000,  # KiB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced").lower()
+# Reads use their own pool of query-only connections; 0 sends reads to the writer
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+# Seconds a write waits for the single writer connection
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+
+
+def sqlite_pragmas(profile: str = SQLITE_PROFILE) -> dict:
+    """Pragmas of a profile, with per-pragma overrides from SQLITE_<PRAGMA> variables."""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}' (choose from {', '.join(SQLITE_PROFILES)})")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"):
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+def _apply_pragmas(engine: AsyncEngine, pragmas: dict, query_only: bool = False) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # The journal mode is stored in the database file; only the writer sets it
+            if query_only and name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_engines(
+    url: str = DATABASE_URL,
+    profile: str = SQLITE_PROFILE,
+    read_pool_size: int = SQLITE_READ_POOL_SIZE,
+    single_writer: bool = True,
+    echo: bool = DATABASE_ECHO,
+) -> tuple[AsyncEngine, Optional[AsyncEngine]]:
+    """Create the writer engine (one connection, so writes never contend for the SQLite
+    lock within a process) and, if read_pool_size > 0, a pool of query-only readers.
+    """
+    pragmas = sqlite_pragmas(profile)
+    writer_args = {"pool_size": 1, "max_overflow": 0, "pool_timeout": SQLITE_WRITE_TIMEOUT} if single_writer else {}
+    writer = create_async_engine(url, echo=echo, **writer_args)
+    _apply_pragmas(writer, pragmas)
+    reader = None
+    if read_pool_size > 0:
+        reader = create_async_engine(url, echo=echo, pool_size=read_pool_size, max_overflow=read_pool_size)
+        _apply_pragmas(reader, pragmas, query_only=True)
+    return writer, reader
+
+
+class RoutingSession(Session):
+    """Sends reads to the reader pool and writes to the writer connection.
+
+    Once a transaction has written, its remaining statements also use the writer so they
+    see their own uncommitted changes; after commit/rollback reads go back to the readers.
+    Raw text() statements may write, so they always use the writer.
+    """
+
+    writer = None
+    reader = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_writer = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.reader is None:
+            return self.writer
+        if self.use_writer or self._flushing or isinstance(clause, (Insert, Update, Delete, TextClause)):
+            self.use_writer = True
+            return self.writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.use_writer = False
+
+
+def make_sessionmaker(writer: AsyncEngine, reader: Optional[AsyncEngine]) -> sessionmaker:
+    routing = type("BoundRoutingSession", (RoutingSession,), {
+        "writer": writer.sync_engine,
+        "reader": reader.sync_engine if reader is not None else None,
+    })
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        class_=AsyncSession,
+        sync_session_class=routing,
+    )
+
+
+engine, read_engine = create_engines()
+
+AsyncSessionLocal = make_sessionmaker(engine, read_engine)
 
 Base = declarative_base()
 
@@ -20,83 +140,5 @@ async def get_db():
         yield session
 
 async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    # After ensuring tables exist, make sure new columns are present (simple SQLite migration)
-    await ensure_incident_columns()
-    await ensure_vehicle_status_integer()
-
-async def ensure_incident_columns():
-    """Ensure newly added columns exist on the incidents table for SQLite.
-    This is a lightweight migration helper to avoid breaking existing dev DBs.
-    """
-    async with engine.begin() as conn:
-        # Check existing columns
-        pragma = await conn.exec_driver_sql("PRAGMA table_info('incidents')")
-        rows = pragma.fetchall()
-        existing = {row[1] for row in rows}  # row[1] is the column name
-
-        statements = []
-        if 'address' not in existing:
-            statements.append("ALTER TABLE incidents ADD COLUMN address TEXT NOT NULL DEFAULT ''")
-        if 'latitude' not in existing:
-            statements.append("ALTER TABLE incidents ADD COLUMN latitude REAL")
-        if 'longitude' not in existing:
-            statements.append("ALTER TABLE incidents ADD COLUMN longitude REAL")
-        if 'scheduled_at' not in existing:
-            statements.append("ALTER TABLE incidents ADD COLUMN scheduled_at DATETIME")
-
-        for stmt in statements:
-            await conn.exec_driver_sql(stmt)
-
-async def ensure_vehicle_status_integer():
-    """Ensure vehicles.status is an INTEGER with allowed values {1,2,3,4,6}.
-    If an old schema exists with string enum + CHECK constraint, rebuild the table safely and migrate data.
-    """
-    async with engine.begin() as conn:
-        pragma = await conn.exec_driver_sql("PRAGMA table_info('vehicles')")
-        rows = pragma.fetchall()
-        cols = {row[1]: row[2].lower() if row[2] else '' for row in rows}  # name -> declared type
-
-        # If table doesn't exist yet, nothing to do (create_all will create it with INTEGER via models)
-        if not rows:
-            return
-
-        declared = cols.get('status', '')
-        if declared in ("integer", "int", "smallint"):
-            # Ensure values are valid integers
-            await conn.exec_driver_sql(
-                "UPDATE vehicles SET status = 1 WHERE typeof(status) != 'integer' OR status NOT IN (1,2,3,4,6)"
-            )
-            return
-
-        # Rebuild table to enforce INTEGER status and preserve data
-        await conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
-        # Create new table with desired schema
-        await conn.exec_driver_sql(
-            """
-            CREATE TABLE IF NOT EXISTS vehicles_new (
-                id INTEGER PRIMARY KEY,
-                name VARCHAR NOT NULL UNIQUE,
-                status INTEGER NOT NULL DEFAULT 1
-            )
-            """
-        )
-        # Migrate data: any non-integer or invalid value becomes 1 (no string-specific mapping)
-        await conn.exec_driver_sql(
-            """
-            INSERT OR IGNORE INTO vehicles_new (id, name, status)
-            SELECT id,
-                   name,
-                   CASE
-                       WHEN typeof(status)='integer' AND status IN (1,2,3,4,6) THEN status
-                       ELSE 1
-                   END AS status
-            FROM vehicles
-            """
-        )
-        # Replace old table
-        await conn.exec_driver_sql("DROP TABLE vehicles")
-        await conn.exec_driver_sql("ALTER TABLE vehicles_new RENAME TO vehicles")
-        await conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+    """Create missing tables and apply pending schema migrations (see migrations.py)."""
+    await migrate(engine, Base.metadata)
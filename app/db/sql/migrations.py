@@ -0,0 +1,391 @@
+"""Versioned schema migrations for existing SQLite databases.
+
+`schema_version` holds the number of steps applied. At startup `migrate` takes the write
+lock, and only if the stored version is behind does it create missing tables and run the
+pending steps, in order, in the same transaction. An up-to-date database costs a single
+query, and concurrently starting workers apply each step exactly once.
+
+Steps upgrade databases created by older releases; each checks what is already there, as
+a fresh database gets the current schema from create_all. Any schema change, including
+a new model/table, needs a new step appended to MIGRATIONS (never edit or reorder
+released steps).
+"""
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+async def _columns(conn: AsyncConnection, table: str) -> dict:
+    """Column name -> declared type (lower case); empty if the table does not exist."""
+    result = await conn.exec_driver_sql(f"PRAGMA table_info('{table}')")
+    return {row[1]: (row[2] or "").lower() for row in result.fetchall()}
+
+
+async def _add_columns(conn: AsyncConnection, table: str, columns: List[Tuple[str, str]]) -> None:
+    existing = await _columns(conn, table)
+    for name, ddl in columns:
+        if name not in existing:
+            await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+async def incident_location_columns(conn: AsyncConnection) -> None:
+    await _add_columns(conn, "incidents", [
+        ("address", "TEXT NOT NULL DEFAULT ''"),
+        ("latitude", "REAL"),
+        ("longitude", "REAL"),
+        ("scheduled_at", "DATETIME"),
+    ])
+
+
+async def vehicle_status_integer(conn: AsyncConnection) -> None:
+    """vehicles.status becomes an INTEGER with allowed values {1,2,3,4,6}.
+    An old schema with a string enum + CHECK constraint is rebuilt and its data migrated.
+    """
+    declared = (await _columns(conn, "vehicles")).get("status", "")
+    if declared in ("integer", "int", "smallint"):
+        # Ensure values are valid integers
+        await conn.exec_driver_sql(
+            "UPDATE vehicles SET status = 1 WHERE typeof(status) != 'integer' OR status NOT IN (1,2,3,4,6)"
+        )
+        return
+
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS vehicles_new (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR NOT NULL UNIQUE,
+            status INTEGER NOT NULL DEFAULT 1
+        )
+        """
+    )
+    # Migrate data: any non-integer or invalid value becomes 1 (no string-specific mapping)
+    await conn.exec_driver_sql(
+        """
+        INSERT OR IGNORE INTO vehicles_new (id, name, status)
+        SELECT id,
+               name,
+               CASE
+                   WHEN typeof(status)='integer' AND status IN (1,2,3,4,6) THEN status
+                   ELSE 1
+               END AS status
+        FROM vehicles
+        """
+    )
+    await conn.exec_driver_sql("DROP TABLE vehicles")
+    await conn.exec_driver_sql("ALTER TABLE vehicles_new RENAME TO vehicles")
+
+
+async def options_display_columns(conn: AsyncConnection) -> None:
+    await _add_columns(conn, "options", [
+        ("speech_language", "TEXT NOT NULL DEFAULT 'de-DE'"),
+        ("weather_location", "TEXT NOT NULL DEFAULT ''"),
+    ])
+
+
+async def incident_listing_indexes(conn: AsyncConnection) -> None:
+    """Indexes for the activation scheduler and keyset pagination, plus a created_at every
+    row can be paged by.
+    """
+    await conn.exec_driver_sql("UPDATE incidents SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    # Rows written via the CURRENT_TIMESTAMP server default lack the microseconds
+    # SQLAlchemy stores; align them so text comparison orders correctly
+    await conn.exec_driver_sql(
+        "UPDATE incidents SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_status_scheduled_at ON incidents (status, scheduled_at)"
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_created_at_id ON incidents (created_at, id)"
+    )
+
+
+async def sync_revisions(conn: AsyncConnection) -> None:
+    """Revision columns for delta sync and the single sync_state row."""
+    for table in ("incidents", "vehicles"):
+        await _add_columns(conn, table, [("revision", "INTEGER NOT NULL DEFAULT 0")])
+        await conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_revision ON {table} (revision)")
+    await conn.exec_driver_sql("INSERT OR IGNORE INTO sync_state (id, revision) VALUES (1, 0)")
+
+
+async def incident_match_keys(conn: AsyncConnection) -> None:
+    """Normalized title/address keys for the upsert lookup, backfilled in Python as
+    SQLite's lower() only folds ASCII."""
+    from .models import match_key  # models imports connect, which imports this module
+    await _add_columns(conn, "incidents", [
+        ("title_key", "TEXT NOT NULL DEFAULT ''"),
+        ("address_key", "TEXT NOT NULL DEFAULT ''"),
+    ])
+    rows = (await conn.exec_driver_sql("SELECT id, title, address FROM incidents")).fetchall()
+    if rows:
+        await conn.exec_driver_sql(
+            "UPDATE incidents SET title_key = ?, address_key = ? WHERE id = ?",
+            [(match_key(title), match_key(address), id_) for id_, title, address in rows],
+        )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_title_key_scheduled_at ON incidents (title_key, scheduled_at)"
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_title_key_address_key ON incidents (title_key, address_key)"
+    )
+
+
+async def vehicle_assignment_index(conn: AsyncConnection) -> None:
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incident_vehicles_vehicle_id ON incident_vehicles (vehicle_id)"
+    )
+
+
+# incidents as of step 8; the rebuild below must not follow later model changes
+_INCIDENT_COLUMNS_V8 = (
+    "id", "title", "description", "status", "created_at", "address", "latitude", "longitude",
+    "scheduled_at", "closed_at", "revision", "title_key", "address_key",
+)
+_INCIDENT_INDEXES_V8 = (
+    ("ix_incidents_id", "id"),
+    ("ix_incidents_title", "title"),
+    ("ix_incidents_status_scheduled_at", "status, scheduled_at"),
+    ("ix_incidents_created_at_id", "created_at, id"),
+    ("ix_incidents_revision", "revision"),
+    ("ix_incidents_title_key_scheduled_at", "title_key, scheduled_at"),
+    ("ix_incidents_title_key_address_key", "title_key, address_key"),
+    ("ix_incidents_closed_at", "closed_at"),
+)
+
+
+async def incident_archive(conn: AsyncConnection) -> None:
+    """closed_at for the archiver, the archive tables, and AUTOINCREMENT ids for incidents
+    so the id of an archived incident is never handed out again.
+    """
+    await _add_columns(conn, "incidents", [("closed_at", "DATETIME")])
+    await conn.exec_driver_sql(
+        "UPDATE incidents SET closed_at = created_at WHERE status = 'closed' AND closed_at IS NULL"
+    )
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS incidents_archive (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR,
+            description VARCHAR,
+            status VARCHAR(6),
+            created_at DATETIME,
+            address VARCHAR NOT NULL,
+            latitude FLOAT,
+            longitude FLOAT,
+            scheduled_at DATETIME,
+            closed_at DATETIME,
+            revision INTEGER NOT NULL,
+            archived_at DATETIME NOT NULL
+        )
+        """
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_archive_created_at_id ON incidents_archive (created_at, id)"
+    )
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS incident_vehicles_archive (
+            incident_id INTEGER NOT NULL REFERENCES incidents_archive (id) ON DELETE CASCADE,
+            vehicle_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            status INTEGER NOT NULL,
+            PRIMARY KEY (incident_id, vehicle_id)
+        )
+        """
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_incident_vehicles_archive_vehicle_id ON incident_vehicles_archive (vehicle_id)"
+    )
+
+    ddl = (await conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'incidents'"
+    )).scalar() or ""
+    if "AUTOINCREMENT" in ddl.upper():
+        return
+    # Rebuild like vehicle_status_integer: new table, copy, drop, rename; then the indexes
+    existing = await _columns(conn, "incidents")
+    shared = ", ".join(name for name in _INCIDENT_COLUMNS_V8 if name in existing)
+    indexes = await conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'incidents' AND sql IS NOT NULL"
+    )
+    for (name,) in indexes.fetchall():
+        await conn.exec_driver_sql(f"DROP INDEX {name}")
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE incidents_new (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            title VARCHAR,
+            description VARCHAR,
+            status VARCHAR(6),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            address VARCHAR NOT NULL,
+            latitude FLOAT,
+            longitude FLOAT,
+            scheduled_at DATETIME,
+            closed_at DATETIME,
+            revision INTEGER NOT NULL,
+            title_key VARCHAR NOT NULL,
+            address_key VARCHAR NOT NULL
+        )
+        """
+    )
+    await conn.exec_driver_sql(f"INSERT INTO incidents_new ({shared}) SELECT {shared} FROM incidents")
+    await conn.exec_driver_sql("DROP TABLE incidents")
+    await conn.exec_driver_sql("ALTER TABLE incidents_new RENAME TO incidents")
+    for name, columns in _INCIDENT_INDEXES_V8:
+        await conn.exec_driver_sql(f"CREATE INDEX {name} ON incidents ({columns})")
+
+
+# Full-text index per searchable table (see incidents crud search_incidents). The tables
+# are external-content FTS5 tables kept current by triggers, so every write path (ORM,
+# bulk upserts, the archiver's INSERT ... SELECT) updates them in the same transaction.
+SEARCH_INDEXES = (("incidents_fts", "incidents"), ("incidents_archive_fts", "incidents_archive"))
+SEARCH_COLUMNS = ("title", "description", "address")
+
+
+async def incident_search_index(conn: AsyncConnection) -> None:
+    """FTS5 indexes over title/description/address of live and archived incidents, filled
+    from the existing rows. A step that rebuilds one of the content tables drops its
+    triggers and must create them again.
+    """
+    columns = ", ".join(SEARCH_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    for fts, content in SEARCH_INDEXES:
+        # remove_diacritics folds Ö/ö to o; the prefix indexes serve short prefix queries
+        await conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{content}', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new}); END"
+        )
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {content} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+        )
+        # Only text changes touch the index, not the frequent status/revision updates
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {columns} ON {content} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new}); END"
+        )
+        await conn.exec_driver_sql(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+# R*Tree over the coordinates per located table (see incidents crud get_incidents_near),
+# maintained by triggers like the FTS5 indexes. Points are stored as degenerate boxes.
+SPATIAL_INDEXES = (("incidents_rtree", "incidents"), ("incidents_archive_rtree", "incidents_archive"))
+
+
+async def incident_spatial_index(conn: AsyncConnection) -> None:
+    """R*Tree indexes over latitude/longitude of live and archived incidents, filled from the
+    existing rows. Incidents without coordinates (e.g. still geocoding) are left out until
+    they get some. A step that rebuilds one of the content tables drops its triggers and
+    must create them again.
+    """
+    point = (
+        "SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+        "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL"
+    )
+    for rtree, content in SPATIAL_INDEXES:
+        await conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+        )
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {rtree}_insert AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {rtree} {point}; END"
+        )
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {rtree}_delete AFTER DELETE ON {content} BEGIN "
+            f"DELETE FROM {rtree} WHERE id = old.id; END"
+        )
+        await conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {rtree}_update AFTER UPDATE OF latitude, longitude ON {content} BEGIN "
+            f"DELETE FROM {rtree} WHERE id = old.id; INSERT INTO {rtree} {point}; END"
+        )
+        await conn.exec_driver_sql(f"DELETE FROM {rtree}")
+        await conn.exec_driver_sql(
+            f"INSERT INTO {rtree} SELECT id, latitude, latitude, longitude, longitude FROM {content} "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+
+
+async def vehicle_position_history(conn: AsyncConnection) -> None:
+    """Downsampled vehicle GPS history."""
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS vehicle_positions (
+            id INTEGER NOT NULL PRIMARY KEY,
+            vehicle_id INTEGER NOT NULL REFERENCES vehicles (id) ON DELETE CASCADE,
+            latitude FLOAT NOT NULL,
+            longitude FLOAT NOT NULL,
+            speed FLOAT,
+            heading FLOAT,
+            recorded_at DATETIME NOT NULL
+        )
+        """
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_vehicle_positions_vehicle_id_recorded_at "
+        "ON vehicle_positions (vehicle_id, recorded_at)"
+    )
+    await conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_vehicle_positions_recorded_at ON vehicle_positions (recorded_at)"
+    )
+
+
+async def shared_rate_limits(conn: AsyncConnection) -> None:
+    """Request spacing shared by all worker processes."""
+    await conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            name VARCHAR NOT NULL PRIMARY KEY,
+            next_at FLOAT NOT NULL
+        )
+        """
+    )
+
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+
+# Step n brings the schema to version n
+MIGRATIONS: List[Migration] = [
+    incident_location_columns,
+    vehicle_status_integer,
+    options_display_columns,
+    incident_listing_indexes,
+    sync_revisions,
+    incident_match_keys,
+    vehicle_assignment_index,
+    incident_archive,
+    incident_search_index,
+    incident_spatial_index,
+    vehicle_position_history,
+    shared_rate_limits,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+async def migrate(engine: AsyncEngine, metadata) -> int:
+    """Bring the database to SCHEMA_VERSION. Returns the number of steps applied."""
+    async with engine.connect() as conn:
+        # Hold the write lock from the version check to the commit, so a concurrently
+        # starting worker waits and then finds the database up to date
+        await conn.exec_driver_sql("BEGIN IMMEDIATE")
+        await conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        current = (await conn.exec_driver_sql("SELECT max(version) FROM schema_version")).scalar() or 0
+        if current >= SCHEMA_VERSION:
+            await conn.rollback()
+            return 0
+        await conn.run_sync(metadata.create_all)
+        for version, step in enumerate(MIGRATIONS, start=1):
+            if version > current:
+                print(f"Applying migration {version}: {step.__name__}")
+                await step(conn)
+        await conn.exec_driver_sql("DELETE FROM schema_version")
+        await conn.exec_driver_sql(f"INSERT INTO schema_version (version) VALUES ({SCHEMA_VERSION})")
+        await conn.commit()
+    return SCHEMA_VERSION - current
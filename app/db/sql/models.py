@@ -1,9 +1,18 @@
 import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, Table, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, Table, ForeignKey, Boolean, Index, inspect
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from ..sql.connect import Base
 import enum
+import re
+
+_WS_RE = re.compile(r"\s+")
+
+def match_key(value) -> str:
+    """Normalized form incidents are matched on when upserting: casefolded, whitespace
+    collapsed, spaces around commas removed."""
+    key = _WS_RE.sub(" ", (value or "").casefold()).strip()
+    return key.replace(" ,", ",").replace(", ", ",")
 
 class IncidentStatus(str, enum.Enum):
     new = "new"
@@ -21,31 +30,75 @@ class Incident(Base):
     title = Column(String, index=True)
     description = Column(String)
     status = Column(Enum(IncidentStatus), default=IncidentStatus.new)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set in Python so every row is stored in SQLAlchemy's datetime format (with microseconds),
+    # which keeps (created_at, id) keyset comparisons consistent
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
+        server_default=func.now(),
+    )
     # Location and scheduling
     address = Column(String, nullable=False, default="")
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     scheduled_at = Column(DateTime(timezone=True), nullable=True)
-    # relationships
+    # When the incident was closed (maintained by the status validator); drives archiving
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    # Global sync revision of the last change (see api/routes/sync)
+    revision = Column(Integer, nullable=False, default=0, index=True)
+    # match_key() of title/address, kept in sync by the validators below; used for upserts
+    title_key = Column(String, nullable=False, default="")
+    address_key = Column(String, nullable=False, default="")
+    # relationships; never loaded implicitly, queries pick a strategy (e.g. selectinload)
     vehicles = relationship(
         "Vehicle",
         secondary="incident_vehicles",
         back_populates="incidents",
-        lazy="selectin",
+        lazy="raise",
     )
 
+    __table_args__ = (
+        # Serves the activation scheduler's startup query (status='new' AND scheduled_at IS NOT NULL)
+        Index("ix_incidents_status_scheduled_at", "status", "scheduled_at"),
+        # Keyset pagination of the incident list
+        Index("ix_incidents_created_at_id", "created_at", "id"),
+        # Upsert matching: title + scheduled_at, then title + address
+        Index("ix_incidents_title_key_scheduled_at", "title_key", "scheduled_at"),
+        Index("ix_incidents_title_key_address_key", "title_key", "address_key"),
+        # Archiver: closed incidents by closing time
+        Index("ix_incidents_closed_at", "closed_at"),
+        # Ids are never reused, so an archived incident keeps a unique id
+        {"sqlite_autoincrement": True},
+    )
+
+    @validates("title", "address")
+    def _update_match_keys(self, field, value):
+        setattr(self, f"{field}_key", match_key(value))
+        return value
+
+    @validates("status")
+    def _track_closed_at(self, field, value):
+        if value != IncidentStatus.closed:
+            self.closed_at = None
+        elif inspect(self).dict.get("closed_at") is None:
+            self.closed_at = datetime.datetime.now(datetime.timezone.utc)
+        return value
+
 class Vehicle(Base):
     __tablename__ = "vehicles"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     status = Column(Integer, nullable=False, default=1)
+    revision = Column(Integer, nullable=False, default=0, index=True)
+    # Every incident the vehicle was ever assigned to, which grows without bound; query
+    # what is needed instead (see vehicles crud get_current_assignments)
     incidents = relationship(
         "Incident",
         secondary="incident_vehicles",
         back_populates="vehicles",
-        lazy="selectin",
+        lazy="raise",
+        passive_deletes=True,
     )
 
 # Association table for many-to-many Incident<->Vehicle
@@ -54,8 +107,110 @@ incident_vehicles = Table(
     Base.metadata,
     Column("incident_id", Integer, ForeignKey("incidents.id", ondelete="CASCADE"), primary_key=True),
     Column("vehicle_id", Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True),
+    # Assignments of a vehicle (the primary key only serves lookups by incident)
+    Index("ix_incident_vehicles_vehicle_id", "vehicle_id"),
 )
 
+class IncidentArchive(Base):
+    """Closed incidents moved out of the live tables by the archiver (see core/archive.py).
+    Rows keep the id they had in `incidents`.
+    """
+    __tablename__ = "incidents_archive"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    description = Column(String)
+    status = Column(Enum(IncidentStatus), default=IncidentStatus.closed)
+    created_at = Column(DateTime(timezone=True))
+    address = Column(String, nullable=False, default="")
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    scheduled_at = Column(DateTime(timezone=True), nullable=True)
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    revision = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+    vehicles = relationship(
+        "IncidentVehicleArchive",
+        order_by="IncidentVehicleArchive.id",
+        lazy="raise",
+    )
+
+    __table_args__ = (
+        Index("ix_incidents_archive_created_at_id", "created_at", "id"),
+    )
+
+class IncidentVehicleArchive(Base):
+    """Vehicle assignment of an archived incident, with the vehicle's name and status when it
+    was archived (the vehicle itself may be renamed or deleted later)."""
+    __tablename__ = "incident_vehicles_archive"
+
+    incident_id = Column(Integer, ForeignKey("incidents_archive.id", ondelete="CASCADE"), primary_key=True)
+    # Mapped as `id` so it serializes like a live VehicleRef
+    id = Column("vehicle_id", Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    status = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_incident_vehicles_archive_vehicle_id", "vehicle_id"),
+    )
+
+class VehiclePosition(Base):
+    """Downsampled GPS history of a vehicle (see core/positions.py); the latest position of
+    each vehicle lives in memory."""
+    __tablename__ = "vehicle_positions"
+
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    speed = Column(Float, nullable=True)  # m/s
+    heading = Column(Float, nullable=True)  # degrees from north
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Track of one vehicle, and its latest stored position at startup
+        Index("ix_vehicle_positions_vehicle_id_recorded_at", "vehicle_id", "recorded_at"),
+        # Retention
+        Index("ix_vehicle_positions_recorded_at", "recorded_at"),
+    )
+
+class SyncState(Base):
+    """Single row holding the global, monotonically increasing sync revision."""
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+
+class Tombstone(Base):
+    """Records deletions so delta-sync clients can drop removed entities."""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "incident" | "vehicle"
+    entity_id = Column(Integer, nullable=False)
+    revision = Column(Integer, nullable=False, index=True)
+
+class Lease(Base):
+    """Named lease for leader election between worker processes (see core.leader).
+    `token` is a fencing token, incremented every time a different holder takes the lease.
+    """
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)
+    token = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+
+class RateLimit(Base):
+    """Shared request spacing for an external service, so every worker process together
+    stays within its usage policy (see core.geocoding). `next_at` is the unix time from
+    which the next request may be sent. Login throttling keeps its limits here as well
+    ("login-" names, see core.security.LoginThrottle)."""
+    __tablename__ = "rate_limits"
+
+    name = Column(String, primary_key=True)
+    next_at = Column(Float, nullable=False, default=0.0)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -74,3 +229,35 @@ class Options(Base):
     speech_language = Column(String, default="de-DE", nullable=False)
     # Weather settings (dashboard)
     weather_location = Column(String, default="", nullable=False)
+
+class GeocodeCacheEntry(Base):
+    __tablename__ = "geocode_cache"
+
+    # Normalized address (see core.geocoding.normalize_address)
+    key = Column(String, primary_key=True)
+    address = Column(String, nullable=False)
+    # Both None for a cached miss/failure
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+class AddressPoint(Base):
+    """Imported gazetteer entry for the local geocoder (see core.gazetteer)."""
+    __tablename__ = "address_points"
+
+    id = Column(Integer, primary_key=True)
+    street = Column(String, nullable=False)
+    street_norm = Column(String, nullable=False)
+    housenumber = Column(String, nullable=False, default="")
+    housenumber_norm = Column(String, nullable=False, default="")
+    postcode = Column(String, nullable=False, default="")
+    town = Column(String, nullable=False, default="")
+    town_norm = Column(String, nullable=False, default="")
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Exact and prefix lookups on street (+ number, + town)
+        Index("ix_address_points_street_number_town", "street_norm", "housenumber_norm", "town_norm"),
+    )
@@ -52,6 +52,8 @@ document.addEventListener('DOMContentLoaded', () => {
         },
         // Track WebSocket connectivity for diagnostics/fallbacks
         wsConnected: false,
+        // Latest GPS position per vehicle id (from vehicle_positions events)
+        vehiclePositions: {},
     };
 
     // --- Navigation & UI ---
@@ -548,7 +550,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    // --- Vehicles polling fallback (in case WS message is missed) ---
+    // --- Keep vehicles embedded in incidents in line with the vehicle list ---
     function syncIncidentVehicleStatuses() {
         if (!Array.isArray(state.incidents) || !Array.isArray(state.vehicles)) return;
         const byId = new Map(state.vehicles.map(v => [v.id, v]));
@@ -561,41 +563,6 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         });
     }
-    function vehiclesChanged(a, b) {
-        if (!Array.isArray(a) || !Array.isArray(b)) return true;
-        if (a.length !== b.length) return true;
-        const byId = (arr) => arr.slice().sort((x, y) => x.id - y.id);
-        const ax = byId(a), bx = byId(b);
-        for (let i = 0; i < ax.length; i++) {
-            const va = ax[i], vb = bx[i];
-            if (va.id !== vb.id) return true;
-            if ((va.name || '') !== (vb.name || '')) return true;
-            if ((va.status || '') !== (vb.status || '')) return true;
-        }
-        return false;
-    }
-
-    let vehiclesPollTimer = null;
-    function startVehiclesPolling() {
-        if (vehiclesPollTimer) return;
-        vehiclesPollTimer = setInterval(async () => {
-            try {
-                const latest = await apiCall('/api/vehicles/');
-                if (Array.isArray(latest) && vehiclesChanged(state.vehicles, latest)) {
-                    state.vehicles = latest;
-                    syncIncidentVehicleStatuses();
-                    renderAll();
-        // Reflect weather location into options input
-        if (options.weatherLocationInput) options.weatherLocationInput.value = state.settings.weather_location || '';
-        // Start weather refresh loop
-        startWeatherLoop();
-                }
-            } catch (e) {
-                // ignore transient errors
-            }
-        }, 5000);
-    }
-
     // --- Date/Time Helpers ---
     function toLocalISOString(date) {
         const pad = (num) => num.toString().padStart(2, '0');
@@ -720,6 +687,14 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    function applySettings(opts) {
+        state.settings.audioEnabled = !!opts.audio_enabled;
+        state.settings.speechEnabled = !!opts.speech_enabled;
+        state.settings.alarmSound = opts.alarm_sound || 'gong1.mp3';
+        state.settings.speechLanguage = opts.speech_language || 'de-DE';
+        state.settings.weather_location = opts.weather_location || '';
+    }
+
     async function saveOptions(partial) {
         try {
             const payload = {};
@@ -730,11 +705,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (partial.hasOwnProperty('weatherLocation')) payload.weather_location = partial.weatherLocation;
             const updated = await apiCall('/api/options/', 'PUT', payload);
             if (updated) {
-                state.settings.audioEnabled = !!updated.audio_enabled;
-                state.settings.speechEnabled = !!updated.speech_enabled;
-                state.settings.alarmSound = updated.alarm_sound || 'gong1.mp3';
-                state.settings.speechLanguage = updated.speech_language || 'de-DE';
-                state.settings.weather_location = updated.weather_location || '';
+                applySettings(updated);
                 renderAll();
                 // Update weather immediately when changed
                 fetchWeatherFor(state.settings.weather_location || 'Frankfurt am Main');
@@ -876,78 +847,117 @@ document.addEventListener('DOMContentLoaded', () => {
     setupListEventListeners(incidentsList, 'incidents');
     setupListEventListeners(vehiclesList, 'vehicles');
 
+    // Apply one broadcast event to the local state; returns whether the view needs a re-render
+    function applyEvent(data) {
+        if (data.type === 'options_updated') {
+            // Settings changed (here or on another device)
+            const prevLocation = state.settings.weather_location;
+            applySettings(data.options);
+            if (prevLocation !== state.settings.weather_location) {
+                fetchWeatherFor(state.settings.weather_location || 'Frankfurt am Main');
+            }
+            return true;
+        }
+
+        if (data.type === 'incidents_bulk' || data.type === 'incidents_archived') {
+            // Bulk import / archiving: one summary event instead of one per row; the delta sync
+            // fetches the rows (archived incidents arrive as deletions)
+            return true;
+        }
+
+        if (data.type === 'vehicles_updated') {
+            // Status wave: merge all changed vehicles and render once
+            state.vehicles = mergeById(state.vehicles, data.vehicles);
+            syncIncidentVehicleStatuses();
+            return true;
+        }
+
+        if (data.type === 'vehicle_positions') {
+            // Arrives every few seconds while vehicles report; nothing rendered depends on it yet
+            data.positions.forEach(p => { state.vehiclePositions[p.vehicle_id] = p; });
+            return false;
+        }
+
+        if (data.type === 'alarm') {
+            triggerAlarm(data.message || 'Alarm!');
+            return false;
+        }
+
+        const itemType = data.type.split('_')[0] + 's';
+        const action = data.type.split('_')[1];
+        const itemData = data[itemType.slice(0, -1)];
+
+        if (action === 'created' || action === 'updated') {
+            // A delta sync or a replayed frame may already have brought this item: replace by id
+            const prev = state[itemType].find(i => i.id === itemData.id);
+            if (itemType === 'incidents') {
+                // Alarm when the incident becomes active (or arrives active and was not known yet)
+                const wasActive = prev && prev.status === 'active';
+                if (!wasActive && itemData.status === 'active') {
+                    triggerAlarm(`Neuer Einsatz! ${itemData.title}: ${itemData.description || ''}. Fahrzeuge ${itemData.vehicles.map(v => v.name).join(', ')} ausrücken zu ${itemData.address}`);
+                }
+            }
+            state[itemType] = mergeById(state[itemType], [itemData]);
+        } else if (action === 'deleted') {
+            state[itemType] = state[itemType].filter(i => i.id !== data.incident_id && i.id !== data.vehicle_id);
+        }
+        if (itemType === 'vehicles') {
+            // Ensure embedded incident->vehicles reflect latest statuses/names
+            syncIncidentVehicleStatuses();
+        }
+        return true;
+    }
+
     // --- WebSocket ---
+    // Last seen broadcast sequence; lets a reconnect replay missed events instead of refetching
+    let wsEpoch = null;
+    let wsSeq = null;
     function connectWebSocket() {
-        const ws = new WebSocket(`${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws`);
+        const resume = wsEpoch !== null && wsSeq !== null ? `?resume=${wsSeq}&epoch=${encodeURIComponent(wsEpoch)}` : '';
+        const ws = new WebSocket(`${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws${resume}`);
         ws.onopen = () => {
             state.wsConnected = true;
             console.log('WebSocket connected');
         };
+        // Frames are UTF-8 JSON sent as binary messages (encoded once on the server for all clients)
+        ws.binaryType = 'arraybuffer';
+        const decoder = new TextDecoder();
         ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
+            const data = JSON.parse(typeof event.data === 'string' ? event.data : decoder.decode(event.data));
             console.log('WS message received:', data);
 
-            if (data.type === 'alarm') {
-                triggerAlarm(`Neuer Einsatz! ${itemData.title}: ${itemData.description || ''}. Fahrzeuge ${itemData.vehicles.map(v => v.name).join(', ')} ausrücken zu ${itemData.address}`);
+            if (data.type === 'hello') {
+                // Different epoch: the server restarted and cannot replay, so catch up via sync
+                const restarted = wsEpoch !== null && data.epoch !== wsEpoch;
+                if (wsEpoch === null || restarted) wsSeq = data.seq;
+                wsEpoch = data.epoch;
+                if (restarted) syncDelta();
                 return;
             }
-
-            const itemType = data.type.split('_')[0] + 's';
-            const action = data.type.split('_')[1];
-            const itemData = data[itemType.slice(0, -1)];
-
-            if (action === 'created') {
-                state[itemType].push(itemData);
-                if (itemType === 'incidents') {
-                    // Play alarm if the created incident is already active
-                    if (itemData.status === 'active') {
-                        triggerAlarm(`Neuer Einsatz! ${itemData.title}: ${itemData.description || ''}. Fahrzeuge ${itemData.vehicles.map(v => v.name).join(', ')} ausrücken zu ${itemData.address}`);
-                    }
-                }
-            } else if (action === 'updated') {
-                const index = state[itemType].findIndex(i => i.id === itemData.id);
-                if (index > -1) {
-                    if (itemType === 'incidents') {
-                        const prev = state[itemType][index];
-                        const wasActive = prev && prev.status === 'active';
-                        const nowActive = itemData.status === 'active';
-                        if (!wasActive && nowActive) {
-                            triggerAlarm(`Neuer Einsatz! ${itemData.title}: ${itemData.description || ''}. Fahrzeuge ${itemData.vehicles.map(v => v.name).join(', ')} ausrücken zu ${itemData.address}`);
-                        }
-                    }
-                    state[itemType][index] = itemData;
-                } else {
-                    // Item not known yet: add it and trigger alarm if active
-                    state[itemType].push(itemData);
-                    if (itemType === 'incidents' && itemData.status === 'active') {
-                        triggerAlarm(`Neuer Einsatz! ${itemData.title}: ${itemData.description || ''}. Fahrzeuge ${itemData.vehicles.map(v => v.name).join(', ')} ausrücken zu ${itemData.address}`);
-                    }
-                }
-            } else if (action === 'deleted') {
-                state[itemType] = state[itemType].filter(i => i.id !== data.incident_id && i.id !== data.vehicle_id);
+            if (typeof data.seq === 'number') wsSeq = data.seq;
+            if (data.type === 'resync_required') {
+                wsEpoch = data.epoch;
+                syncDelta();
+                return;
             }
-            if (itemType === 'vehicles') {
-                // Ensure embedded incident->vehicles reflect latest statuses/names
-                syncIncidentVehicleStatuses();
+
+            if (data.type === 'batch') {
+                // Events collected by the server over a short window: apply all, render once
+                let changed = false;
+                data.events.forEach(e => { changed = applyEvent(e) || changed; });
+                if (!changed) return;
+            } else if (!applyEvent(data)) {
+                return;
             }
             renderAll();
-            // Light consistency refresh for incidents to ensure latest server state
-            if (itemType === 'incidents') {
-                apiCall('/api/incidents/')
-                    .then((incidents) => {
-                        if (Array.isArray(incidents)) {
-                            state.incidents = incidents;
-                            renderAll();
-                        }
-                    })
-                    .catch((e) => console.warn('Incidents refresh after WS failed:', e));
-            }
+            // Light consistency refresh: fetch only what changed on the server
+            syncDelta();
         };
 
         ws.onclose = () => {
             state.wsConnected = false;
             console.log('WebSocket disconnected. Reconnecting...');
-            setTimeout(connectWebSocket, 3000);
+            setTimeout(connectWebSocket, 3000 + Math.random() * 2000);
         };
         ws.onerror = (error) => {
             console.error('WebSocket error:', error);
@@ -955,47 +965,68 @@ document.addEventListener('DOMContentLoaded', () => {
         };
     }
 
-    // --- Fallback polling for incidents (in case WS messages are missed) ---
-    function incidentsChanged(a, b) {
-        if (!Array.isArray(a) || !Array.isArray(b)) return true;
-        if (a.length !== b.length) return true;
-        // Compare by id + status + updated fields we care about
-        const byId = (arr) => arr.slice().sort((x, y) => x.id - y.id);
-        const ax = byId(a), bx = byId(b);
-        for (let i = 0; i < ax.length; i++) {
-            const ia = ax[i], ib = bx[i];
-            if (ia.id !== ib.id) return true;
-            if (ia.status !== ib.status) return true;
-            if ((ia.title || '') !== (ib.title || '')) return true;
-            if ((ia.address || '') !== (ib.address || '')) return true;
-            if ((ia.scheduled_at || '') !== (ib.scheduled_at || '')) return true;
+    // --- Delta sync (replaces full-list polling; also used after WS messages) ---
+    let syncRevision = 0;
+    let syncing = null;
+    let syncAgain = false;
+    function mergeById(list, changed, deletedIds) {
+        const deleted = new Set(deletedIds || []);
+        const byId = new Map((list || []).filter(x => !deleted.has(x.id)).map(x => [x.id, x]));
+        (changed || []).forEach(x => byId.set(x.id, x));
+        return Array.from(byId.values()).sort((a, b) => a.id - b.id);
+    }
+    async function syncOnce() {
+        try {
+            let changes = await apiCall(`/api/sync/?since=${syncRevision}`);
+            if (changes.revision < syncRevision) {
+                // Server revision went backwards (database reset): start over
+                syncRevision = 0;
+                changes = await apiCall('/api/sync/?since=0');
+            }
+            if (changes.revision === syncRevision) return;
+            const full = syncRevision === 0;
+            const latest = full ? changes.incidents : mergeById(state.incidents, changes.incidents, changes.deleted_incidents);
+            if (!full) {
+                // Detect newly active incidents compared to previous state
+                const prevActiveIds = new Set((state.incidents || []).filter(i => i.status === 'active').map(i => i.id));
+                const newActive = latest.filter(i => i.status === 'active' && !prevActiveIds.has(i.id));
+                newActive.forEach(i => triggerAlarm(`Neuer Einsatz: ${i.title}: ${i.description || ''}. Fahrzeuge: ${i.vehicles?.map(v => v.name).join(', ') || ''} ausrücken zu ${i.address}`));
+            }
+            state.incidents = latest;
+            state.vehicles = full ? changes.vehicles : mergeById(state.vehicles, changes.vehicles, changes.deleted_vehicles);
+            syncIncidentVehicleStatuses();
+            syncRevision = changes.revision;
+            renderAll();
+        } catch (e) {
+            // Network issues: ignore, the next tick retries
         }
-        return false;
     }
 
-    let incidentsPollTimer = null;
-    function startIncidentsPolling() {
-        if (incidentsPollTimer) return; // already started
-        incidentsPollTimer = setInterval(async () => {
+    async function syncDelta() {
+        // Coalesce overlapping calls (WS message + poll tick). A call arriving during a sync may
+        // announce a change committed after that sync read, so it makes the sync run once more.
+        if (syncing) {
+            syncAgain = true;
+            return syncing;
+        }
+        syncing = (async () => {
             try {
-                const latest = await apiCall('/api/incidents/');
-                if (Array.isArray(latest)) {
-                    // Detect newly active incidents compared to previous state
-                    const prevActiveIds = new Set((state.incidents || []).filter(i => i.status === 'active').map(i => i.id));
-                    const newActive = latest.filter(i => i.status === 'active' && !prevActiveIds.has(i.id));
-                    if (newActive.length > 0) {
-                        newActive.forEach(i => triggerAlarm(`Neuer Einsatz: ${i.title}: ${i.description || ''}. Fahrzeuge: ${i.vehicles?.map(v => v.name).join(', ') || ''} ausrücken zu ${i.address}`));
-                    }
-                    if (incidentsChanged(state.incidents, latest)) {
-                        state.incidents = latest;
-                        renderAll();
-                    }
-                }
-            } catch (e) {
-                // Network issues: ignore for now
-                // console.warn('Incidents polling failed:', e);
+                do {
+                    syncAgain = false;
+                    await syncOnce();
+                } while (syncAgain);
+            } finally {
+                syncing = null;
             }
-        }, 3000);
+        })();
+        return syncing;
+    }
+
+    let syncPollTimer = null;
+    function startSyncPolling() {
+        if (syncPollTimer) return; // already started
+        // Light fallback in case WS messages are missed; costs one tiny request when nothing changed
+        syncPollTimer = setInterval(syncDelta, 3000);
     }
 
     // --- Initialization ---
@@ -1018,23 +1049,12 @@ document.addEventListener('DOMContentLoaded', () => {
         // Load options from backend
         try {
             const opts = await apiCall('/api/options/');
-            if (opts) {
-                state.settings.audioEnabled = !!opts.audio_enabled;
-                state.settings.speechEnabled = !!opts.speech_enabled;
-                state.settings.alarmSound = opts.alarm_sound || 'gong1.mp3';
-                state.settings.speechLanguage = opts.speech_language || 'de-DE';
-                state.settings.weather_location = opts.weather_location || '';
-            }
+            if (opts) applySettings(opts);
         } catch (e) {
             console.warn('Loading options failed, using defaults:', e);
         }
 
-        const [incidents, vehicles] = await Promise.all([
-            apiCall('/api/incidents/'),
-            apiCall('/api/vehicles/')
-        ]);
-        state.incidents = incidents || [];
-        state.vehicles = vehicles || [];
+        await syncDelta();
         // Populate vehicle checkboxes in incident modal
         incidentVehiclesBox.innerHTML = state.vehicles.map(v => `
             <label style="display:inline-flex; align-items:center; gap:6px; margin-right:12px; margin-top:6px;">
@@ -1048,8 +1068,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // setInterval(checkTriggeredIncidents, 1000);
         connectWebSocket();
         // Always enable a light polling fallback to keep dashboard fresh if WS misses updates
-        startIncidentsPolling();
-        startVehiclesPolling();
+        startSyncPolling();
     }
 
     init();
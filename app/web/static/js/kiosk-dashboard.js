@@ -340,64 +340,157 @@
     return resp.json();
   }
 
-  async function refreshAll() {
+  function applyOptions(opts) {
+    if (!opts) return;
+    const prevLocation = state.settings.weather_location;
+    state.settings.audioEnabled = !!opts.audio_enabled;
+    state.settings.speechEnabled = !!opts.speech_enabled;
+    state.settings.alarmSound = opts.alarm_sound || 'gong1.mp3';
+    state.settings.speechLanguage = opts.speech_language || 'de-DE';
+    state.settings.weather_location = opts.weather_location || '';
+    // Refresh weather when the location changes (the weather loop handles periodic updates)
+    if (prevLocation !== state.settings.weather_location || !state.weather) {
+      fetchWeatherFor(state.settings.weather_location || 'Frankfurt am Main');
+    }
+  }
+
+  function applyIncidents(incidents) {
+    const prevActive = new Set(Array.from(lastActiveIncidentIds));
+    state.incidents = Array.isArray(incidents) ? incidents : [];
+    const nowActive = new Set((state.incidents || []).filter(i => i.status === 'active').map(i => i.id));
+    // Detect newly active incidents and trigger alarm
+    const newlyActive = [];
+    nowActive.forEach(id => { if (!prevActive.has(id)) newlyActive.push(id); });
+    if (newlyActive.length > 0) {
+      (state.incidents || []).filter(i => newlyActive.includes(i.id)).forEach(i => {
+        triggerAlarm(`Neuer Einsatz: ${i.title}: ${i.description || ''}. Fahrzeuge ${i.vehicles.map(v => v.name).join(', ')} ausrücken zu ${i.address}`);
+      });
+    }
+    lastActiveIncidentIds = nowActive;
+  }
+
+  // --- Delta sync: only entities changed since the last seen revision are transferred ---
+  let syncRevision = 0;
+  let syncing = null;
+  let syncAgain = false;
+
+  function mergeById(list, changed, deletedIds) {
+    const deleted = new Set(deletedIds || []);
+    const byId = new Map((list || []).filter(x => !deleted.has(x.id)).map(x => [x.id, x]));
+    (changed || []).forEach(x => byId.set(x.id, x));
+    return Array.from(byId.values()).sort((a, b) => a.id - b.id);
+  }
+
+  async function syncOnce() {
     try {
-      const [opts, incidents, vehicles] = await Promise.all([
-        apiCall('/api/options/'),
-        apiCall('/api/incidents/'),
-        apiCall('/api/vehicles/')
-      ]);
-      if (opts) {
-        state.settings.audioEnabled = !!opts.audio_enabled;
-        state.settings.speechEnabled = !!opts.speech_enabled;
-        state.settings.alarmSound = opts.alarm_sound || 'gong1.mp3';
-        state.settings.speechLanguage = opts.speech_language || 'de-DE';
-        state.settings.weather_location = opts.weather_location || '';
+      let changes = await apiCall(`/api/sync/?since=${syncRevision}`);
+      if (changes.revision < syncRevision) {
+        // Server revision went backwards (database reset): start over
+        syncRevision = 0;
+        changes = await apiCall('/api/sync/?since=0');
       }
-      const prevActive = new Set(Array.from(lastActiveIncidentIds));
-      state.incidents = Array.isArray(incidents) ? incidents : [];
-      const nowActive = new Set((state.incidents || []).filter(i => i.status === 'active').map(i => i.id));
-      // Detect newly active incidents and trigger alarm
-      const newlyActive = [];
-      nowActive.forEach(id => { if (!prevActive.has(id)) newlyActive.push(id); });
-      if (newlyActive.length > 0) {
-        (state.incidents || []).filter(i => newlyActive.includes(i.id)).forEach(i => {
-          triggerAlarm(`Neuer Einsatz: ${i.title}: ${i.description || ''}. Fahrzeuge ${i.vehicles.map(v => v.name).join(', ')} ausrücken zu ${i.address}`);
-        });
-      }
-      lastActiveIncidentIds = nowActive;
-      state.vehicles = Array.isArray(vehicles) ? vehicles : [];
+      if (changes.revision === syncRevision) return;
+      const full = syncRevision === 0;
+      const incidents = full ? changes.incidents : mergeById(state.incidents, changes.incidents, changes.deleted_incidents);
+      state.vehicles = full ? changes.vehicles : mergeById(state.vehicles, changes.vehicles, changes.deleted_vehicles);
+      applyIncidents(incidents);
+      syncRevision = changes.revision;
       renderDashboardIncidents();
       renderDashboardVehicles();
-      // Refresh weather when options change
-      fetchWeatherFor(state.settings.weather_location || 'Frankfurt am Main');
     } catch (e) {
-      console.error('[kiosk] refreshAll failed', e);
+      console.error('[kiosk] sync failed', e);
     }
   }
 
+  async function syncDelta() {
+    // Coalesce overlapping calls (WS message + poll tick). A call arriving during a sync may
+    // announce a change committed after that sync read, so it makes the sync run once more.
+    if (syncing) {
+      syncAgain = true;
+      return syncing;
+    }
+    syncing = (async () => {
+      try {
+        do {
+          syncAgain = false;
+          await syncOnce();
+        } while (syncAgain);
+      } finally {
+        syncing = null;
+      }
+    })();
+    return syncing;
+  }
+
+  async function refreshOptions() {
+    try {
+      applyOptions(await apiCall('/api/options/'));
+    } catch (e) {
+      console.error('[kiosk] options refresh failed', e);
+    }
+  }
+
+  async function refreshAll() {
+    await Promise.all([refreshOptions(), syncDelta()]);
+  }
+
+  // Last seen broadcast sequence; lets a reconnect replay missed events instead of refetching
+  let wsEpoch = null;
+  let wsSeq = null;
+
   function connectWebSocket() {
     try {
       const proto = location.protocol === 'https:' ? 'wss' : 'ws';
-      const ws = new WebSocket(`${proto}://${location.host}/ws`);
+      const resume = wsEpoch !== null && wsSeq !== null ? `?resume=${wsSeq}&epoch=${encodeURIComponent(wsEpoch)}` : '';
+      const ws = new WebSocket(`${proto}://${location.host}/ws${resume}`);
+      // Frames are UTF-8 JSON sent as binary messages
+      ws.binaryType = 'arraybuffer';
+      const decoder = new TextDecoder();
       ws.addEventListener('open', () => { state.wsConnected = true; });
-      ws.addEventListener('close', () => { state.wsConnected = false; });
+      ws.addEventListener('close', () => {
+        state.wsConnected = false;
+        setTimeout(connectWebSocket, 3000 + Math.random() * 2000);
+      });
       ws.addEventListener('message', (ev) => {
         try {
-          const msg = JSON.parse(ev.data);
-          if (msg && (msg.type === 'incident_updated' || msg.type === 'incident_deleted' || msg.type === 'vehicle_updated')) {
-            // refresh data on updates
+          const msg = JSON.parse(typeof ev.data === 'string' ? ev.data : decoder.decode(ev.data));
+          if (!msg) return;
+          if (msg.type === 'hello') {
+            // Different epoch: the server restarted and cannot replay, so catch up via sync
+            const restarted = wsEpoch !== null && msg.epoch !== wsEpoch;
+            if (wsEpoch === null || restarted) wsSeq = msg.seq;
+            wsEpoch = msg.epoch;
+            if (restarted) refreshAll();
+            return;
+          }
+          if (typeof msg.seq === 'number') wsSeq = msg.seq;
+          if (msg.type === 'resync_required') {
+            wsEpoch = msg.epoch;
             refreshAll();
+            return;
           }
+          // Several events collected by the server over a short window arrive as one batch
+          const events = msg.type === 'batch' ? (msg.events || []) : [msg];
+          let changed = false;
+          events.forEach((e) => {
+            if (e.type === 'options_updated') applyOptions(e.options);
+            // Position updates change nothing the dashboard shows
+            else if (e.type === 'vehicle_positions') return;
+            else if (/^(incidents?|vehicles?)_/.test(e.type || '')) changed = true;
+          });
+          // fetch only what changed
+          if (changed) syncDelta();
         } catch (_) {}
       });
     } catch (e) {
       console.warn('[kiosk] WS failed', e);
+      setTimeout(connectWebSocket, 3000 + Math.random() * 2000);
     }
   }
 
   function startPolling() {
-    setInterval(() => refreshAll(), 3000);
+    // Settings arrive as options_updated events; only incidents/vehicles are polled as a fallback
+    setInterval(() => syncDelta(), 3000);
   }
 
   function init() {
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,11 +8,21 @@ from app.core.websockets import manager
 from app.api.routes.user.crud import create_user, get_user_by_username
 from app.api.routes.user.schemas import UserCreate
 from app.api.routes.options import crud as options_crud
-from app.db.sql import models
-from sqlalchemy import select
+from app.api.routes.incidents import crud as incident_crud
+from app.api.routes.vehicles import crud as vehicle_crud
+from app.api.routes.vehicles.schemas import PositionFix
+from app.core.scheduler import scheduler
+from app.core.geocoding import close_http_client, geocoding_queue
+from app.core.leader import leader
+from app.core.archive import archiver
+from app.core.positions import POSITION_MAX_AGE, Fix, position_tracker
+from app.core.security import get_current_active_admin, get_current_user
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 import asyncio
 import datetime
-from app.api.routes.incidents import schemas as incident_schemas
+import json
+from typing import Optional
 
 app = FastAPI(
     title="Feuerwehr Melder",
@@ -39,27 +49,88 @@ async def on_startup():
             # Use a compliant default password (min_length=6 per UserCreate schema)
             # Consider overriding via environment variable in production.
             default_admin = UserCreate(username="admin", password="admin123", role="admin")
-            await create_user(db, default_admin)
-            print("Default admin created with username 'admin' and password 'admin123'")
+            try:
+                await create_user(db, default_admin)
+                print("Default admin created with username 'admin' and password 'admin123'")
+            except IntegrityError:
+                # Another worker process created it at the same time
+                await db.rollback()
         # Ensure a default options row exists
         await options_crud.ensure_default_options(db)
-    # Start background activation task
-    asyncio.create_task(activation_worker())
+        # Vehicle roster and last stored positions for nearest-vehicle queries
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=POSITION_MAX_AGE)
+        position_tracker.load(
+            await vehicle_crud.get_vehicle_roster(db),
+            [
+                (p.vehicle_id, Fix(p.latitude, p.longitude, p.recorded_at.replace(tzinfo=datetime.timezone.utc).timestamp(), p.speed, p.heading))
+                for p in await vehicle_crud.get_latest_positions(db, since)
+            ],
+        )
+    # Cross-process event delivery (EVENT_BUS=inprocess|unix|redis)
+    await manager.start_bus()
+    # Keep the activation queue current with incidents written by any worker process
+    manager.add_listener(scheduler.apply_event)
+    # Keep the cached options current when another worker process changes them
+    manager.add_listener(options_crud.apply_options_event)
+    # Keep the vehicle roster and the positions received by other worker processes current
+    manager.add_listener(position_tracker.apply_event)
+    # Every process geocodes the incidents it saved itself
+    asyncio.create_task(geocoding_worker())
+    # Every process broadcasts and stores the positions it received itself
+    asyncio.create_task(position_worker())
+    # Activation, recovery and retention jobs run only in the elected leader process
+    leader.start([activation_worker, geocoding_recovery, archive_worker, position_retention])
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await leader.stop()
+    await manager.stop_bus()
+    await close_http_client()
 
 app.mount("/static", StaticFiles(directory="app/web/static"), name="static")
 
 app.include_router(api_router, prefix="/api")
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, resume: Optional[int] = None, epoch: Optional[str] = None):
+    # Reconnecting clients pass ?resume=<last seq>&epoch=<epoch> to receive missed events
+    await manager.connect(websocket, resume_from=resume, epoch=epoch)
     try:
         while True:
             # Keep the connection alive
             await websocket.receive_text()
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager already closed a slow or stalled client
+        pass
+    finally:
         manager.disconnect(websocket)
 
+@app.websocket("/ws/positions")
+async def positions_websocket(websocket: WebSocket, token: str = ""):
+    """Stream of GPS fixes from vehicle units (admin token as ?token=). Each text frame is
+    one fix or a list of fixes in the POST /api/vehicles/positions format; invalid frames
+    are dropped and nothing is sent back."""
+    async with AsyncSessionLocal() as db:
+        try:
+            await get_current_active_admin(await get_current_user(token, db))
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                data = json.loads(frame)
+                fixes = [PositionFix.model_validate(item) for item in (data if isinstance(data, list) else [data])]
+            except (ValueError, ValidationError):
+                position_tracker.rejected += 1
+                continue
+            for fix in fixes:
+                position_tracker.ingest(fix.vehicle_id, fix.latitude, fix.longitude, fix.recorded_at, fix.speed, fix.heading)
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/")
 async def read_index():
     return FileResponse('app/web/index.html')
@@ -82,49 +153,61 @@ async def spa_vehicles():
 async def spa_options():
     return FileResponse('app/web/index.html')
 
-# Background worker: set incidents to active when scheduled_at reached
-async def activation_worker():
-    """Periodically activates incidents that have reached their scheduled time.
-    Broadcasts an update for each newly activated incident so the dashboard can react.
+# Background worker (leader only): set incidents to active when scheduled_at reached
+async def activation_worker(fencing_token: int):
+    """Activates incidents exactly when their scheduled time is reached.
+    The pending schedule is loaded on election; afterwards incident broadcasts keep the
+    in-memory queue current, so the worker does no DB work until an activation is due.
     """
-    # Small initial delay to ensure app is fully started
-    await asyncio.sleep(0.5)
-    while True:
-        try:
-            now = datetime.datetime.now(datetime.timezone.utc)
-            async with AsyncSessionLocal() as db:
-                # Find incidents in 'new' state with a scheduled time that has passed
-                stmt = (
-                    select(models.Incident)
-                    .where(models.Incident.status == models.IncidentStatus.new)
-                    .where(models.Incident.scheduled_at.is_not(None))
-                )
-                result = await db.execute(stmt)
-                to_check = list(result.scalars().all())
-                changed = []
-                for inc in to_check:
-                    # Normalize scheduled_at to aware UTC if naive
-                    sch = inc.scheduled_at
-                    if sch is None:
-                        continue
-                    if sch.tzinfo is None:
-                        sch = sch.replace(tzinfo=datetime.timezone.utc)
-                    if sch <= now:
-                        inc.status = models.IncidentStatus.active
-                        changed.append(inc)
-                if changed:
-                    await db.commit()
-                    # Refresh and broadcast each
-                    for inc in changed:
-                        await db.refresh(inc)
-                        payload = incident_schemas.IncidentOut.model_validate(inc).model_dump()
-                        # Fire-and-forget websocket message
-                        asyncio.create_task(manager.broadcast({"type": "incident_updated", "incident": payload}))
-        except Exception as e:
-            # Avoid crashing the worker
-            print("activation_worker error:", e)
-        # Run every second
-        await asyncio.sleep(1)
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await incident_crud.get_scheduled_activations(db)
+
+    async def activate(incident_ids):
+        async with AsyncSessionLocal() as db:
+            await incident_crud.activate_incidents(db, incident_ids, fencing_token=fencing_token)
+
+    scheduler.load(await load())
+    await scheduler.run(activate, load)
+
+# Background worker: resolve coordinates for incidents saved with a pending location
+async def geocoding_worker():
+    """Geocodes addresses off the request path and pushes the coordinates to clients."""
+    async def on_resolved(incident_ids, address, lat, lon):
+        async with AsyncSessionLocal() as db:
+            await incident_crud.apply_geocode_result(db, incident_ids, address, lat, lon)
+
+    await geocoding_queue.run(on_resolved)
+
+# Leader job: re-queue open incidents still waiting for coordinates (e.g. after a restart)
+async def geocoding_recovery(fencing_token: int):
+    async with AsyncSessionLocal() as db:
+        for incident_id, address in await incident_crud.get_pending_geocodes(db):
+            geocoding_queue.submit(incident_id, address)
+
+# Leader job: move long-closed incidents into the archive tables
+async def archive_worker(fencing_token: int):
+    async def archive_batch(closed_before, limit):
+        async with AsyncSessionLocal() as db:
+            return len(await incident_crud.archive_closed_incidents(db, closed_before, limit, fencing_token=fencing_token))
+
+    await archiver.run(archive_batch)
+
+# Background worker: broadcast the positions this process received and store their history
+async def position_worker():
+    async def store_history(rows):
+        async with AsyncSessionLocal() as db:
+            await vehicle_crud.add_position_history(db, rows)
+
+    await position_tracker.run(store_history)
+
+# Leader job: delete position history past its retention
+async def position_retention(fencing_token: int):
+    async def prune_history(before, limit):
+        async with AsyncSessionLocal() as db:
+            return await vehicle_crud.prune_position_history(db, before, limit, fencing_token=fencing_token)
+
+    await position_tracker.run_retention(prune_history)
 
 if __name__ == "__main__":
     import uvicorn
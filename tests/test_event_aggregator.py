@@ -0,0 +1,56 @@
+"""Collapsing of outbound WebSocket events within the batch window."""
+import asyncio
+
+from app.core.websockets import EventAggregator
+
+
+def collect(*messages) -> list:
+    async def run():
+        frames = []
+        aggregator = EventAggregator(frames.append, window=0.01)
+        for message in messages:
+            aggregator.add(message)
+        await asyncio.sleep(0.05)
+        return frames
+
+    return asyncio.run(run())
+
+
+def test_updates_of_one_entity_collapse_into_the_latest():
+    frames = collect(
+        {"type": "incident_updated", "incident": {"id": 1, "title": "a"}},
+        {"type": "incident_updated", "incident": {"id": 2, "title": "x"}},
+        {"type": "incident_updated", "incident": {"id": 1, "title": "b"}},
+    )
+    assert frames == [[
+        {"type": "incident_updated", "incident": {"id": 2, "title": "x"}},
+        {"type": "incident_updated", "incident": {"id": 1, "title": "b"}},
+    ]]
+
+
+def test_created_survives_later_updates():
+    frames = collect(
+        {"type": "incident_created", "incident": {"id": 1, "title": "a"}},
+        {"type": "incident_updated", "incident": {"id": 1, "title": "b"}},
+        {"type": "incident_updated", "incident": {"id": 1, "title": "c"}},
+    )
+    assert frames == [[{"type": "incident_created", "incident": {"id": 1, "title": "c"}}]]
+
+
+def test_deletion_replaces_pending_events():
+    frames = collect(
+        {"type": "vehicle_created", "vehicle": {"id": 1, "name": "HLF 1", "status": 1}},
+        {"type": "vehicle_deleted", "vehicle_id": 1},
+    )
+    assert frames == [[{"type": "vehicle_deleted", "vehicle_id": 1}]]
+
+
+def test_alarm_flushes_and_skips_the_window():
+    frames = collect(
+        {"type": "incident_updated", "incident": {"id": 1, "status": "new"}},
+        {"type": "incident_updated", "incident": {"id": 1, "status": "active"}, "alarm": True},
+    )
+    assert frames == [
+        [{"type": "incident_updated", "incident": {"id": 1, "status": "new"}}],
+        [{"type": "incident_updated", "incident": {"id": 1, "status": "active"}, "alarm": True}],
+    ]
@@ -0,0 +1,178 @@
+"""Cross-process delivery on the unix event bus (EVENT_BUS=unix)."""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+from app.core import events
+from app.core.events import UnixSocketBus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One worker process: publish a small and a large event once every worker is bound, then
+# print what arrived (including its own events, delivered locally) as JSON.
+WORKER = """
+import asyncio, json, os, sys
+from app.core.events import UnixSocketBus
+
+async def main(path, index, workers):
+    received = []
+    done = asyncio.Event()
+
+    async def deliver(message):
+        received.append(message)
+        if len(received) == 2 * workers:
+            done.set()
+
+    bus = UnixSocketBus(path)
+    await bus.start(deliver)
+    while len([n for n in os.listdir(path) if n.endswith(".sock")]) < workers:
+        await asyncio.sleep(0.01)
+    await bus.publish({"type": "test", "worker": index, "size": "small"})
+    await bus.publish({"type": "test", "worker": index, "size": "large", "payload": "x" * 300000})
+    try:
+        await asyncio.wait_for(done.wait(), timeout=10)
+    finally:
+        await bus.stop()
+    print(json.dumps([[m["worker"], m["size"], len(m.get("payload", ""))] for m in received]))
+
+asyncio.run(main(sys.argv[1], int(sys.argv[2]), int(sys.argv[3])))
+"""
+
+
+def test_events_reach_every_worker():
+    workers = 3
+    with tempfile.TemporaryDirectory() as path:
+        processes = [
+            subprocess.Popen(
+                [sys.executable, "-c", WORKER, path, str(index), str(workers)],
+                cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for index in range(workers)
+        ]
+        outputs = [process.communicate(timeout=30) for process in processes]
+    expected = sorted(
+        [index, size, 300000 if size == "large" else 0]
+        for index in range(workers)
+        for size in ("small", "large")
+    )
+    for process, (stdout, stderr) in zip(processes, outputs):
+        assert process.returncode == 0, stderr
+        assert sorted(json.loads(stdout)) == expected
+
+
+def test_peer_that_misses_events_gets_resync_notice(monkeypatch):
+    monkeypatch.setattr(events, "EVENT_BUS_SEND_WAIT", 0.02)
+
+    async def run(path):
+        bus = UnixSocketBus(path)
+        await bus.start(lambda message: asyncio.sleep(0))
+        # A peer that does not read: its queue fills up after a few datagrams
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(os.path.join(path, "stalled.sock"))
+        peer.setblocking(False)
+        try:
+            for n in range(64):
+                await bus.publish({"type": "test", "n": n})
+            assert bus.stats()["peers_behind"] == 1
+            received = []
+            while True:
+                try:
+                    received.append(json.loads(peer.recv(65536)))
+                except BlockingIOError:
+                    break
+            assert [m["n"] for m in received] == list(range(len(received)))
+            # The retry delivers the notice once the peer has room again
+            await asyncio.sleep(0.3)
+            assert json.loads(peer.recv(65536)) == {"type": "resync_required"}
+            assert bus.stats()["peers_behind"] == 0
+            await bus.publish({"type": "test", "n": 64})
+            assert json.loads(peer.recv(65536)) == {"type": "test", "n": 64}
+        finally:
+            peer.close()
+            await bus.stop()
+
+    with tempfile.TemporaryDirectory() as path:
+        asyncio.run(run(path))
+
+
+class FakeRedis:
+    """In-memory stand-in for redis.asyncio: the first subscription drops after one message,
+    and publishing fails while `down` is set."""
+
+    def __init__(self):
+        self.subscriptions = 0
+        self.published = []
+        self.down = False
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, data):
+        if self.down:
+            raise ConnectionError("connection refused")
+        self.published.append(json.loads(data))
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, client):
+        self.client = client
+
+    async def subscribe(self, channel):
+        self.client.subscriptions += 1
+        self.number = self.client.subscriptions
+
+    async def listen(self):
+        yield {"type": "message", "data": json.dumps({"type": "test", "subscription": self.number})}
+        if self.number == 1:
+            raise ConnectionError("connection reset")
+        await asyncio.Event().wait()
+
+    async def unsubscribe(self, channel):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+def test_redis_bus_resubscribes_and_resyncs(monkeypatch):
+    client = FakeRedis()
+    module = type(sys)("redis.asyncio")
+    module.from_url = lambda url: client
+    monkeypatch.setitem(sys.modules, "redis", type(sys)("redis"))
+    monkeypatch.setitem(sys.modules, "redis.asyncio", module)
+    monkeypatch.setattr(events, "REDIS_RECONNECT_DELAY", 0.01)
+
+    async def run():
+        received = []
+
+        async def deliver(message):
+            received.append(message)
+
+        bus = events.RedisBus()
+        await bus.start(deliver)
+        await asyncio.sleep(0.05)
+        assert received == [
+            {"type": "test", "subscription": 1},
+            {"type": "resync_required"},
+            {"type": "test", "subscription": 2},
+        ]
+        assert bus.stats()["reconnects"] == 1
+
+        # A lost publish resyncs the local clients now and the other processes later
+        client.down = True
+        await bus.publish({"type": "test", "n": 1})
+        assert received[-1] == {"type": "resync_required"}
+        assert bus.stats()["publish_errors"] == 1
+        client.down = False
+        await bus.publish({"type": "test", "n": 2})
+        assert client.published == [{"type": "resync_required"}, {"type": "test", "n": 2}]
+        await bus.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+"""Login limits shared through the rate_limits table."""
+import asyncio
+import os
+import tempfile
+
+from app.core.security import LoginThrottle
+from app.db.sql.connect import Base, create_engines, make_sessionmaker
+from app.db.sql.migrations import migrate
+
+
+def run(test) -> None:
+    async def main():
+        with tempfile.TemporaryDirectory() as path:
+            writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(path, 'test.db')}", echo=False)
+            await migrate(writer, Base.metadata)
+            try:
+                async with make_sessionmaker(writer, reader)() as db:
+                    await test(db)
+            finally:
+                await writer.dispose()
+                if reader is not None:
+                    await reader.dispose()
+
+    asyncio.run(main())
+
+
+def test_failures_lock_out_only_the_failing_client():
+    async def test(db):
+        throttle = LoginThrottle(window=60, max_per_ip=100, max_failures_per_user=3)
+        for _ in range(3):
+            assert await throttle.check(db, "admin", "10.0.0.1") is None
+            await throttle.failed(db, "admin", "10.0.0.1")
+        assert 1 <= await throttle.check(db, "Admin", "10.0.0.1") <= 20
+        assert await throttle.check(db, "admin", "10.0.0.2") is None
+        await throttle.succeeded(db, "admin", "10.0.0.2")
+        assert await throttle.check(db, "admin", "10.0.0.1") is not None
+
+    run(test)
+
+
+def test_ip_limit_is_shared_between_processes():
+    async def test(db):
+        # One throttle per worker process, the same database
+        workers = [LoginThrottle(window=60, max_per_ip=4), LoginThrottle(window=60, max_per_ip=4)]
+        results = [await workers[n % 2].check(db, f"user{n}", "10.0.0.1") for n in range(6)]
+        assert results[:4] == [None] * 4
+        assert all(wait is not None for wait in results[4:])
+        assert await workers[0].check(db, "user0", "10.0.0.2") is None
+
+    run(test)
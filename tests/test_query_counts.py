@@ -0,0 +1,135 @@
+"""Statements and ORM rows per list request stay fixed as the incident history grows
+(no N+1 loading through Vehicle.incidents / Incident.vehicles)."""
+import asyncio
+import datetime
+import os
+import tempfile
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import event, insert
+
+from app.api.router import api_router
+from app.db.sql import models
+from app.db.sql.connect import Base, create_engines, get_db, make_sessionmaker
+from app.db.sql.migrations import migrate
+
+VEHICLES = 10
+INCIDENTS = 600
+ACTIVE = 20
+
+
+async def _populate(Session) -> None:
+    start = datetime.datetime(2024, 1, 1)
+    async with Session() as db:
+        await db.execute(insert(models.Vehicle), [
+            {"id": i, "name": f"HLF {i}", "status": 2, "revision": i} for i in range(1, VEHICLES + 1)
+        ])
+        await db.execute(insert(models.Incident), [
+            {
+                "id": i, "title": f"Einsatz {i}", "description": "", "address": f"Straße {i}",
+                "status": models.IncidentStatus.active if i > INCIDENTS - ACTIVE else models.IncidentStatus.closed,
+                "created_at": start + datetime.timedelta(hours=i), "revision": VEHICLES + i,
+            }
+            for i in range(1, INCIDENTS + 1)
+        ])
+        # Every vehicle took part in most of the history
+        await db.execute(insert(models.incident_vehicles), [
+            {"incident_id": i, "vehicle_id": v}
+            for i in range(1, INCIDENTS + 1)
+            for v in range(1, VEHICLES + 1)
+            if (i + v) % 3
+        ])
+        await db.commit()
+
+
+@pytest.fixture(scope="module")
+def api():
+    """(client factory, statement counter, loaded-instance counter) on a populated scratch database."""
+    tmp = tempfile.TemporaryDirectory()
+    writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp.name, 'test.db')}", echo=False)
+    Session = make_sessionmaker(writer, reader)
+    statements, loaded = [], Counter()
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in (writer, reader):
+        if engine is not None:
+            event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    def count_load(target, context):
+        loaded[type(target).__name__] += 1
+
+    for entity in (models.Incident, models.Vehicle):
+        event.listen(entity, "load", count_load)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(migrate(writer, Base.metadata))
+    loop.run_until_complete(_populate(Session))
+
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+
+    async def override_get_db():
+        async with Session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    def get(url: str) -> httpx.Response:
+        async def request():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(url)
+        statements.clear()
+        loaded.clear()
+        return loop.run_until_complete(request())
+
+    yield get, statements, loaded
+    for entity in (models.Incident, models.Vehicle):
+        event.remove(entity, "load", count_load)
+    loop.run_until_complete(writer.dispose())
+    if reader is not None:
+        loop.run_until_complete(reader.dispose())
+    loop.close()
+    tmp.cleanup()
+
+
+@pytest.mark.parametrize("url, queries, vehicles", [
+    # Revision (ETag), then vehicle columns only
+    ("/api/vehicles/", 2, 0),
+    # ... plus one query for the active assignments of the page
+    ("/api/vehicles/?include=current_incidents", 3, 0),
+    # Vehicle, then its active assignments
+    ("/api/vehicles/3?include=current_incidents", 2, 1),
+])
+def test_vehicle_endpoints_do_not_load_history(api, url, queries, vehicles):
+    get, statements, loaded = api
+    response = get(url)
+    assert response.status_code == 200
+    assert len(statements) == queries, statements
+    assert loaded["Incident"] == 0
+    assert loaded["Vehicle"] == vehicles
+
+
+def test_vehicle_include_lists_only_active_incidents(api):
+    get, statements, loaded = api
+    vehicles = get("/api/vehicles/?include=current_incidents").json()
+    assert len(vehicles) == VEHICLES
+    for vehicle in vehicles:
+        assert all(incident["status"] == "active" for incident in vehicle["current_incidents"])
+        assert len(vehicle["current_incidents"]) <= ACTIVE
+
+
+@pytest.mark.parametrize("limit", [10, 50])
+def test_incident_list_query_count_is_independent_of_page_size(api, limit):
+    get, statements, loaded = api
+    response = get(f"/api/incidents/?limit={limit}")
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+    # Revision (ETag), the page, and one selectin query for the page's vehicles
+    assert len(statements) == 3, statements
+    assert loaded["Incident"] == limit
+    assert loaded["Vehicle"] <= VEHICLES